@@ -1,15 +1,23 @@
 # DataMoyGraph-05.py
 # v04 prog de tracé des valeurs du Datafficheur, fonctionne avec défilement, amélioration grid
 # v05 modif couleur courbe (rouge maxi et bleu moy)
+# v06 lecture du port serie dans un thread (acquisition.py) et tampon circulaire des mesures,
+#     l'affichage ne ralentit plus la lecture
+# v07 affichage par blitting (liveplot.py) à fréquence d'images fixe, fenêtre configurable
+# v08 enregistrement des mesures (recorder.py) au format des fichiers du Datafficheur,
+#     un dossier Moy et un dossier Max lisibles par datafficheur.py
+# v09 relecture d'une session (--replay) en temps réel ou accélérée sans Arduino (sources.py),
+#     simulateur sur pseudo-terminal et mesure des débits (benchmark.py)
+# v10 statistiques glissantes calculées en direct (livestats.py) : moyenne glissante tracée,
+#     panneau moyenne / écart-type / max / centiles par fenêtre, impulsion et travail cumulés
 
 # importation des modules 
-import serial # import Serial Library
-import numpy  # Import numpy
-import matplotlib.pyplot as plt #import matplotlib library
-from matplotlib.pyplot import figure
-figure(figsize=(20, 10), dpi=150)
-from drawnow import *
-import time # gestion du temps
+import argparse
+from acquisition import RingBuffer, SerialReader
+from liveplot import LivePlot
+from livestats import LiveStats
+from recorder import Recorder
+from sources import ReplaySource, load_replay, open_serial # pyserial n'est importé que pour un vrai port
 
 
 # from datetime import date
@@ -20,97 +28,95 @@ from datetime import datetime
 now = datetime.now()
 DateJour = now.strftime("%d/%m/%Y %H:%M:%S")
 
-liste_Moy=[]
-liste_Max=[]
-liste_temps_mesure =[] # liste pour stocker le temps"brut"
-liste_temps=[] # liste pour stocker les valeurs de temps en partant de t=0
 #arduinoData = serial.Serial('com11', 115200) #Creating our serial object named arduinoData
 arduino_port = '/dev/ttyUSB0' # Préciser ici le port série. Ex. : sous Windows "COM4", sous linux "/dev/ttyACM0" ou "/dev/ttyUSB0"
 arduino_baudrate = 9600 # La fréquence de la communication série (baudrate). Doit être identique à celui du code .ino
-arduinoData = serial.Serial(arduino_port, arduino_baudrate) # Lancement de la communication série avec Arduino
+arduino_timeout = 0.5 # Délai maximal d'une lecture (s) : la lecture bloque sans occuper le processeur
 
-plt.ion() #Tell matplotlib you want interactive mode to plot live data
-cnt=0
+nb_points = 60 # Nombre de mesures affichées
+fps = 10 # Nombre maximal d'images par seconde, indépendant du rythme des mesures
+taille_tampon = 36000 # Nombre de mesures conservées en mémoire (tampon circulaire)
 
+dossier_enregistrement = "DataMoyGraph-" + now.strftime("%Y-%m-%d_%Hh%M") # Dossier des fichiers enregistrés
+periode_fsync = 5 # Durée maximale (s) entre deux écritures effectives sur le disque
 
+fenetres = [10, 60, 600] # Durées (s) des fenêtres des statistiques glissantes
+lissage = 10 # Nombre de mesures de la moyenne glissante tracée
 
-def makeFig(): #Create a function that makes our desired plot
-#     plt.ylim(80,90)                                 #Set y min and max values
-    #plt.figure(figsize=(20,10), dpi=150)
-    #plt.subplots(figsize=(20, 10), dpi=150)
-    #plt.ylim(0,300)
-    plt.ylim(0,350)
-    plt.suptitle('DataMoyGraph-v05 (août-2024) pour Datafficheur (Deny-Fady)        Date : '+ DateJour)
-    #plt.subtitle(current_date_and_time)
-    plt.title('Val. moyenne sur 10 efforts et val. maxi sur ces 10 mesures (KgF)')      #Plot the title
-#     plt.title('DataMoyGraph-v04-2024-07-14-Datafficheur-Deny-Fady')
-#     plt.grid(True) #Turn the grid on
-    plt.grid(True, linestyle='--')
-    plt.grid(which='major',axis ='y', linewidth='1', color='black')
-    plt.grid(which='minor', linestyle=':', linewidth='0.5', color='black')
-    plt.minorticks_on()
-    plt.ylabel('Moyenne bleu (KgF)')                           #Set ylabels
-    plt.xlabel('temps écoulé (s)')                                #,(str(tempsreel)))
-#     plt.plot(tempF, 'ro-', label='Moy (KgF)')       #plot the temperature
-#     plt.plot(liste_Moy, 'ro-', label='Moy (KgF)')
-#     plt.plot(liste_Moy, label='Moy (KgF)')
-    plt.plot(liste_Moy, 'r+-', label='Moy (KgF)', color = 'blue')
-    plt.legend(loc='upper left')                    #plot the legend
-    plt2=plt.twinx()                                #Create a second y axis
-#     plt.ylim(93450,93525)                           #Set limits of second y axis- adjust to readings you are getting
-    plt.ylim(0,300)
-#    plt.xlim(0, tempsreel)
-#     plt2.plot(pressure, 'b^-', label='Max (KgF)') #plot pressure data
-#     plt2.plot(liste_Max, 'b^-', label='Max (KgF)')
-#     plt2.plot(liste_Max, label='Max (KgF)')
-    plt2.plot(liste_Max, 'b+-', label='Max (KgF)', color = 'red')
-    plt2.set_ylabel('Maximum rouge (KgF)')                    #label second y axis
-    plt2.ticklabel_format(useOffset=False)           #Force matplotlib to NOT autoscale y axis
-    plt2.legend(loc='upper right') #plot the legend
-    
-    
 
-while True: # While loop that loops forever
-    while (arduinoData.inWaiting()==0): #Wait here until there is data
-        pass #do nothing
-    arduinoString = arduinoData.readline() #read the line of text from the serial port
-    print ("arduinoString =",arduinoString)
-    arduinoString = arduinoString.strip()
-    print ("arduinoString =",arduinoString)
-    arduinoString = arduinoString.split()
-    print ("arduinoString =",arduinoString)
-    
-#     temp = float(arduinoString[0].decode()) # après consulation des données, nous choisissons le 1er élément de listeDonnees
-#     P = float(arduinoString[2].decode()) # après consulation des données, nous choisissons le 3ème élément de listeDonnees
-    Moy = float(arduinoString[0].decode()) # après consulation des données, nous choisissons le 1er élément de listeDonnees
-    Max = float(arduinoString[2].decode()) # après consulation des données, nous choisissons le 3ème élément de listeDonnees
 
-#     print ("Moy = ",temp)
-#     print ("Max = ",P)
-    print ("Moy = ",Moy)
-    print ("Max = ",Max)
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="DataMoyGraph",
+        description="Affichage en direct de la moyenne et du maximum des efforts envoyés par le Datafficheur.",
+    )
+    parser.add_argument("--port", help=f"Port série. Par defaut: {arduino_port}", default=arduino_port)
+    parser.add_argument("--baudrate", type=int, help=f"Vitesse du port série. Par defaut: {arduino_baudrate}", default=arduino_baudrate)
+    parser.add_argument("--points", type=int, help=f"Nombre de mesures affichées. Par defaut: {nb_points}", default=nb_points)
+    parser.add_argument("--fps", type=float, help=f"Nombre maximal d'images par seconde. Par defaut: {fps}", default=fps)
+    parser.add_argument(
+        "--record",
+        help="Enregistre les mesures au format des fichiers du Datafficheur (un fichier par minute).",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+    )
+    parser.add_argument("--dossier", help=f"Dossier de l'enregistrement. Par defaut: {dossier_enregistrement}", default=dossier_enregistrement)
+    parser.add_argument(
+        "--stats",
+        help="Calcule et affiche les statistiques glissantes de la moyenne.",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+    )
+    parser.add_argument("--fenetres", type=float, nargs="+", help=f"Durées (s) des fenêtres des statistiques. Par defaut: {' '.join(map(str, fenetres))}", default=fenetres)
+    parser.add_argument("--lissage", type=int, help=f"Nombre de mesures de la moyenne glissante tracée. Par defaut: {lissage}", default=lissage)
+    parser.add_argument("--vitesse-avancement", type=float, help="Vitesse d'avancement (km/h) pour le calcul du travail. Par defaut: inconnue")
+    parser.add_argument("--replay", help="Rejoue une session au lieu de lire le port série : enregistrement de DataMoyGraph ou session de la carte SD (dossier ou archive ZIP).")
+    parser.add_argument("--vitesse", type=float, help="Facteur d'accélération de --replay (1, 10...), 0 pour aussi vite que possible. Par defaut: 1", default=1.0)
+    args = parser.parse_args(argv)
 
-    tempsmes = time.time()
-    liste_temps_mesure.append(tempsmes) # temps mesuré "brut" stocké dans une liste
+    if args.replay:
+        arduinoData = ReplaySource(*load_replay(args.replay), args.vitesse, arduino_timeout)
+    else:
+        arduinoData = open_serial(args.port, args.baudrate, arduino_timeout) # Lancement de la communication série avec Arduino
+    tampon = RingBuffer(taille_tampon, 2) # colonnes Moy et Max
+    enregistreur = None
+    if args.record: # lancé avant la lecture pour enregistrer toutes les mesures
+        enregistreur = Recorder(tampon, args.dossier, ("Moy", "Max"), periode_fsync)
+        enregistreur.start()
+        print("Enregistrement dans", args.dossier, "(python datafficheur.py -d", args.dossier + "/Moy)")
+    statistiques = None
+    if args.stats: # créées avant la lecture pour compter toutes les mesures
+        statistiques = LiveStats(tampon, args.fenetres, 0, args.lissage, args.vitesse_avancement)
+    lecteur = SerialReader(arduinoData, tampon)
+    lecteur.start()
 
-#     dataArray = arduinoString.split(',')   #Split it into an array called dataArray
-#     temp = float( dataArray[0])            #Convert first element to floating number and put in temp
-#     P =    float( dataArray[1])            #Convert second element to floating number and put in P
-#     tempF.append(Moy)                     #Build our tempF array by appending temp readings
-#     pressure.append(Max)                     #Building our pressure array by appending P readings
-    liste_Moy.append(Moy)
-    liste_Max.append(Max)
+    graphique = LivePlot(
+        tampon,
+        args.points,
+        args.fps,
+        'DataMoyGraph-v10 (oct-2026) pour Datafficheur (Deny-Fady)        Date : ' + DateJour,
+        stats=statistiques,
+        lecteur=lecteur,
+    )
+    try:
+        graphique.show() # jusqu'à la fermeture de la fenêtre
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lecteur.stop()
+        arduinoData.close()
+        if enregistreur is not None:
+            enregistreur.stop()
+            print("mesures enregistrées =", enregistreur.nb_mesures, " perdues =", enregistreur.nb_perdues, " même dixième de seconde =", enregistreur.nb_collisions)
+        print("lignes lues =", lecteur.nb_lignes, " lignes illisibles =", lecteur.nb_erreurs, " images =", graphique.nb_images)
+        if statistiques is not None:
+            statistiques.update()
+            print(statistiques.format_summary())
+    if lecteur.erreur is not None: # Arduino débranché par exemple
+        print("Lecture interrompue :", lecteur.erreur)
+        return 1
+    return 0
 
-    tempsreel = tempsmes - liste_temps_mesure[0] # pour faire partir le temps de 0 (cette valeur de temps sera stockée dans une autre liste : liste_temps)
-    liste_temps.append(tempsreel)
-    print("temps mesuré = %f"%(tempsmes), " s") # affichage de la valeur du temps absolu
-    print("temps réel= %f"%(tempsreel), " s") # affichage de la valeur du temps en partant de 0
-    drawnow(makeFig)                       #Call drawnow to update our live graph
-    plt.pause(.000001)                     #Pause Briefly. Important to keep drawnow from crashing
-    cnt=cnt+1
-    print ("cnt = ",cnt)
-    if(cnt>60):                            #If you have 60 or more points, delete the first one from the array
-#         tempF.pop(0)                       #This allows us to just see the last 50 data points
-#         pressure.pop(0)
-        liste_Moy.pop(0)
-        liste_Max.pop(0)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,190 @@
+# Acquisition des mesures du Datafficheur sur le port serie, dans un thread dedie.
+# Le thread de lecture ne fait que lire, decoder et ranger les mesures dans un tampon
+# circulaire : l'affichage (ou l'enregistrement) les relit e son rythme sans jamais
+# bloquer la lecture du port serie.
+
+import threading
+import time
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Tampon circulaire de taille fixe (tableaux NumPy) des dernieres mesures horodatees.
+
+    Les ajouts et les lectures sont en O(1) par mesure, sans deplacement des mesures
+    deje rangees. Chaque mesure a une position absolue (0 pour la premiere recue) :
+    un lecteur qui retient la position de la derniere mesure lue relit les suivantes
+    avec read_since et sait combien ont ete ecrasees s'il a pris trop de retard.
+
+    Args:
+        capacite (int): Nombre de mesures conservees.
+        nb_colonnes (int): Nombre de valeurs par mesure (2 : Moy et Max).
+
+    Raises:
+        ValueError: Si capacite ou nb_colonnes n'est pas positif.
+    """
+
+    def __init__(self, capacite, nb_colonnes):
+        if capacite <= 0 or nb_colonnes <= 0:
+            raise ValueError("capacite et nb_colonnes doivent etre des entiers positifs.")
+        self.capacite = capacite
+        self.temps = np.zeros(capacite, dtype=np.float64)
+        self.valeurs = np.zeros((capacite, nb_colonnes), dtype=np.float64)
+        # nombre de mesures recues depuis le debut, position de la prochaine mesure
+        self.total = 0
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        return min(self.total, self.capacite)
+
+    def append(self, temps, valeurs):
+        """
+        Ajoute une mesure, en ecrasant la plus ancienne si le tampon est plein.
+
+        Args:
+            temps (float): L'instant de reception (secondes, time.time()).
+            valeurs (sequence of float): Les valeurs de la mesure.
+        """
+        with self.condition:
+            i = self.total % self.capacite
+            self.temps[i] = temps
+            self.valeurs[i] = valeurs
+            self.total += 1
+            self.condition.notify_all()
+
+    def _copy(self, debut, fin):
+        # copie des positions absolues [debut, fin[, deje presentes dans le tampon
+        i, j = debut % self.capacite, fin % self.capacite
+        if fin - debut == 0:
+            return self.temps[:0].copy(), self.valeurs[:0].copy()
+        if i < j:
+            return self.temps[i:j].copy(), self.valeurs[i:j].copy()
+        return (
+            np.concatenate((self.temps[i:], self.temps[:j])),
+            np.concatenate((self.valeurs[i:], self.valeurs[:j])),
+        )
+
+    def last(self, n):
+        """
+        Copie des n dernieres mesures (moins si le tampon en contient moins).
+
+        Args:
+            n (int): Nombre de mesures.
+
+        Returns:
+            tuple: Un tuple (temps, valeurs) dans l'ordre chronologique.
+        """
+        with self.condition:
+            n = min(n, len(self))
+            return self._copy(self.total - n, self.total)
+
+    def read_since(self, position):
+        """
+        Copie des mesures recues depuis la position donnee.
+
+        Args:
+            position (int): La position absolue de la premiere mesure voulue (total lors de la lecture precedente).
+
+        Returns:
+            tuple: Un tuple (temps, valeurs, position, perdues) ou position est la position
+            e passer e l'appel suivant et perdues le nombre de mesures ecrasees avant d'etre lues.
+        """
+        with self.condition:
+            debut = max(position, self.total - self.capacite)
+            temps, valeurs = self._copy(debut, self.total)
+            return temps, valeurs, self.total, debut - position
+
+    def wait(self, position, timeout=None):
+        """
+        Attend qu'une mesure posterieure e position soit recue.
+
+        Args:
+            position (int): La position absolue deje lue.
+            timeout (float, optional): Duree maximale d'attente en secondes. Par defaut : None.
+
+        Returns:
+            int: Le nombre total de mesures recues (egal e position si le delai est ecoule).
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.total > position, timeout)
+            return self.total
+
+
+def parse_line(ligne):
+    """
+    Decode une ligne envoyee par l'Arduino : la moyenne des 10 derniers efforts en premier
+    champ et leur maximum en troisieme (ex. b"12.5 ; 30.0").
+
+    Args:
+        ligne (bytes): La ligne recue, avec ou sans fin de ligne.
+
+    Returns:
+        tuple: Un tuple (Moy, Max) de flottants.
+
+    Raises:
+        ValueError: Si la ligne n'a pas au moins trois champs ou si un champ n'est pas un nombre.
+    """
+    champs = ligne.split()
+    if len(champs) < 3:
+        raise ValueError(f"Ligne incomplete : {ligne!r}")
+    return float(champs[0].decode()), float(champs[2].decode())
+
+
+class SerialReader(threading.Thread):
+    """
+    Thread de lecture du port serie : lectures bloquantes avec delai (pas d'attente
+    active), decodage de chaque ligne et rangement des mesures horodatees dans le tampon.
+
+    Une ligne coupee par le delai de lecture est completee par la lecture suivante.
+    Les lignes illisibles sont comptees et ignorees. Une erreur du port (Arduino
+    debranche : serial.SerialException, sous-classe d'OSError) arrete la lecture et
+    est conservee dans erreur, pour que l'affichage puisse la signaler.
+
+    Args:
+        port (serial.Serial): Le port ouvert, avec un delai de lecture (timeout) pour que le thread puisse s'arreter.
+        tampon (RingBuffer): Le tampon des mesures (deux colonnes : Moy et Max).
+    """
+
+    def __init__(self, port, tampon):
+        super().__init__(name="lecture-serie", daemon=True)
+        self.port = port
+        self.tampon = tampon
+        self.nb_lignes = 0
+        self.nb_erreurs = 0
+        self.erreur = None # OSError qui a interrompu la lecture
+        self.arret = threading.Event()
+
+    def run(self):
+        reste = b""
+        while not self.arret.is_set():
+            try:
+                ligne = self.port.readline()
+            except OSError as e:
+                self.erreur = e
+                break
+            if not ligne:
+                continue
+            if not ligne.endswith(b"\n"):
+                # delai ecoule au milieu d'une ligne
+                reste += ligne
+                continue
+            ligne, reste = reste + ligne, b""
+            temps = time.time()
+            try:
+                mesure = parse_line(ligne)
+            except (ValueError, UnicodeDecodeError):
+                self.nb_erreurs += 1
+                continue
+            self.tampon.append(temps, mesure)
+            self.nb_lignes += 1
+
+    def stop(self, timeout=None):
+        """
+        Demande l'arret du thread et attend la fin de la lecture en cours.
+
+        Args:
+            timeout (float, optional): Duree maximale d'attente en secondes. Par defaut : None.
+        """
+        self.arret.set()
+        self.join(timeout)
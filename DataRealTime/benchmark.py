@@ -0,0 +1,186 @@
+# Mesure du debit de la chaine en direct sans Arduino : des lignes numerotees sont envoyees
+# par un simulateur (pseudo-terminal ou relecture en memoire) e differents rythmes, lues par
+# SerialReader dans le tampon circulaire et affichees par LivePlot (sans fenetre, backend Agg).
+# Pour chaque rythme : debit atteint, lignes perdues, latence d'acquisition et d'affichage.
+#
+# python benchmark.py --rythmes 10 100 1000 0 --duree 5
+
+import argparse
+import time
+import matplotlib
+import numpy as np
+from acquisition import RingBuffer, SerialReader
+from sources import PtySimulator, ReplaySource
+
+
+def make_lines(rythme, duree, nombre_max):
+    """
+    Mesures numerotees e envoyer : la moyenne porte le numero de la ligne (pour retrouver
+    son instant d'envoi e la reception), le maximum une dent de scie.
+
+    Args:
+        rythme (float): Nombre de lignes par seconde, 0 pour aussi vite que possible.
+        duree (float): Duree de l'envoi en secondes.
+        nombre_max (int): Nombre de lignes quand rythme vaut 0.
+
+    Returns:
+        tuple: Un tuple (temps, valeurs) pour PtySimulator ou ReplaySource.
+    """
+    n = int(rythme * duree) if rythme else nombre_max
+    numeros = np.arange(n, dtype=np.float64)
+    temps = numeros / rythme if rythme else np.zeros(n)
+    return temps, np.column_stack((numeros, numeros % 300))
+
+
+def percentiles_ms(valeurs):
+    # mediane et 99e centile en millisecondes
+    if len(valeurs) == 0:
+        return float("nan"), float("nan")
+    return tuple(np.percentile(valeurs, [50, 99]) * 1000)
+
+
+def run(rythme, duree, source="pty", nombre_max=20000, taille_tampon=36000, fps=10, nb_points=60, timeout=0.05, stats=True):
+    """
+    Envoie les lignes d'un rythme et mesure la chaine acquisition + affichage.
+
+    Args:
+        rythme (float): Nombre de lignes par seconde, 0 pour aussi vite que possible.
+        duree (float): Duree de l'envoi en secondes.
+        source (str, optional): "pty" (pseudo-terminal, comme un port serie) ou "replay" (en memoire). Par defaut : "pty".
+        nombre_max (int, optional): Nombre de lignes quand rythme vaut 0. Par defaut : 20000.
+        taille_tampon (int, optional): Capacite du tampon circulaire. Par defaut : 36000.
+        fps (float, optional): Images par seconde, 0 pour ne pas afficher. Par defaut : 10.
+        nb_points (int, optional): Nombre de mesures affichees. Par defaut : 60.
+        timeout (float, optional): Delai de lecture du port en secondes. Par defaut : 0.05.
+        stats (bool, optional): Si vrai, l'affichage calcule aussi les statistiques glissantes (livestats.py). Par defaut : True.
+
+    Returns:
+        dict: Les mesures du rythme.
+    """
+    temps, valeurs = make_lines(rythme, duree, nombre_max)
+    tampon = RingBuffer(taille_tampon, 2)
+    if source == "pty":
+        simulateur = PtySimulator(temps, valeurs)
+        port = simulateur.port(timeout)
+    else:
+        simulateur = None
+        port = ReplaySource(temps, valeurs, timeout=timeout)
+    envois = (simulateur or port).envois
+    lecteur = SerialReader(port, tampon)
+
+    graphique = None
+    if fps:
+        from liveplot import LivePlot
+        from livestats import LiveStats
+
+        graphique = LivePlot(tampon, nb_points, fps, figsize=(10, 5), dpi=100, stats=LiveStats(tampon) if stats else None)
+        graphique.fig.canvas.draw()
+    couts, latences_affichage = [], []
+
+    position, perdues = 0, 0
+    latences = []
+    lecteur.start()
+    if simulateur:
+        simulateur.start()
+    debut = time.monotonic()
+    prochaine_image = debut
+    inactif_depuis = None
+    while True:
+        maintenant = time.monotonic()
+        attente = max(prochaine_image - maintenant, 0) if graphique else timeout
+        tampon.wait(position, timeout=attente)
+        recus, lus, position, n_perdues = tampon.read_since(position)
+        perdues += n_perdues
+        if len(recus):
+            latences.append(recus - envois[lus[:, 0].astype(np.int64)])
+            inactif_depuis = None
+        if graphique and time.monotonic() >= prochaine_image:
+            t = time.perf_counter()
+            graphique.draw_frame()
+            couts.append(time.perf_counter() - t)
+            if graphique.latence is not None:
+                latences_affichage.append(graphique.latence)
+            prochaine_image += 1 / fps
+        # fin : tout est envoye et plus rien n'arrive pendant plusieurs delais de lecture
+        if lecteur.erreur is not None:
+            break
+        envoi_fini = not simulateur.is_alive() if simulateur else port.fin
+        if envoi_fini and lecteur.nb_lignes + lecteur.nb_erreurs >= len(envois):
+            break
+        if envoi_fini and not len(recus):
+            inactif_depuis = inactif_depuis or time.monotonic()
+            if time.monotonic() - inactif_depuis > 5 * timeout:
+                break
+    fin = time.monotonic()
+    lecteur.stop()
+    recus, lus, position, n_perdues = tampon.read_since(position)
+    perdues += n_perdues
+    latences.append(recus - envois[lus[:, 0].astype(np.int64)])
+    port.close()
+    if simulateur:
+        simulateur.stop(1.0)
+    if graphique:
+        import matplotlib.pyplot as plt
+
+        plt.close(graphique.fig)
+
+    latences = np.concatenate(latences) if latences else np.zeros(0)
+    envoyees = int(np.count_nonzero(~np.isnan(envois)))
+    resultat = {
+        "rythme": rythme,
+        "envoyees": envoyees,
+        "lues": lecteur.nb_lignes,
+        "illisibles": lecteur.nb_erreurs,
+        "perdues_port": envoyees - lecteur.nb_lignes - lecteur.nb_erreurs,
+        "perdues_tampon": perdues,
+        "debit": lecteur.nb_lignes / (fin - debut),
+        "latence": percentiles_ms(latences),
+        "images": len(couts),
+        "fps": len(couts) / (fin - debut),
+        "cout_image": percentiles_ms(np.array(couts)),
+        "latence_affichage": percentiles_ms(np.array(latences_affichage)),
+        "erreur": lecteur.erreur,
+    }
+    return resultat
+
+
+def print_result(r):
+    """
+    Affiche les mesures d'un rythme.
+
+    Args:
+        r (dict): Le resultat de run.
+    """
+    rythme = f"{r['rythme']:g} lignes/s" if r["rythme"] else "max"
+    print(
+        f"{rythme:>14} : {r['debit']:8.0f} lignes/s lues   envoyees = {r['envoyees']}   lues = {r['lues']}   "
+        f"illisibles = {r['illisibles']}   perdues = {r['perdues_port']} (port) + {r['perdues_tampon']} (tampon)"
+    )
+    print(f"{'':>14}   latence acquisition mediane = {r['latence'][0]:.2f} ms   p99 = {r['latence'][1]:.2f} ms")
+    if r["erreur"] is not None:
+        print(f"{'':>14}   lecture interrompue : {r['erreur']}")
+    if r["images"]:
+        print(
+            f"{'':>14}   images = {r['images']} ({r['fps']:.1f} /s)   cout median = {r['cout_image'][0]:.1f} ms   "
+            f"p99 = {r['cout_image'][1]:.1f} ms   latence affichage mediane = {r['latence_affichage'][0]:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="DataMoyGraph-benchmark",
+        description="Mesure le debit, les pertes et la latence de l'acquisition et de l'affichage en direct, sans Arduino.",
+    )
+    parser.add_argument("--rythmes", type=float, nargs="+", help="Lignes par seconde, 0 pour aussi vite que possible. Par defaut: 10 100 1000 0", default=[10, 100, 1000, 0])
+    parser.add_argument("--duree", type=float, help="Duree de chaque rythme en secondes. Par defaut: 5", default=5.0)
+    parser.add_argument("--nombre", type=int, help="Nombre de lignes du rythme 0. Par defaut: 20000", default=20000)
+    parser.add_argument("--source", choices=["pty", "replay"], help="Pseudo-terminal ou relecture en memoire. Par defaut: pty", default="pty")
+    parser.add_argument("--fps", type=float, help="Images par seconde, 0 sans affichage. Par defaut: 10", default=10.0)
+    parser.add_argument("--points", type=int, help="Nombre de mesures affichees. Par defaut: 60", default=60)
+    parser.add_argument("--stats", help="Statistiques glissantes dans l'affichage.", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--tampon", type=int, help="Capacite du tampon circulaire. Par defaut: 36000", default=36000)
+    args = parser.parse_args()
+
+    matplotlib.use("Agg") # sans fenetre : seul le cout du rendu est mesure
+    for rythme in args.rythmes:
+        print_result(run(rythme, args.duree, args.source, args.nombre, args.tampon, args.fps, args.points, stats=args.stats))
@@ -0,0 +1,171 @@
+# Affichage en direct des mesures du tampon circulaire (acquisition.py).
+# La figure (titres, grilles, axes, legendes) est construite une seule fois ; ensuite seules
+# les donnees des courbes sont mises e jour et redessinees par blitting, e une frequence
+# d'images fixe qui ne depend pas du rythme d'arrivee des mesures.
+
+import time
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+class LivePlot:
+    """
+    Graphique en direct de la moyenne (bleu) et du maximum (rouge) des dernieres mesures.
+
+    Args:
+        tampon (acquisition.RingBuffer): Le tampon des mesures (colonnes Moy et Max).
+        nb_points (int, optional): Nombre de mesures affichees. Par defaut : 60.
+        fps (float, optional): Nombre maximal d'images par seconde. Par defaut : 10.
+        titre (str, optional): Le titre de la figure. Par defaut : "".
+        figsize (tuple, optional): La taille de la figure en pouces. Par defaut : (20, 10).
+        dpi (int, optional): La resolution de la figure. Par defaut : 150.
+        stats (livestats.LiveStats, optional): Statistiques en direct : moyenne glissante tracee
+            et panneau de resume sous le graphique. Par defaut : None.
+        periode_panneau (float, optional): Duree (s) entre deux mises e jour du panneau de resume. Par defaut : 1.
+        lecteur (acquisition.SerialReader, optional): Le thread de lecture : si la lecture s'interrompt
+            sur une erreur du port, l'erreur est affichee et les images s'arretent. Par defaut : None.
+
+    Raises:
+        ValueError: Si nb_points ou fps n'est pas positif.
+    """
+
+    def __init__(self, tampon, nb_points=60, fps=10, titre="", figsize=(20, 10), dpi=150, stats=None, periode_panneau=1.0, lecteur=None):
+        if nb_points <= 0 or fps <= 0:
+            raise ValueError("nb_points et fps doivent etre positifs.")
+        self.tampon = tampon
+        self.nb_points = nb_points
+        self.fps = fps
+        self.stats = stats
+        self.periode_panneau = periode_panneau
+        self.lecteur = lecteur
+        self.erreur = None # erreur du port affichee, plus aucune image ensuite
+        self.nb_images = 0
+        self.temps_debut = None
+        # instant de reception de la derniere mesure affichee, et son ecart avec l'affichage (secondes)
+        self.temps_affiche = None
+        self.latence = None
+
+        self.fig = plt.figure(figsize=figsize, dpi=dpi)
+        ax = self.fig.gca()
+        ax.set_ylim(0, 350)
+        ax.set_xlim(0, nb_points - 1)
+        self.fig.suptitle(titre)
+        ax.set_title("Val. moyenne sur 10 efforts et val. maxi sur ces 10 mesures (KgF)")
+        ax.grid(True, linestyle="--")
+        ax.grid(which="major", axis="y", linewidth="1", color="black")
+        ax.grid(which="minor", linestyle=":", linewidth="0.5", color="black")
+        ax.minorticks_on()
+        ax.set_ylabel("Moyenne bleu (KgF)")
+        ax.set_xlabel("temps écoulé (s)")
+        # courbes animees : exclues du fond memorise, redessinees seules e chaque image
+        (self.ligne_moy,) = ax.plot([], [], "+-", label="Moy (KgF)", color="blue", animated=True)
+        self.artistes = [self.ligne_moy]
+        if stats is not None:
+            (self.ligne_lisse,) = ax.plot(
+                [], [], "-", label=f"Moy glissante sur {stats.lissage} mesures (KgF)", color="green", linewidth=2, animated=True
+            )
+            # texte long, couteux e dessiner : redessine seulement toutes les periode_panneau secondes
+            self.panneau = self.fig.text(0.01, 0.01, "", family="monospace", va="bottom", animated=True)
+            self.fig.subplots_adjust(bottom=0.25)
+            self.artistes.append(self.ligne_lisse)
+        ax.legend(loc="upper left")
+        self.info = ax.text(0.5, 0.97, "", transform=ax.transAxes, ha="center", va="top", animated=True)
+
+        ax2 = ax.twinx()
+        ax2.set_ylim(0, 300)
+        (self.ligne_max,) = ax2.plot([], [], "+-", label="Max (KgF)", color="red", animated=True)
+        ax2.set_ylabel("Maximum rouge (KgF)")
+        ax2.ticklabel_format(useOffset=False)
+        ax2.legend(loc="upper right")
+        self.artistes += [self.ligne_max, self.info]
+
+        # fond de la figure sans les courbes, memorise e chaque rendu complet (ouverture, redimensionnement),
+        # puis le meme fond avec le panneau de resume
+        self.fond = None
+        self.fond_panneau = None
+        self.prochain_panneau = 0.0
+        self.fig.canvas.mpl_connect("draw_event", self.on_draw)
+        self.timer = None
+
+    def update(self):
+        """
+        Met e jour les donnees des courbes avec les nb_points dernieres mesures du tampon.
+
+        Returns:
+            list: Les artistes e redessiner.
+        """
+        if self.stats is None:
+            temps, valeurs = self.tampon.last(self.nb_points)
+        else:
+            # mesures precedentes en plus pour la moyenne glissante du premier point affiche
+            self.stats.update()
+            temps, valeurs = self.tampon.last(self.nb_points + self.stats.lissage - 1)
+            lisse = self.stats.smooth(valeurs[:, self.stats.colonne])
+            temps, valeurs = temps[-self.nb_points :], valeurs[-self.nb_points :]
+            self.ligne_lisse.set_data(np.arange(len(temps) - len(lisse), len(temps)), lisse)
+        x = np.arange(len(temps))
+        self.ligne_moy.set_data(x, valeurs[:, 0])
+        self.ligne_max.set_data(x, valeurs[:, 1])
+        if len(temps):
+            if self.temps_debut is None:
+                self.temps_debut = temps[0]
+            self.info.set_text(
+                f"Moy = {valeurs[-1, 0]:g}   Max = {valeurs[-1, 1]:g}   "
+                f"temps réel = {temps[-1] - self.temps_debut:.1f} s   mesures = {self.tampon.total}"
+            )
+            self.temps_affiche = temps[-1]
+        return self.artistes
+
+    def on_draw(self, event):
+        # rendu complet : nouveau fond, puis courbes par-dessus
+        self.fond = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.fond_panneau = None
+        for artiste in self.artistes:
+            self.fig.draw_artist(artiste)
+
+    def draw_frame(self):
+        """
+        Affiche une image : restauration du fond, mise e jour et dessin des seules courbes,
+        puis copie de la zone de la figure e l'ecran (blitting).
+        """
+        if self.erreur is not None:
+            return
+        if self.fond is None:
+            self.fig.canvas.draw()
+        self.update()
+        if self.lecteur is not None and self.lecteur.erreur is not None:
+            # derniere image : les dernieres mesures et l'erreur
+            self.erreur = self.lecteur.erreur
+            self.info.set_text(f"Lecture interrompue : {self.erreur}")
+            self.info.set_color("red")
+            if self.timer is not None:
+                self.timer.stop()
+        if self.stats is not None and (self.fond_panneau is None or time.monotonic() >= self.prochain_panneau):
+            self.fig.canvas.restore_region(self.fond)
+            self.panneau.set_text(self.stats.format_summary())
+            self.fig.draw_artist(self.panneau)
+            self.fond_panneau = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+            self.prochain_panneau = time.monotonic() + self.periode_panneau
+        self.fig.canvas.restore_region(self.fond if self.fond_panneau is None else self.fond_panneau)
+        for artiste in self.artistes:
+            self.fig.draw_artist(artiste)
+        self.fig.canvas.blit(self.fig.bbox)
+        self.nb_images += 1
+        if self.temps_debut is not None:
+            self.latence = time.time() - self.temps_affiche
+
+    def start(self):
+        """
+        Lance l'affichage (sans bloquer) : une image toutes les 1/fps secondes, quel que soit
+        le rythme des mesures.
+        """
+        self.timer = self.fig.canvas.new_timer(interval=int(1000 / self.fps))
+        self.timer.add_callback(self.draw_frame)
+        self.timer.start()
+
+    def show(self):
+        """
+        Lance l'affichage et montre la fenetre jusqu'e sa fermeture.
+        """
+        self.start()
+        plt.show()
@@ -0,0 +1,385 @@
+# Statistiques glissantes calculees en direct sur les mesures du tampon circulaire (acquisition.py),
+# au lieu de se contenter de la moyenne et du maximum calcules par l'Arduino : moyenne,
+# ecart-type, maximum et centiles sur des fenetres de temps configurables, et cumul de l'effort.
+# Chaque mesure est prise en compte en O(1) : les calculs ne ralentissent ni avec la duree
+# des fenetres ni avec celle de la session. La memoire d'une fenetre depend de sa duree,
+# celle des statistiques de la session est constante.
+
+import importlib.util
+import math
+import os
+import sys
+import time
+from collections import deque
+import numpy as np
+
+
+def import_parent_module(nom):
+    """
+    Importe un module du dossier parent (celui de datafficheur.py) d'apres son chemin,
+    sans modifier sys.path. Le module deje importe sous ce nom est reutilise.
+
+    Args:
+        nom (str): Le nom du module (ex. "utils").
+
+    Returns:
+        module: Le module importe.
+    """
+    chemin = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), nom + ".py")
+    module = sys.modules.get(nom)
+    if module is not None and os.path.abspath(getattr(module, "__file__", "") or "") == chemin:
+        return module
+    spec = importlib.util.spec_from_file_location(nom, chemin)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # un autre module du meme nom (d'un autre projet) n'est pas remplace
+    sys.modules.setdefault(nom, module)
+    return module
+
+
+moving_average = import_parent_module("utils").moving_average
+
+G = 9.81 # Acceleration de la pesanteur (m/s2), pour convertir les kgF en newtons
+
+
+class HistogramSketch:
+    """
+    Histogramme e classes fixes des valeurs, pour estimer les centiles d'un flux :
+    ajout et retrait d'une valeur en O(1), centiles e la largeur d'une classe pres.
+    Les valeurs hors de [minimum, maximum[ sont comptees dans la premiere ou la derniere classe.
+
+    Args:
+        minimum (float, optional): Borne inferieure de l'histogramme (kgF). Par defaut : -50.
+        maximum (float, optional): Borne superieure de l'histogramme (kgF). Par defaut : 1000.
+        pas (float, optional): Largeur d'une classe (kgF). Par defaut : 0.5.
+
+    Raises:
+        ValueError: Si pas n'est pas positif ou si maximum n'est pas superieur e minimum.
+    """
+
+    def __init__(self, minimum=-50.0, maximum=1000.0, pas=0.5):
+        if pas <= 0 or maximum <= minimum:
+            raise ValueError("pas doit etre positif et maximum superieur e minimum.")
+        self.minimum = minimum
+        self.pas = pas
+        self.comptes = np.zeros(int(math.ceil((maximum - minimum) / pas)), dtype=np.int64)
+        self.nombre = 0
+
+    def index(self, valeur):
+        return min(max(int((valeur - self.minimum) // self.pas), 0), len(self.comptes) - 1)
+
+    def add(self, valeur):
+        self.comptes[self.index(valeur)] += 1
+        self.nombre += 1
+
+    def remove(self, valeur):
+        self.comptes[self.index(valeur)] -= 1
+        self.nombre -= 1
+
+    def quantiles(self, q):
+        """
+        Estime des quantiles par le centre de la classe qui les contient.
+
+        Args:
+            q (array-like of float): Les quantiles voulus, entre 0 et 1.
+
+        Returns:
+            numpy.ndarray: Les valeurs estimees, NaN si l'histogramme est vide.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if self.nombre == 0:
+            return np.full(q.shape, np.nan)
+        cumul = np.cumsum(self.comptes)
+        rangs = np.maximum(np.ceil(q * self.nombre), 1)
+        return self.minimum + (np.searchsorted(cumul, rangs) + 0.5) * self.pas
+
+
+class RollingWindow:
+    """
+    Statistiques des mesures des duree dernieres secondes, mises e jour en O(1) par mesure :
+    sommes des valeurs et de leurs carres pour la moyenne et l'ecart-type, file monotone
+    decroissante pour le maximum, histogramme pour les centiles.
+
+    Args:
+        duree (float): La duree de la fenetre en secondes (voir SessionStats pour toute la session).
+        **histogramme: Les parametres de HistogramSketch.
+    """
+
+    def __init__(self, duree, **histogramme):
+        self.duree = duree
+        self.mesures = deque() # (numero, temps, valeur) dans l'ordre d'arrivee
+        self.maxima = deque() # (numero, valeur), valeurs decroissantes : le maximum est en tete
+        self.histogramme = HistogramSketch(**histogramme)
+        self.somme = 0.0
+        self.somme_carres = 0.0
+        self.numero = 0
+        self.nb_retraits = 0
+
+    def __len__(self):
+        return len(self.mesures)
+
+    def add(self, temps, valeur):
+        """
+        Ajoute une mesure puis retire celles sorties de la fenetre.
+
+        Args:
+            temps (float): L'instant de la mesure (secondes, time.time()).
+            valeur (float): La valeur.
+        """
+        self.mesures.append((self.numero, temps, valeur))
+        while self.maxima and self.maxima[-1][1] <= valeur:
+            self.maxima.pop()
+        self.maxima.append((self.numero, valeur))
+        self.numero += 1
+        self.somme += valeur
+        self.somme_carres += valeur * valeur
+        self.histogramme.add(valeur)
+        self.evict(temps)
+
+    def evict(self, maintenant):
+        """
+        Retire les mesures plus anciennes que la duree de la fenetre.
+
+        Args:
+            maintenant (float): L'instant de reference (secondes, time.time()).
+        """
+        while self.mesures and self.mesures[0][1] <= maintenant - self.duree:
+            numero, _, valeur = self.mesures.popleft()
+            if self.maxima[0][0] == numero:
+                self.maxima.popleft()
+            self.somme -= valeur
+            self.somme_carres -= valeur * valeur
+            self.histogramme.remove(valeur)
+            self.nb_retraits += 1
+        if self.nb_retraits > max(len(self.mesures), 10000):
+            # les soustractions successives accumulent des erreurs d'arrondi : recalcul des sommes
+            valeurs = np.array([valeur for _, _, valeur in self.mesures])
+            self.somme = float(valeurs.sum())
+            self.somme_carres = float(np.dot(valeurs, valeurs))
+            self.nb_retraits = 0
+
+    @property
+    def moyenne(self):
+        return self.somme / len(self.mesures) if self.mesures else math.nan
+
+    @property
+    def ecart_type(self):
+        # ddof=1, comme distribution.histogram_stats
+        n = len(self.mesures)
+        if n < 2:
+            return math.nan
+        return math.sqrt(max((self.somme_carres - self.somme * self.somme / n) / (n - 1), 0.0))
+
+    @property
+    def maximum(self):
+        return self.maxima[0][1] if self.maxima else math.nan
+
+
+class SessionStats:
+    """
+    Statistiques de toutes les mesures depuis le debut, en memoire constante : nombre,
+    moyenne et ecart-type mis e jour par la methode de Welford, maximum, histogramme
+    pour les centiles. Memes proprietes que RollingWindow.
+
+    Args:
+        **histogramme: Les parametres de HistogramSketch.
+    """
+
+    duree = math.inf
+
+    def __init__(self, **histogramme):
+        self.histogramme = HistogramSketch(**histogramme)
+        self.nombre = 0
+        self.moyenne_courante = 0.0
+        self.m2 = 0.0 # somme des carres des ecarts e la moyenne
+        self.max = -math.inf
+
+    def __len__(self):
+        return self.nombre
+
+    def add(self, temps, valeur):
+        """
+        Ajoute une mesure.
+
+        Args:
+            temps (float): L'instant de la mesure (inutilise, comme dans RollingWindow.add).
+            valeur (float): La valeur.
+        """
+        self.nombre += 1
+        ecart = valeur - self.moyenne_courante
+        self.moyenne_courante += ecart / self.nombre
+        self.m2 += ecart * (valeur - self.moyenne_courante)
+        self.max = max(self.max, valeur)
+        self.histogramme.add(valeur)
+
+    @property
+    def moyenne(self):
+        return self.moyenne_courante if self.nombre else math.nan
+
+    @property
+    def ecart_type(self):
+        # ddof=1, comme distribution.histogram_stats
+        return math.sqrt(self.m2 / (self.nombre - 1)) if self.nombre > 1 else math.nan
+
+    @property
+    def maximum(self):
+        return self.max if self.nombre else math.nan
+
+
+def window_label(duree):
+    # libelle d'une fenetre : "10 s", "5 min", "session"
+    if math.isinf(duree):
+        return "session"
+    if duree >= 60 and duree % 60 == 0:
+        return f"{duree / 60:g} min"
+    return f"{duree:g} s"
+
+
+class LiveStats:
+    """
+    Statistiques en direct d'une colonne du tampon circulaire, sur plusieurs fenetres de
+    temps et sur toute la session, avec le cumul de l'effort dans le temps (impulsion, en
+    kgF.s) et, si la vitesse d'avancement est connue, le travail fourni (en joules).
+
+    Les nouvelles mesures sont lues dans le tampon e chaque appel de update (par exemple
+    e chaque image de LivePlot), sans thread supplementaire.
+
+    Args:
+        tampon (acquisition.RingBuffer): Le tampon des mesures.
+        fenetres (list of float, optional): Les durees des fenetres en secondes. Par defaut : (10, 60, 600).
+        colonne (int, optional): La colonne du tampon (0 : Moy, 1 : Max). Par defaut : 0.
+        lissage (int, optional): Nombre de mesures de la moyenne glissante affichee. Par defaut : 10.
+        vitesse_avancement (float, optional): Vitesse d'avancement constante en km/h pour le travail, None si inconnue. Par defaut : None.
+        ecart_max (float, optional): Ecart maximal (s) entre deux mesures pris en compte dans le cumul,
+            au-dele la liaison est consideree comme interrompue. Par defaut : 5.
+        centiles (list of float, optional): Les centiles affiches. Par defaut : (50, 90, 99).
+        **histogramme: Les parametres de HistogramSketch.
+
+    Raises:
+        ValueError: Si une fenetre ou lissage n'est pas positif.
+    """
+
+    def __init__(
+        self,
+        tampon,
+        fenetres=(10, 60, 600),
+        colonne=0,
+        lissage=10,
+        vitesse_avancement=None,
+        ecart_max=5.0,
+        centiles=(50, 90, 99),
+        **histogramme,
+    ):
+        if any(duree <= 0 for duree in fenetres) or lissage <= 0:
+            raise ValueError("Les fenetres et lissage doivent etre positifs.")
+        self.tampon = tampon
+        self.colonne = colonne
+        self.lissage = lissage
+        self.vitesse_avancement = vitesse_avancement
+        self.ecart_max = ecart_max
+        self.centiles = list(centiles)
+        self.fenetres = [RollingWindow(duree, **histogramme) for duree in fenetres]
+        self.session = SessionStats(**histogramme)
+        self.position = tampon.total
+        self.nb_perdues = 0 # ecrasees dans le tampon avant d'etre lues
+        self.impulsion = 0.0
+        self.dernier = None # (temps, valeur) de la mesure precedente
+
+    def update(self):
+        """
+        Prend en compte les mesures recues depuis l'appel precedent.
+
+        Returns:
+            int: Le nombre de nouvelles mesures.
+        """
+        temps, valeurs, self.position, perdues = self.tampon.read_since(self.position)
+        self.nb_perdues += perdues
+        for t, valeur in zip(temps.tolist(), valeurs[:, self.colonne].tolist()):
+            self.add(t, valeur)
+        # les fenetres se vident aussi quand plus rien n'arrive
+        maintenant = time.time()
+        for fenetre in self.fenetres:
+            fenetre.evict(maintenant)
+        return len(temps)
+
+    def add(self, temps, valeur):
+        """
+        Prend en compte une mesure (les mesures NaN sont ignorees).
+
+        Args:
+            temps (float): L'instant de reception (secondes, time.time()).
+            valeur (float): La valeur.
+        """
+        if math.isnan(valeur):
+            return
+        for fenetre in self.fenetres:
+            fenetre.add(temps, valeur)
+        self.session.add(temps, valeur)
+        if self.dernier is not None:
+            ecart = temps - self.dernier[0]
+            if 0 < ecart <= self.ecart_max:
+                # methode des trapezes
+                self.impulsion += (valeur + self.dernier[1]) / 2 * ecart
+        self.dernier = (temps, valeur)
+
+    @property
+    def travail(self):
+        # effort (N) x distance (m), e vitesse constante : impulsion x g x vitesse
+        if self.vitesse_avancement is None:
+            return None
+        return self.impulsion * G * self.vitesse_avancement / 3.6
+
+    def smooth(self, valeurs):
+        """
+        Moyenne glissante des lissage dernieres mesures, sans effet de bord.
+
+        Args:
+            valeurs (numpy.ndarray): Les valeurs de la colonne, dans l'ordre chronologique.
+
+        Returns:
+            numpy.ndarray: len(valeurs) - lissage + 1 valeurs, la derniere pour la derniere mesure (vide si trop peu de mesures).
+        """
+        if len(valeurs) < self.lissage:
+            return np.zeros(0)
+        return moving_average(valeurs, self.lissage, mode="valid")
+
+    def summary(self):
+        """
+        Les statistiques de chaque fenetre et de la session.
+
+        Returns:
+            dict: Par libelle de fenetre ("10 s", ..., "session"), un dictionnaire avec nombre,
+            moyenne, ecart_type, maximum et p<centile> pour chaque centile.
+        """
+        resume = {}
+        for fenetre in self.fenetres + [self.session]:
+            stats = {
+                "nombre": len(fenetre),
+                "moyenne": fenetre.moyenne,
+                "ecart_type": fenetre.ecart_type,
+                "maximum": fenetre.maximum,
+            }
+            for centile, valeur in zip(self.centiles, fenetre.histogramme.quantiles(np.array(self.centiles) / 100)):
+                stats[f"p{centile:g}"] = valeur
+            resume[window_label(fenetre.duree)] = stats
+        return resume
+
+    def format_summary(self):
+        """
+        Le resume en texte, une ligne par fenetre puis le cumul (panneau de LivePlot et fin de session).
+
+        Returns:
+            str: Le texte.
+        """
+        lignes = []
+        for libelle, stats in self.summary().items():
+            centiles = "  ".join(f"p{centile:g} {stats[f'p{centile:g}']:6.1f}" for centile in self.centiles)
+            lignes.append(
+                f"{libelle:>8} : moy {stats['moyenne']:6.1f}  σ {stats['ecart_type']:5.1f}  "
+                f"max {stats['maximum']:6.1f}  {centiles}  ({stats['nombre']} mesures)"
+            )
+        cumul = f"{'cumul':>8} : impulsion {self.impulsion:.0f} kgF.s"
+        if self.travail is not None:
+            cumul += f"  travail {self.travail / 1000:.1f} kJ ({self.vitesse_avancement:g} km/h)"
+        lignes.append(cumul)
+        return "\n".join(lignes)
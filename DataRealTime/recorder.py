@@ -0,0 +1,149 @@
+# Enregistrement sur disque des mesures recues en direct, au format des fichiers du
+# Datafficheur : un dossier par valeur (Moy, Max) lisible tel quel par datafficheur.py
+# (python datafficheur.py -d <dossier>/Moy), un fichier MMDDhhmm.TXT par minute.
+
+import math
+import os
+import threading
+import time
+
+
+class Recorder(threading.Thread):
+    """
+    Thread d'enregistrement : relit les nouvelles mesures du tampon circulaire et les
+    ajoute aux fichiers de la minute en cours, sans jamais bloquer la lecture du port serie.
+
+    Chaque ligne ecrite correspond e une seconde, comme les trames du Datafficheur :
+    compteur, date, heure puis frequence_acquisition champs, un par dixieme de seconde.
+    Chaque mesure est rangee dans le champ de son dixieme de seconde de reception, les
+    autres champs restent vides (ignores par datafficheur.py), comme les valeurs NaN ;
+    une mesure dont toutes les valeurs sont NaN n'est pas enregistree. Les ecritures sont
+    bufferisees et les fichiers sont synchronises sur le disque (fsync) toutes les
+    periode_fsync secondes, e chaque changement de minute et e l'arret.
+
+    Args:
+        tampon (acquisition.RingBuffer): Le tampon des mesures.
+        dossier (str): Le dossier de l'enregistrement, cree si besoin.
+        noms (list of str, optional): Le sous-dossier de chaque colonne du tampon. Par defaut : ("Moy", "Max").
+        periode_fsync (float, optional): Duree maximale en secondes entre deux synchronisations. Par defaut : 5.
+        frequence_acquisition (int, optional): Nombre de champs par ligne (dixiemes de seconde). Par defaut : 10.
+    """
+
+    def __init__(self, tampon, dossier, noms=("Moy", "Max"), periode_fsync=5.0, frequence_acquisition=10):
+        super().__init__(name="enregistrement", daemon=True)
+        self.tampon = tampon
+        self.dossier = dossier
+        self.noms = list(noms)
+        self.periode_fsync = periode_fsync
+        self.frequence_acquisition = frequence_acquisition
+        for nom in self.noms:
+            os.makedirs(os.path.join(dossier, nom), exist_ok=True)
+
+        self.position = tampon.total # seules les mesures recues e partir du lancement sont enregistrees
+        self.nb_mesures = 0
+        self.nb_perdues = 0 # ecrasees dans le tampon avant d'etre enregistrees
+        self.nb_collisions = 0 # deux mesures dans le meme dixieme de seconde, la premiere est gardee
+        self.compteur = 0
+        self.seconde = None
+        self.champs = None
+        self.minute = None
+        self.fichiers = []
+        self.derniere_synchro = time.monotonic()
+        self.arret = threading.Event()
+
+    def run(self):
+        while not self.arret.is_set():
+            self.tampon.wait(self.position, timeout=min(self.periode_fsync, 1.0))
+            self.drain()
+            if time.monotonic() - self.derniere_synchro >= self.periode_fsync:
+                self.sync()
+        self.drain()
+        self.flush_row()
+        self.close()
+
+    def drain(self):
+        """
+        Ecrit les mesures recues depuis le passage precedent.
+        """
+        temps, valeurs, self.position, perdues = self.tampon.read_since(self.position)
+        self.nb_perdues += perdues
+        for t, mesure in zip(temps.tolist(), valeurs.tolist()):
+            self.write_sample(t, mesure)
+
+    def write_sample(self, temps, mesure):
+        """
+        Range une mesure dans la ligne de sa seconde, la ligne precedente est ecrite
+        quand une mesure d'une autre seconde arrive.
+
+        Args:
+            temps (float): L'instant de reception (secondes, time.time()).
+            mesure (list of float): Une valeur par colonne (noms).
+        """
+        seconde = math.floor(temps)
+        if seconde != self.seconde:
+            self.flush_row()
+            self.seconde = seconde
+            self.champs = [[""] * self.frequence_acquisition for _ in self.noms]
+        if all(math.isnan(valeur) for valeur in mesure):
+            # rien e ecrire : le champ reste libre pour une mesure du meme dixieme
+            return
+        dixieme = min(int((temps - seconde) * self.frequence_acquisition), self.frequence_acquisition - 1)
+        # une colonne seulement peut etre remplie (l'autre valeur etait NaN)
+        if any(champs[dixieme] != "" for champs in self.champs):
+            self.nb_collisions += 1
+            return
+        for champs, valeur in zip(self.champs, mesure):
+            champs[dixieme] = "" if math.isnan(valeur) else f"{valeur:g}"
+        self.nb_mesures += 1
+
+    def flush_row(self):
+        """
+        Ecrit la ligne de la seconde en cours dans le fichier de chaque colonne, en
+        changeant de fichier au changement de minute.
+        """
+        if self.seconde is None:
+            return
+        date = time.localtime(self.seconde)
+        minute = time.strftime("%m%d%H%M", date)
+        if minute != self.minute:
+            self.close()
+            self.minute = minute
+            self.fichiers = [
+                open(os.path.join(self.dossier, nom, minute + ".TXT"), "a", newline="")
+                for nom in self.noms
+            ]
+        self.compteur += 1
+        debut = f"{self.compteur},{time.strftime('%d/%m/%Y,%H:%M:%S', date)},"
+        for fichier, champs in zip(self.fichiers, self.champs):
+            fichier.write(debut + ",".join(champs) + "\r\n")
+        self.seconde = None
+
+    def sync(self):
+        """
+        Synchronise les fichiers ouverts sur le disque.
+        """
+        for fichier in self.fichiers:
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        self.derniere_synchro = time.monotonic()
+
+    def close(self):
+        """
+        Synchronise puis ferme les fichiers de la minute en cours.
+        """
+        self.sync()
+        for fichier in self.fichiers:
+            fichier.close()
+        self.fichiers = []
+        self.minute = None
+
+    def stop(self, timeout=None):
+        """
+        Demande l'arret du thread : les dernieres mesures et la ligne en cours sont
+        ecrites, puis les fichiers sont synchronises et fermes.
+
+        Args:
+            timeout (float, optional): Duree maximale d'attente en secondes. Par defaut : None.
+        """
+        self.arret.set()
+        self.join(timeout)
@@ -0,0 +1,319 @@
+# Sources des lignes lues par SerialReader (acquisition.py) : le port serie de l'Arduino,
+# un pseudo-terminal alimente par un simulateur, ou la relecture d'une session enregistree.
+# Toutes offrent readline() et close() comme serial.Serial, avec un delai de lecture.
+
+import math
+import os
+import re
+import select
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone
+import numpy as np
+
+
+def format_line(moy, max):
+    """
+    Ligne envoyee par l'Arduino pour une mesure (inverse de acquisition.parse_line).
+
+    Args:
+        moy (float): La moyenne des 10 derniers efforts.
+        max (float): Leur maximum.
+
+    Returns:
+        bytes: La ligne, terminee par \\r\\n.
+    """
+    return f"{moy:g} ; {max:g}\r\n".encode()
+
+
+def open_serial(port, baudrate, timeout=0.5):
+    """
+    Ouvre le port serie de l'Arduino (pyserial n'est importe qu'ici).
+
+    Args:
+        port (str): Le port (ex. "/dev/ttyUSB0", "COM4" ou le pseudo-terminal d'un PtySimulator).
+        baudrate (int): La vitesse du port.
+        timeout (float, optional): Delai maximal d'une lecture en secondes. Par defaut : 0.5.
+
+    Returns:
+        serial.Serial: Le port ouvert.
+    """
+    import serial
+
+    return serial.Serial(port, baudrate, timeout=timeout)
+
+
+def read_minute_file(lignes, frequence_acquisition=10):
+    """
+    Decode les lignes d'un fichier MMDDhhmm.TXT de la carte SD : compteur, date, heure puis
+    frequence_acquisition echantillons par capteur, les capteurs les uns apres les autres.
+    Les echantillons vides sont ignores, les lignes illisibles aussi.
+
+    Args:
+        lignes (iterable of bytes): Les lignes du fichier.
+        frequence_acquisition (int, optional): Nombre d'echantillons par seconde. Par defaut : 10.
+
+    Returns:
+        tuple: Un tuple (temps, total) : l'instant de chaque echantillon en secondes (heure
+        du fichier lue comme UTC) et la somme des capteurs, NaN si tous sont vides.
+    """
+    temps, total = [], []
+    for ligne in lignes:
+        champs = ligne.decode("ascii", "replace").strip().split(",")
+        nb_capteurs = (len(champs) - 3) // frequence_acquisition
+        if nb_capteurs == 0:
+            continue
+        try:
+            seconde = datetime.strptime(champs[1] + " " + champs[2], "%d/%m/%Y %H:%M:%S")
+            valeurs = [float(v) if v.strip() else math.nan for v in champs[3 : 3 + nb_capteurs * frequence_acquisition]]
+        except ValueError:
+            continue
+        seconde = seconde.replace(tzinfo=timezone.utc).timestamp()
+        for k in range(frequence_acquisition):
+            echantillons = [v for v in valeurs[k::frequence_acquisition] if not math.isnan(v)]
+            temps.append(seconde + k / frequence_acquisition)
+            total.append(sum(echantillons) if echantillons else math.nan)
+    return np.array(temps, dtype=np.float64), np.array(total, dtype=np.float64)
+
+
+def read_session_total(dir):
+    """
+    Total des capteurs d'une session de la carte SD (dossier ou archive ZIP), comme la
+    colonne ("Total", "Efforts") de datafficheur.py : fichiers ordonnes par leur premier
+    echantillon, l'echantillon du fichier qui commence le plus tot l'emporte sur ses
+    doublons, echantillons sans aucune valeur ignores.
+
+    Args:
+        dir (str): Le dossier ou l'archive ZIP de la session.
+
+    Returns:
+        tuple: Un tuple (temps, total) trie par temps (voir read_minute_file).
+    """
+    motif = re.compile(r"[0-9]{8}.txt$", re.IGNORECASE)
+    fichiers = []
+    if zipfile.is_zipfile(dir):
+        with zipfile.ZipFile(dir) as archive:
+            for membre in sorted(archive.namelist(), key=lambda m: (os.path.basename(m), m)):
+                if motif.match(os.path.basename(membre)):
+                    fichiers.append(read_minute_file(archive.read(membre).splitlines()))
+    else:
+        for nom in sorted(os.listdir(dir)):
+            if motif.match(nom):
+                with open(os.path.join(dir, nom), "rb") as fichier:
+                    fichiers.append(read_minute_file(fichier))
+    fichiers = sorted((f for f in fichiers if len(f[0])), key=lambda f: f[0][0])
+    if not fichiers:
+        return np.zeros(0), np.zeros(0)
+    temps = np.concatenate([f[0] for f in fichiers])
+    total = np.concatenate([f[1] for f in fichiers])
+    # premiere occurrence de chaque instant, dans l'ordre des fichiers
+    temps, premiers = np.unique(temps, return_index=True)
+    total = total[premiers]
+    presents = ~np.isnan(total)
+    return temps[presents], total[presents]
+
+
+def load_replay(dir):
+    """
+    Charge les mesures e rejouer depuis une session :
+    - un enregistrement de DataMoyGraph (sous-dossiers Moy et Max, voir recorder.py), rejoue tel quel ;
+    - une session de la carte SD (dossier ou archive ZIP) : la moyenne et le maximum du
+      Total de chaque groupe de 10 echantillons, comme le calcule l'Arduino.
+
+    Args:
+        dir (str): Le dossier ou l'archive de la session.
+
+    Returns:
+        tuple: Un tuple (temps, valeurs) ou temps est en secondes (float) et valeurs le
+        tableau (n, 2) des colonnes Moy et Max.
+
+    Raises:
+        ValueError: Si la session ne contient aucune mesure.
+    """
+    if os.path.isdir(os.path.join(dir, "Moy")) and os.path.isdir(os.path.join(dir, "Max")):
+        temps, moy = read_session_total(os.path.join(dir, "Moy"))
+        temps_max, max = read_session_total(os.path.join(dir, "Max"))
+        if len(temps) == 0:
+            raise ValueError(f"Aucune mesure dans {dir}")
+        # Max de chaque instant de Moy, NaN s'il manque
+        valeurs_max = np.full(len(temps), np.nan)
+        _, i, j = np.intersect1d(temps, temps_max, assume_unique=True, return_indices=True)
+        valeurs_max[i] = max[j]
+        return temps, np.column_stack((moy, valeurs_max))
+
+    temps, total = read_session_total(dir)
+    n = len(total) // 10 * 10
+    if n == 0:
+        raise ValueError(f"Aucune mesure dans {dir}")
+    groupes = total[:n].reshape(-1, 10)
+    return temps[9:n:10], np.column_stack((groupes.mean(axis=1), groupes.max(axis=1)))
+
+
+class ReplaySource:
+    """
+    Relecture de mesures comme si elles arrivaient sur le port serie, en temps reel
+    (vitesse 1), accelere (vitesse 10) ou aussi vite que possible (vitesse 0).
+
+    Args:
+        temps (array-like of float): Les instants des mesures en secondes.
+        valeurs (array-like): Les mesures (Moy, Max).
+        vitesse (float, optional): Facteur d'acceleration, 0 pour ne pas attendre. Par defaut : 1.
+        timeout (float, optional): Delai maximal d'une lecture en secondes. Par defaut : 0.5.
+    """
+
+    def __init__(self, temps, valeurs, vitesse=1.0, timeout=0.5):
+        self.temps = np.asarray(temps, dtype=np.float64)
+        self.lignes = [format_line(moy, max) for moy, max in np.asarray(valeurs).tolist()]
+        self.vitesse = vitesse
+        self.timeout = timeout
+        self.position = 0
+        self.debut = None
+        # instant d'envoi de chaque ligne (time.time()), NaN si elle n'a pas ete envoyee
+        self.envois = np.full(len(self.lignes), np.nan)
+
+    @property
+    def fin(self):
+        return self.position >= len(self.lignes)
+
+    def readline(self):
+        if self.fin:
+            time.sleep(self.timeout)
+            return b""
+        if self.debut is None:
+            self.debut = time.monotonic()
+        if self.vitesse:
+            attente = self.debut + (self.temps[self.position] - self.temps[0]) / self.vitesse - time.monotonic()
+            if attente > self.timeout:
+                time.sleep(self.timeout)
+                return b""
+            if attente > 0:
+                time.sleep(attente)
+        ligne = self.lignes[self.position]
+        self.envois[self.position] = time.time()
+        self.position += 1
+        return ligne
+
+    def close(self):
+        self.position = len(self.lignes)
+
+
+class TtyPort:
+    """
+    Lecture ligne par ligne d'un terminal (ou pseudo-terminal) deje ouvert, avec un delai,
+    comme serial.Serial.readline : sans pyserial, pour les mesures de debit.
+
+    Args:
+        fd (int): Le descripteur du terminal.
+        timeout (float, optional): Delai maximal d'une lecture en secondes. Par defaut : 0.5.
+    """
+
+    def __init__(self, fd, timeout=0.5):
+        self.fd = fd
+        self.timeout = timeout
+        self.recu = b""
+
+    def readline(self):
+        limite = time.monotonic() + self.timeout
+        while b"\n" not in self.recu:
+            reste = limite - time.monotonic()
+            if reste <= 0 or not select.select([self.fd], [], [], reste)[0]:
+                break
+            self.recu += os.read(self.fd, 4096)
+        fin = self.recu.find(b"\n") + 1
+        if fin == 0:
+            # delai ecoule : ligne partielle, comme pyserial
+            ligne, self.recu = self.recu, b""
+        else:
+            ligne, self.recu = self.recu[:fin], self.recu[fin:]
+        return ligne
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PtySimulator(threading.Thread):
+    """
+    Simulateur de l'Arduino sur un pseudo-terminal : les mesures sont ecrites au rythme
+    voulu sur le cote maitre, le cote esclave (nom) s'ouvre comme un port serie
+    (DataMoyGraph.py --port <nom>) ou se lit avec TtyPort.
+
+    Args:
+        temps (array-like of float): Les instants des mesures en secondes.
+        valeurs (array-like): Les mesures (Moy, Max).
+        vitesse (float, optional): Facteur d'acceleration, 0 pour ecrire aussi vite que possible. Par defaut : 1.
+    """
+
+    def __init__(self, temps, valeurs, vitesse=1.0):
+        super().__init__(name="simulateur-pty", daemon=True)
+        import tty
+
+        self.temps = np.asarray(temps, dtype=np.float64)
+        self.lignes = [format_line(moy, max) for moy, max in np.asarray(valeurs).tolist()]
+        self.vitesse = vitesse
+        self.maitre, self.esclave = os.openpty()
+        # pas d'echo ni de traitement des fins de ligne, comme une liaison serie
+        tty.setraw(self.esclave)
+        self.nom = os.ttyname(self.esclave)
+        # instant d'envoi de chaque ligne (time.time()), NaN si elle n'a pas ete envoyee
+        self.envois = np.full(len(self.lignes), np.nan)
+        self.arret = threading.Event()
+
+    def run(self):
+        debut = time.monotonic()
+        for i, ligne in enumerate(self.lignes):
+            if self.arret.is_set():
+                break
+            if self.vitesse:
+                attente = debut + (self.temps[i] - self.temps[0]) / self.vitesse - time.monotonic()
+                if attente > 0:
+                    time.sleep(attente)
+            self.envois[i] = time.time()
+            while ligne:
+                ligne = ligne[os.write(self.maitre, ligne):]
+
+    def port(self, timeout=0.5):
+        """
+        Le cote esclave du pseudo-terminal, lu par TtyPort.
+
+        Args:
+            timeout (float, optional): Delai maximal d'une lecture en secondes. Par defaut : 0.5.
+
+        Returns:
+            TtyPort: Le port.
+        """
+        return TtyPort(self.esclave, timeout)
+
+    def stop(self, timeout=None):
+        """
+        Arrete l'envoi et ferme le cote maitre : le lecteur du cote esclave doit etre arrete avant.
+
+        Args:
+            timeout (float, optional): Duree maximale d'attente en secondes. Par defaut : None.
+        """
+        self.arret.set()
+        self.join(timeout)
+        os.close(self.maitre)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="DataMoyGraph-simulateur",
+        description="Simule l'Arduino sur un pseudo-terminal en rejouant une session : "
+        "lancer ensuite DataMoyGraph.py --port <pseudo-terminal affiche>.",
+    )
+    parser.add_argument("session", help="Enregistrement de DataMoyGraph ou session de la carte SD (dossier ou archive ZIP).")
+    parser.add_argument("--vitesse", type=float, help="Facteur d'acceleration, 0 pour aussi vite que possible. Par defaut: 1", default=1.0)
+    args = parser.parse_args()
+
+    simulateur = PtySimulator(*load_replay(args.session), args.vitesse)
+    print("Pseudo-terminal :", simulateur.nom)
+    simulateur.start()
+    try:
+        while simulateur.is_alive():
+            simulateur.join(0.5)
+    except KeyboardInterrupt:
+        pass
+    simulateur.stop()
@@ -0,0 +1,225 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from constants import OUTPUT, OUTPUTPLOT, OUTPUTFILE, PLOTHTICKS, DEFAULT_TIMEZONE, BINARY_FORMATS
+
+
+def expand_sessions(motifs):
+    """
+    Liste les sessions designees par des chemins ou des motifs glob : dossiers de donnees
+    Datafficheur ou archives ZIP.
+
+    Args:
+        motifs (list of str): Les chemins ou motifs (ex. "data_test/*.zip").
+
+    Returns:
+        list: Les chemins des sessions, dans l'ordre des motifs puis par nom, sans doublon.
+    """
+    from utils import is_archive
+
+    sessions = []
+    for motif in motifs:
+        for chemin in sorted(glob.glob(motif)) or [motif]:
+            if (os.path.isdir(chemin) or is_archive(chemin)) and chemin not in sessions:
+                sessions.append(chemin)
+    return sessions
+
+
+def process_session(session, note="note.csv", plot=True, verbose=False, output=OUTPUT, cache=True, formats=(), raw=False, resume=False, pyramide=False):
+    """
+    Traite une session complete (lecture, fusion, prepare_data, add_notes, graphiques,
+    CSV) dans le processus courant, sans affichage e l'ecran.
+
+    Args:
+        session (str): Le dossier ou l'archive ZIP de la session.
+        note (str, optional): Le nom du fichier contenant les notes. Par defaut : "note.csv".
+        plot (bool, optional): Indique si les graphiques doivent etre crees. Par defaut : True.
+        verbose (bool, optional): Si vrai, affiche des messages supplementaires. Par defaut : False.
+        output (str, optional): Le nom du fichier CSV de sortie. Par defaut : OUTPUT.
+        cache (bool, optional): Indique si le cache des fichiers deja analyses doit etre utilise. Par defaut : True.
+        formats (list of str, optional): Formats binaires crees en plus du CSV. Par defaut : ().
+        raw (bool, optional): Si vrai, la courbe d'effort trace tous les echantillons. Par defaut : False.
+        resume (bool, optional): Si vrai, le resume des efforts est enregistre. Par defaut : False.
+        pyramide (bool, optional): Si vrai, la pyramide des efforts est enregistree. Par defaut : False.
+
+    Returns:
+        tuple: Un tuple (session, duree, erreur) ou duree est en secondes et erreur l'exception
+        levee (None si la session a ete traitee).
+    """
+    if plot:
+        import matplotlib
+
+        # les processus du pool n'affichent rien : pas de fenetre, backend Agg
+        matplotlib.use("Agg")
+    from datafficheur import main
+
+    debut = time.perf_counter()
+    try:
+        hasNote = os.path.exists(os.path.join(session, note))
+        main(
+            session, hasNote, note, plot, verbose, OUTPUTPLOT, DEFAULT_TIMEZONE, output,
+            1, cache, formats, raw, False, resume, OUTPUTFILE, PLOTHTICKS, pyramide=pyramide,
+        )
+        erreur = None
+    except Exception as e:
+        erreur = e
+    return session, time.perf_counter() - debut, erreur
+
+
+def run_batch(sessions, workers=0, **options):
+    """
+    Traite plusieurs sessions en parallele, une session par processus, puis affiche le
+    temps de traitement et l'eventuelle erreur de chacune. Une session en erreur
+    n'interrompt pas les autres.
+
+    Args:
+        sessions (list of str): Les dossiers ou archives ZIP des sessions.
+        workers (int, optional): Nombre de processus. 0 ou None utilise tous les coeurs. Par defaut : 0.
+        **options: Les options de process_session (note, plot, verbose, output, cache, formats, raw, resume, pyramide).
+
+    Returns:
+        list: Les tuples (session, duree, erreur) dans l'ordre des sessions.
+
+    Raises:
+        ValueError: Si workers est negatif.
+    """
+    if workers is None or workers == 0:
+        workers = os.cpu_count() or 1
+    if workers < 0:
+        raise ValueError("workers doit etre un entier positif.")
+
+    debut = time.perf_counter()
+    if workers == 1 or len(sessions) <= 1:
+        resultats = [process_session(session, **options) for session in sessions]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sessions))) as executor:
+            futures = [executor.submit(process_session, session, **options) for session in sessions]
+            resultats = []
+            for session, future in zip(sessions, futures):
+                try:
+                    resultats.append(future.result())
+                except Exception as e:
+                    # processus du pool interrompu
+                    resultats.append((session, float("nan"), e))
+    duree_totale = time.perf_counter() - debut
+
+    print("Resume du traitement :")
+    for session, duree, erreur in resultats:
+        statut = "OK" if erreur is None else f"ERREUR : {erreur}"
+        print(f"{duree:8.1f} s  {session}  {statut}")
+    nb_erreurs = sum(erreur is not None for _, _, erreur in resultats)
+    print(
+        f"{len(resultats)} session(s), {nb_erreurs} erreur(s), "
+        f"{duree_totale:.1f} s ({sum(duree for _, duree, _ in resultats):.1f} s cumulees)"
+    )
+    return resultats
+
+
+def build_parser():
+    """
+    Construit l'analyseur des arguments du mode batch.
+
+    Returns:
+        argparse.ArgumentParser: L'analyseur des arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="Datafficheur-batch",
+        description="Traitement en parallele de plusieurs sessions Datafficheur (dossiers ou archives ZIP).",
+    )
+    parser.add_argument(
+        "sessions",
+        help="Dossiers ou archives ZIP des sessions, ou motifs (ex. 'data_test/*.zip').",
+        nargs="+",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="Nombre de sessions traitees en parallele (0 pour utiliser tous les coeurs). Par defaut: 0",
+        default=0,
+    )
+    parser.add_argument(
+        "-n",
+        "--note",
+        help="Fichier indiquant les temps de debut et fin et le type d'outil. Par defaut: note.csv",
+        default="note.csv",
+    )
+    parser.add_argument(
+        "-p",
+        "--plot",
+        help="Creation des graphiques.",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        help="Format binaire colonnaire cree en plus du CSV (option repetable). Par defaut: aucun",
+        choices=list(BINARY_FORMATS),
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--cache",
+        help="Utilise le cache des fichiers deja analyses.",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+    )
+    parser.add_argument(
+        "--resume",
+        help="Cree le resume des efforts (histogramme et moments) relu par compare.py.",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+    )
+    parser.add_argument(
+        "--pyramide",
+        help="Cree la pyramide des efforts (minimum, maximum et moyenne par seconde, minute...) relue par pyramid.load_view.",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+    )
+    parser.add_argument(
+        "--raw",
+        help="Trace tous les echantillons de la courbe d'effort, sans reduction a l'enveloppe min/max.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Affiche des messages sur la progression.", action="store_true"
+    )
+    return parser
+
+
+def run(argv=None):
+    """
+    Point d'entree de la ligne de commande du mode batch.
+
+    Args:
+        argv (list of str, optional): Les arguments de la ligne de commande. Par defaut : sys.argv.
+
+    Returns:
+        int: 0 si toutes les sessions ont ete traitees, 1 sinon.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    sessions = expand_sessions(args.sessions)
+    if not sessions:
+        parser.error("aucune session (dossier ou archive ZIP) trouvee.")
+
+    resultats = run_batch(
+        sessions,
+        args.workers,
+        note=args.note,
+        plot=args.plot,
+        verbose=args.verbose,
+        cache=args.cache,
+        formats=args.format,
+        raw=args.raw,
+        resume=args.resume,
+        pyramide=args.pyramide,
+    )
+    return 0 if all(erreur is None for _, _, erreur in resultats) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+
+
+def cache_key(fichier, version, contenu=None):
+    """
+    Calcule la cle de cache d'un fichier brut.
+
+    La cle depend de la version de l'analyseur et, pour un fichier sur disque, de son
+    chemin absolu, de sa taille et de sa date de modification. Pour un contenu deje lu
+    (membre d'une archive ZIP), elle depend du contenu lui-meme.
+
+    Args:
+        fichier (str): Chemin du fichier (ou nom du membre si contenu est donne).
+        version (int): Version de l'analyseur, toute modification du format invalide le cache.
+        contenu (bytes, optional): Contenu deje lu du fichier. Par defaut : None.
+
+    Returns:
+        str: La cle de cache (empreinte hexadecimale).
+
+    Raises:
+        FileNotFoundError: Si contenu est None et que le fichier n'existe pas.
+    """
+    empreinte = hashlib.sha1(f"v{version}".encode())
+    if contenu is None:
+        stat = os.stat(fichier)
+        empreinte.update(
+            f"{os.path.abspath(fichier)}|{stat.st_size}|{stat.st_mtime_ns}".encode()
+        )
+    else:
+        empreinte.update(contenu)
+    return empreinte.hexdigest()
+
+
+def session_dir(dossier, dir):
+    """
+    Dossier des fichiers d'une session conserves dans le cache (index des fichiers,
+    pyramide reconstruite), pour ne rien ecrire dans le dossier des donnees. Son nom
+    derive du chemin absolu de la session.
+
+    Args:
+        dossier (str): Le dossier du cache.
+        dir (str): Le dossier ou l'archive ZIP de la session.
+
+    Returns:
+        str: Le chemin du dossier (non cree).
+    """
+    nom = os.path.splitext(os.path.basename(os.path.normpath(dir)))[0]
+    empreinte = hashlib.sha1(os.path.abspath(dir).encode()).hexdigest()[:16]
+    return os.path.join(os.path.expanduser(dossier), "sessions", f"{nom}_{empreinte}")
+
+
+def load_cached(dossier, cle):
+    """
+    Lit un DataFrame du cache.
+
+    Args:
+        dossier (str): Le dossier du cache.
+        cle (str): La cle calculee par cache_key.
+
+    Returns:
+        pandas.DataFrame: Le DataFrame en cache, ou None s'il est absent ou illisible.
+    """
+    chemin = os.path.join(os.path.expanduser(dossier), cle + ".npz")
+    try:
+        with np.load(chemin, allow_pickle=False) as npz:
+            datas = pd.DataFrame(
+                npz["valeurs"],
+                index=pd.DatetimeIndex(npz["index"].view("datetime64[ns]")),
+                columns=pd.Index(npz["colonnes"]),
+            )
+        # la date de modification sert e l'ordre LRU
+        os.utime(chemin)
+    except (OSError, KeyError, ValueError):
+        return None
+    return datas
+
+
+def save_cached(dossier, cle, datas):
+    """
+    Enregistre un DataFrame dans le cache au format binaire colonnaire NumPy (.npz).
+
+    Args:
+        dossier (str): Le dossier du cache, cree si besoin.
+        cle (str): La cle calculee par cache_key.
+        datas (pandas.DataFrame): Le DataFrame e enregistrer (index datetime64, colonnes des capteurs).
+
+    Returns:
+        None
+    """
+    dossier = os.path.expanduser(dossier)
+    os.makedirs(dossier, exist_ok=True)
+    chemin = os.path.join(dossier, cle + ".npz")
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(temporaire, "wb") as f:
+        np.savez(
+            f,
+            index=datas.index.to_numpy(dtype="datetime64[ns]").view("int64"),
+            valeurs=datas.to_numpy(),
+            colonnes=datas.columns.to_numpy(),
+        )
+    # remplacement atomique pour ne jamais laisser une entree tronquee
+    os.replace(temporaire, chemin)
+
+
+def evict_cache(dossier, taille_max):
+    """
+    Supprime les entrees les moins recemment utilisees jusqu'e ce que le cache
+    ne depasse plus taille_max octets.
+
+    Args:
+        dossier (str): Le dossier du cache.
+        taille_max (int): Taille maximale du cache en octets.
+
+    Returns:
+        int: Le nombre d'entrees supprimees.
+    """
+    dossier = os.path.expanduser(dossier)
+    if not os.path.isdir(dossier):
+        return 0
+
+    entrees = []
+    for entree in os.scandir(dossier):
+        if entree.is_file() and entree.name.endswith(".npz"):
+            try:
+                stat = entree.stat()
+            except FileNotFoundError:
+                # entree supprimee entre-temps par un autre processus (mode batch)
+                continue
+            entrees.append((stat.st_mtime_ns, stat.st_size, entree.path))
+    taille = sum(t for _, t, _ in entrees)
+
+    supprimees = 0
+    for _, t, chemin in sorted(entrees):
+        if taille <= taille_max:
+            break
+        try:
+            os.remove(chemin)
+        except FileNotFoundError:
+            pass
+        taille -= t
+        supprimees += 1
+    return supprimees
+
+
+def clear_cache(dossier):
+    """
+    Vide le cache.
+
+    Args:
+        dossier (str): Le dossier du cache.
+
+    Returns:
+        int: Le nombre d'entrees supprimees.
+    """
+    return evict_cache(dossier, 0)
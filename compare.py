@@ -0,0 +1,135 @@
+import argparse
+import glob
+import os
+from constants import BINS, DENSITY, OUTPUTRESUME
+
+
+def expand_summaries(motifs):
+    """
+    Liste les fichiers de resume designes par des chemins, des motifs glob ou des dossiers
+    (tous les fichiers *_Resume-Efforts_*.npz qu'ils contiennent).
+
+    Args:
+        motifs (list of str): Les chemins, motifs ou dossiers.
+
+    Returns:
+        list: Les chemins des fichiers de resume, tries et sans doublon.
+    """
+    chemins = set()
+    for motif in motifs:
+        if os.path.isdir(motif):
+            motif = os.path.join(motif, "*_" + OUTPUTRESUME + "_*.npz")
+        chemins.update(glob.glob(motif))
+    return sorted(chemins)
+
+
+def aggregate_summaries(chemins, verbose=False):
+    """
+    Fusionne des resumes de session un par un : un seul resume est en memoire e la fois,
+    quel que soit le nombre de sessions.
+
+    Args:
+        chemins (list of str): Les fichiers de resume.
+        verbose (bool, optional): Si vrai, affiche les fichiers lus. Par defaut : False.
+
+    Returns:
+        dict: Le resume fusionne, ou None si chemins est vide.
+    """
+    from distribution import load_summary, merge_summaries
+
+    resume = None
+    for chemin in chemins:
+        if verbose:
+            print(f"Lecture du resume {chemin}")
+        resume = merge_summaries(resume, load_summary(chemin))
+    return resume
+
+
+def main(argv=None):
+    """
+    Commande de comparaison : superpose les histogrammes d'effort de plusieurs sessions
+    (ou groupes de sessions fusionnees) e partir des resumes crees par datafficheur.py.
+
+    Args:
+        argv (list of str, optional): Les arguments de la ligne de commande. Par defaut : sys.argv.
+    """
+    parser = argparse.ArgumentParser(
+        prog="Datafficheur-comparaison",
+        description="Comparaison des frequences d'apparition des efforts de plusieurs sessions, "
+        "a partir des resumes (*_Resume-Efforts_*.npz) crees par datafficheur.py --resume.",
+    )
+    parser.add_argument(
+        "resumes",
+        help="Fichiers de resume, motifs (ex. 'data/*.npz') ou dossiers : une courbe par fichier.",
+        nargs="*",
+    )
+    parser.add_argument(
+        "-g",
+        "--groupe",
+        help="Groupe de sessions fusionnees en une seule courbe : un libelle suivi des fichiers, motifs ou dossiers (option repetable).",
+        nargs="+",
+        action="append",
+        default=[],
+        metavar=("LIBELLE", "RESUME"),
+    )
+    parser.add_argument(
+        "-c",
+        "--colonne",
+        help="Colonne comparee (1, 2 ou Total). Par defaut: Total",
+        default="Total",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Fichier du graphique (format deduit de l'extension, option repetable). Par defaut: comparaison.png",
+        action="append",
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Affiche des messages sur la progression.", action="store_true"
+    )
+    parser.add_argument(
+        "--show",
+        help="Affiche le graphique a l'ecran en plus de l'enregistrer.",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+    )
+    args = parser.parse_args(argv)
+
+    groupes = []
+    for chemin in expand_summaries(args.resumes):
+        groupes.append((os.path.splitext(os.path.basename(chemin))[0], aggregate_summaries([chemin])))
+    for groupe in args.groupe:
+        if len(groupe) < 2:
+            parser.error("--groupe attend un libelle suivi d'au moins un resume.")
+        chemins = expand_summaries(groupe[1:])
+        if not chemins:
+            print(f"Aucun resume pour le groupe {groupe[0]}")
+            continue
+        if args.verbose:
+            print(f"Groupe {groupe[0]} : {len(chemins)} session(s)")
+        groupes.append((groupe[0], aggregate_summaries(chemins, args.verbose)))
+    if not groupes:
+        parser.error("aucun resume e comparer.")
+
+    from utils import has_display
+
+    show = args.show and has_display()
+    if not show:
+        import matplotlib
+
+        matplotlib.use("Agg")
+    from plotting import create_comparison
+
+    create_comparison(
+        groupes,
+        args.colonne,
+        args.output or ["comparaison.png"],
+        BINS,
+        DENSITY,
+        args.verbose,
+        show,
+    )
+
+
+if __name__ == "__main__":
+    main()
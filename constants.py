@@ -13,6 +13,20 @@ OUTPUTPLOT = "Quentin-Trotignon-buttoir.pdf"
 #OUTPUTFILE = None
 OUTPUTFILE = "Quentin-Trotignon-buttoir.png"
 
+## Formats binaires proposes en plus du CSV (option -f) et extension des fichiers produits
+BINARY_FORMATS = {"parquet": ".parquet", "feather": ".feather", "npz": ".npz"}
+
+## Resume des efforts (histogramme et moments) de chaque session, relu par compare.py
+# Fichier cree : <date>_Resume-Efforts_<nom du CSV>.npz
+OUTPUTRESUME = "Resume-Efforts"
+
+## Pyramide des efforts (minimum, maximum et moyenne par seconde, 10 secondes, minute...)
+# de chaque session, relue par pyramid.load_view pour zoomer e cout constant
+# Fichier cree : <date>_Pyramide-Efforts_<nom du CSV>.npz
+OUTPUTPYRAMIDE = "Pyramide-Efforts"
+# Duree des intervalles de chaque niveau en secondes, chacune multiple de la precedente
+PYRAMIDE_NIVEAUX = (1, 10, 60, 600, 3600)
+
 
 ## Graphique effort/temps
 # Niveau de transparence des courbes:
@@ -63,3 +77,23 @@ DENSITY = True # calcul par densité
 BINS = 50
 #BINS = 30 # barres plus larges
 
+
+## Cache des fichiers bruts deja analyses (accelere les relances sur le meme dossier)
+# Dossier du cache
+CACHE_DIR = "~/.cache/datafficheur"
+# Taille maximale du cache en octets, les fichiers les moins recemment utilises sont supprimes au-dela
+CACHE_TAILLE_MAX = 500 * 1024 * 1024 # 500 Mo
+
+## Index des fichiers d'une session (store.load_range) : plage de temps de chaque fichier,
+# cree dans le dossier de la session (ou e cote de l'archive, prefixe par son nom)
+STORE_INDEX = "Index-Fichiers.csv"
+
+
+## Mode flux (--stream) pour les tres longs enregistrements
+# Nombre de fichiers (une minute chacun) traites e la fois, la memoire utilisee en depend
+STREAM_TAILLE_BLOC = 60
+
+## Courbe KDE des histogrammes
+# False : calcul integre par FFT sur les comptes de l'histogramme (rapide)
+# True : seaborn.kdeplot (calcul exact, lent sur de longues sessions, necessite seaborn)
+KDE_SEABORN = False
@@ -1,15 +1,25 @@
+import io
 import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from utils import read_row_datetime, calcul_nom_colonne
+from cache import cache_key, load_cached, save_cached, evict_cache
+from utils import read_datetime_columns
 
+# Version du format produit par load_datafficheur_file, e incrementer e chaque
+# modification de l'analyse pour invalider le cache
+PARSER_VERSION = 1
 
-def load_datafficheur_file(fichier: str, verbose: bool = False):
+
+def load_datafficheur_file(fichier: str, verbose: bool = False, contenu: bytes = None):
     """
     Charge un fichier CSV, effectue des transformations sur les donnees et retourne le DataFrame resultant.
 
     Args:
         fichier (str): Chemin vers le fichier e charger.
         verbose (bool): Si vrai, affiche des messages supplementaires lors du traitement.
+        contenu (bytes, optional): Contenu deje lu du fichier (membre d'une archive ZIP par exemple).
+            Dans ce cas fichier ne sert qu'aux messages. Par defaut : None.
 
     Returns:
         pandas.DataFrame: Le DataFrame contenant les donnees chargees et transformees.
@@ -22,7 +32,11 @@ def load_datafficheur_file(fichier: str, verbose: bool = False):
         print(f"Traitement du fichier {fichier}")
 
     try:
-        datas_fichier = pd.read_csv(fichier, header=None)
+        datas_fichier = pd.read_csv(
+            fichier if contenu is None else io.BytesIO(contenu),
+            header=None,
+            dtype={1: str, 2: str},
+        )
     except FileNotFoundError:
         print(f"Le fichier {fichier} n'a pas ete trouve.")
         raise
@@ -30,17 +44,308 @@ def load_datafficheur_file(fichier: str, verbose: bool = False):
         print(f"Erreur lors de l'analyse du fichier {fichier}.")
         raise
 
-    datas_fichier.set_index([0, 1, 2], inplace=True)
-    datas_fichier.columns = pd.MultiIndex.from_tuples(
-        map(calcul_nom_colonne, range(len(datas_fichier.columns)))
+    return parse_datafficheur_frame(datas_fichier)
+
+
+def load_datafficheur_files(
+    fichiers, jobs=1, verbose=False, archive=None, cache=None, cache_taille_max=None
+):
+    """
+    Charge plusieurs fichiers bruts, eventuellement en parallele, sans s'arreter
+    au premier fichier en erreur.
+
+    Args:
+        fichiers (list of str): Les chemins des fichiers e charger, ou les noms des membres si archive est donnee.
+        jobs (int, optional): Nombre de processus de lecture. 0 ou None utilise tous les coeurs. Par defaut : 1.
+        verbose (bool, optional): Si vrai, affiche des messages supplementaires lors du traitement. Par defaut : False.
+        archive (zipfile.ZipFile, optional): Archive ouverte dont les membres sont lus en memoire,
+            sans extraction sur disque. Par defaut : None.
+        cache (str, optional): Dossier du cache des fichiers deje analyses. None desactive le cache. Par defaut : None.
+        cache_taille_max (int, optional): Taille maximale du cache en octets, None pour ne rien supprimer. Par defaut : None.
+
+    Returns:
+        tuple: Un tuple (datas_par_fichier, erreurs) ou datas_par_fichier est la liste des DataFrames
+        dans l'ordre de fichiers (fichiers en erreur exclus) et erreurs la liste des (fichier, exception).
+
+    Raises:
+        ValueError: Si jobs est negatif.
+    """
+    if jobs is None or jobs == 0:
+        jobs = os.cpu_count() or 1
+    if jobs < 0:
+        raise ValueError("jobs doit etre un entier positif.")
+
+    # resultats[i] = (datas, erreur) pour fichiers[i]
+    resultats = [None] * len(fichiers)
+    a_analyser = []
+    for i, fichier in enumerate(fichiers):
+        try:
+            contenu = None if archive is None else archive.read(fichier)
+            cle = None
+            if cache is not None:
+                cle = cache_key(fichier, PARSER_VERSION, contenu)
+                datas = load_cached(cache, cle)
+                if datas is not None:
+                    if verbose:
+                        print(f"Lecture du fichier {fichier} depuis le cache")
+                    resultats[i] = (datas, None)
+                    continue
+            a_analyser.append((i, fichier, contenu, cle))
+        except Exception as e:
+            resultats[i] = (None, e)
+
+    if jobs == 1 or len(a_analyser) <= 1:
+        for i, fichier, contenu, cle in a_analyser:
+            try:
+                resultats[i] = (load_datafficheur_file(fichier, verbose, contenu), None)
+            except Exception as e:
+                resultats[i] = (None, e)
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(a_analyser))) as executor:
+            futures = [
+                executor.submit(load_datafficheur_file, fichier, verbose, contenu)
+                for _, fichier, contenu, _ in a_analyser
+            ]
+            for (i, _, _, _), future in zip(a_analyser, futures):
+                try:
+                    resultats[i] = (future.result(), None)
+                except Exception as e:
+                    resultats[i] = (None, e)
+
+    if cache is not None:
+        for i, fichier, _, cle in a_analyser:
+            datas, erreur = resultats[i]
+            if erreur is None:
+                try:
+                    save_cached(cache, cle, datas)
+                except OSError as e:
+                    print(f"Impossible d'ecrire le fichier {fichier} dans le cache : {e}")
+        if a_analyser and cache_taille_max is not None:
+            evict_cache(cache, cache_taille_max)
+
+    datas_par_fichier = []
+    erreurs = []
+    for fichier, (datas, erreur) in zip(fichiers, resultats):
+        if erreur is None:
+            datas_par_fichier.append(datas)
+        else:
+            print(f"Erreur lors du traitement du fichier {fichier} : {erreur}")
+            erreurs.append((fichier, erreur))
+
+    return datas_par_fichier, erreurs
+
+
+def parse_datafficheur_frame(datas_fichier, frequence_acquisition=10):
+    """
+    Transforme les trames brutes (une ligne par seconde) en un DataFrame avec
+    une ligne par echantillon et une colonne par capteur.
+
+    Les colonnes date, heure et deciseconde sont decodees en tableaux entiers et
+    les frequence_acquisition x N echantillons de chaque ligne sont redistribues
+    avec NumPy, sans passer par un MultiIndex ni par un strptime par ligne.
+
+    Args:
+        datas_fichier (pandas.DataFrame): Les trames brutes telles que lues par pd.read_csv
+            (compteur, date, heure, puis les echantillons de chaque capteur).
+        frequence_acquisition (int): Nombre d'echantillons par seconde. Par defaut : 10.
+
+    Returns:
+        pandas.DataFrame: Le DataFrame indexe par datetime64[ns] avec une colonne par capteur (1, 2, ...).
+
+    Raises:
+        ValueError: Si datas_fichier n'est pas un DataFrame pandas ou ne contient aucun echantillon.
+    """
+    if not isinstance(datas_fichier, pd.DataFrame):
+        raise ValueError("datas_fichier doit etre un DataFrame pandas.")
+    if len(datas_fichier.columns) <= 3:
+        raise ValueError("Les trames doivent contenir au moins un echantillon.")
+
+    valeurs = datas_fichier.iloc[:, 3:].to_numpy()
+    nb_lignes, nb_echantillons = valeurs.shape
+    nb_capteurs = -(-nb_echantillons // frequence_acquisition)
+    manquants = nb_capteurs * frequence_acquisition - nb_echantillons
+    if manquants:
+        # capteur incomplet : on complete avec des NaN comme le faisait le stack
+        valeurs = np.pad(
+            valeurs.astype(float), ((0, 0), (0, manquants)), constant_values=np.nan
+        )
+
+    # (ligne, capteur, fraction) -> (ligne, fraction, capteur) -> (echantillon, capteur)
+    echantillons = (
+        valeurs.reshape(nb_lignes, nb_capteurs, frequence_acquisition)
+        .transpose(0, 2, 1)
+        .reshape(nb_lignes * frequence_acquisition, nb_capteurs)
     )
-    datas_fichier = datas_fichier.stack(level=0)
-    datas_fichier.index = [read_row_datetime(row) for row in datas_fichier.index]
+    index = read_datetime_columns(
+        datas_fichier[1].to_numpy(), datas_fichier[2].to_numpy(), frequence_acquisition
+    ).ravel()
+
+    datas = pd.DataFrame(
+        echantillons,
+        index=pd.DatetimeIndex(index),
+        columns=pd.Index(range(1, nb_capteurs + 1), dtype="int64"),
+    )
+    if datas.isna().to_numpy().any():
+        # les echantillons entierement vides etaient ignores par le stack
+        datas = datas.dropna(how="all")
+
+    return datas
+
 
-    return datas_fichier
+def merge_order(debuts):
+    """
+    Donne l'ordre de fusion des fichiers bruts, qui decide des doublons : les fichiers sont
+    ordonnes par leur premier echantillon et, e debut egal, gardent l'ordre de la liste
+    (noms tries, voir find_files). Un echantillon present dans plusieurs fichiers est celui
+    du premier fichier dans cet ordre.
 
+    Args:
+        debuts (list of int): Le premier echantillon de chaque fichier (en ns).
 
-def add_notes(df, dir, note, verbose=False):
+    Returns:
+        numpy.ndarray: Les positions des fichiers dans l'ordre de fusion.
+    """
+    return np.argsort(np.asarray(debuts, dtype=np.int64), kind="stable")
+
+
+def merge_datafficheur_frames(
+    datas_par_fichier, noms=None, seuil_trou=pd.Timedelta(seconds=5), verbose=False
+):
+    """
+    Fusionne les DataFrames des fichiers bruts en un seul DataFrame trie et sans doublon.
+
+    Chaque fichier couvre sa propre fenetre de temps et est deje presque trie : les
+    fichiers sont ordonnes par leur premier echantillon et seules les fenetres qui se
+    chevauchent sont refusionnees, au lieu de trier l'ensemble des donnees. En cas de
+    doublon, l'echantillon du fichier qui commence le plus tot est conserve.
+
+    Args:
+        datas_par_fichier (list of pandas.DataFrame): Les DataFrames retournes par load_datafficheur_file.
+        noms (list of str, optional): Les noms des fichiers correspondants, pour les diagnostics. Par defaut : None.
+        seuil_trou (pandas.Timedelta, optional): Ecart minimal entre deux fichiers signale comme un trou. Par defaut : 5 secondes.
+        verbose (bool, optional): Si vrai, affiche les chevauchements et les trous. Par defaut : False.
+
+    Returns:
+        tuple: Un tuple (datas, diagnostics) ou datas est le DataFrame fusionne et diagnostics un
+        dictionnaire avec les listes "chevauchements" (fichier, debut, fin, nombre de doublons)
+        et "trous" (fichier precedent, fichier, fin du precedent, debut, duree).
+
+    Raises:
+        ValueError: Si datas_par_fichier est vide.
+    """
+    if len(datas_par_fichier) == 0:
+        raise ValueError("datas_par_fichier ne peut pas etre une liste vide.")
+    if noms is None:
+        noms = [str(i) for i in range(len(datas_par_fichier))]
+
+    diagnostics = {"chevauchements": [], "trous": []}
+    colonnes = datas_par_fichier[0].columns
+    for datas in datas_par_fichier[1:]:
+        if not datas.columns.equals(colonnes):
+            colonnes = colonnes.union(datas.columns)
+
+    fichiers = []
+    for nom, datas in zip(noms, datas_par_fichier):
+        if datas.empty:
+            continue
+        if not datas.columns.equals(colonnes):
+            datas = datas.reindex(columns=colonnes)
+        index = datas.index.to_numpy(dtype="datetime64[ns]").view("int64")
+        valeurs = datas.to_numpy()
+        # un seul passage pour verifier que le fichier est trie et sans doublon
+        if len(index) > 1 and not (index[1:] > index[:-1]).all():
+            ordre = np.argsort(index, kind="stable")
+            index, valeurs = index[ordre], valeurs[ordre]
+            garder = np.concatenate(([True], index[1:] != index[:-1]))
+            index, valeurs = index[garder], valeurs[garder]
+        fichiers.append((nom, index, valeurs))
+    if not fichiers:
+        return datas_par_fichier[0].iloc[:0], diagnostics
+    fichiers = [fichiers[i] for i in merge_order([index[0] for _, index, _ in fichiers])]
+
+    # morceaux (index, valeurs) tries, consecutifs et disjoints du resultat
+    morceaux = []
+    fin = None
+    nom_precedent = None
+    for nom, index, valeurs in fichiers:
+        debut = index[0]
+        if fin is None or debut > fin:
+            if fin is not None and debut - fin > seuil_trou.value:
+                diagnostics["trous"].append(
+                    (nom_precedent, nom, pd.Timestamp(fin), pd.Timestamp(debut), pd.Timedelta(debut - fin))
+                )
+            morceaux.append((index, valeurs))
+        else:
+            # on ne refusionne que la partie du resultat qui recouvre ce fichier
+            recouvrement = []
+            while morceaux and morceaux[-1][0][-1] >= debut:
+                index_morceau, valeurs_morceau = morceaux.pop()
+                coupure = index_morceau.searchsorted(debut, side="left")
+                recouvrement.append((index_morceau[coupure:], valeurs_morceau[coupure:]))
+                if coupure > 0:
+                    morceaux.append((index_morceau[:coupure], valeurs_morceau[:coupure]))
+                    break
+            index_existant = np.concatenate([i for i, _ in recouvrement[::-1]])
+            valeurs_existantes = np.concatenate([v for _, v in recouvrement[::-1]])
+
+            coupure = index.searchsorted(fin, side="right")
+            doublons = np.isin(index[:coupure], index_existant)
+            diagnostics["chevauchements"].append(
+                (nom, pd.Timestamp(debut), pd.Timestamp(index[coupure - 1]), int(doublons.sum()))
+            )
+            index_fusion = np.concatenate((index_existant, index[:coupure][~doublons]))
+            valeurs_fusion = np.concatenate((valeurs_existantes, valeurs[:coupure][~doublons]))
+            ordre = np.argsort(index_fusion, kind="stable")
+            morceaux.append((index_fusion[ordre], valeurs_fusion[ordre]))
+            if coupure < len(index):
+                morceaux.append((index[coupure:], valeurs[coupure:]))
+        if fin is None or index[-1] > fin:
+            fin = index[-1]
+            nom_precedent = nom
+
+    if verbose:
+        for nom, debut, fin, doublons in diagnostics["chevauchements"]:
+            print(f"Chevauchement du fichier {nom} de {debut} e {fin} : {doublons} doublons ignores")
+        for precedent, nom, fin, debut, duree in diagnostics["trous"]:
+            print(f"Trou de {duree} entre les fichiers {precedent} et {nom} ({fin} - {debut})")
+
+    datas = pd.DataFrame(
+        np.concatenate([v for _, v in morceaux]),
+        index=pd.DatetimeIndex(np.concatenate([i for i, _ in morceaux]).view("datetime64[ns]")),
+        columns=colonnes,
+    )
+    return datas, diagnostics
+
+
+def read_notes(dir, note, contenu=None):
+    """
+    Lit le fichier des notes : une ligne par intervalle (debut, fin, action), sans en-tete.
+
+    Args:
+        dir (str): Le repertoire oe se trouve le fichier contenant les notes.
+        note (str): Le nom du fichier contenant les notes.
+        contenu (bytes, optional): Contenu deje lu du fichier des notes (membre d'une archive ZIP par exemple). Par defaut : None.
+
+    Returns:
+        pandas.DataFrame: Les notes, colonnes 'start', 'end' et 'action'.
+
+    Raises:
+        ValueError: Si le fichier des notes ne contient pas les colonnes 'start', 'end' et 'action'.
+    """
+    notecols = ["start", "end", "action"]
+    note_metadata = pd.read_csv(
+        os.path.join(dir, note) if contenu is None else io.BytesIO(contenu),
+        header=None,
+        names=notecols,
+    )
+    if not {"start", "end", "action"}.issubset(note_metadata.columns):
+        raise ValueError(
+            "Le fichier des notes doit contenir les colonnes 'start', 'end' et 'action'."
+        )
+    return note_metadata
+
+
+def add_notes(df, dir, note, verbose=False, contenu=None):
     """
     Ajoute des notes e un DataFrame sur un intervalle de temps specifique.
 
@@ -49,6 +354,7 @@ def add_notes(df, dir, note, verbose=False):
         dir (str): Le repertoire oe se trouve le fichier contenant les notes.
         note (str): Le nom du fichier contenant les notes.
         verbose (bool, optional): Si vrai, affiche des messages supplementaires pendant le processus. Par defaut : False.
+        contenu (bytes, optional): Contenu deje lu du fichier des notes (membre d'une archive ZIP par exemple). Par defaut : None.
 
     Returns:
         pandas.DataFrame: Le DataFrame avec les notes ajoutees.
@@ -61,35 +367,85 @@ def add_notes(df, dir, note, verbose=False):
 
     if verbose:
         print(f"Chargement des notes {note}")
-    notecols = ["start", "end", "action"]
-    note_metadata = pd.read_csv(os.path.join(dir, note), header=None, names=notecols)
-    if not {"start", "end", "action"}.issubset(note_metadata.columns):
-        raise ValueError(
-            "Le fichier des notes doit contenir les colonnes 'start', 'end' et 'action'."
-        )
+    note_metadata = read_notes(dir, note, contenu)
 
     if verbose:
         print(note_metadata)
 
-    for index, row in note_metadata.iterrows():
+    # colonne "action" (completee par des niveaux vides si les colonnes sont un MultiIndex)
+    cle = "action"
+    if isinstance(df.columns, pd.MultiIndex):
+        cle = ("action",) + ("",) * (df.columns.nlevels - 1)
+
+    # sans note, pas de colonne "action" (comme l'affectation note par note)
+    if note_metadata.empty and cle not in df.columns:
+        return df
+
+    # les libelles deje presents sont conserves hors des intervalles des notes
+    if cle in df.columns:
+        existant = pd.Categorical(df[cle])
+        categories = list(existant.categories)
+        codes = existant.codes.astype(np.int32)
+    else:
+        categories = []
+        codes = np.full(len(df), -1, dtype=np.int32)
+    positions = {action: i for i, action in enumerate(categories)}
+
+    # jointure par intervalles : chaque note est localisee par recherche dichotomique
+    # dans l'index (bornes incluses, meme resolution que df.loc[start:end]), puis les
+    # codes des echantillons sont renseignes en une passe. En cas de chevauchement,
+    # la note la plus loin dans le fichier l'emporte.
+    for start, end, action in zip(
+        note_metadata["start"], note_metadata["end"], note_metadata["action"]
+    ):
         if verbose:
-            print(
-                f"Ajout de l'action sur l'interval {row['start']}-{row['end']}: {row['action']}"
-            )
-        df.loc[row["start"] : row["end"], "action"] = row["action"]
+            print(f"Ajout de l'action sur l'interval {start}-{end}: {action}")
+        debut, fin = df.index.slice_locs(start, end)
+        if action not in positions:
+            positions[action] = len(categories)
+            categories.append(action)
+        codes[debut:fin] = positions[action]
+
+    df[cle] = pd.Categorical.from_codes(codes, categories=categories)
 
     return df
 
 
+def compact_dtype(valeurs, nb_termes=1):
+    """
+    Choisit le plus petit type entier signe capable de contenir les valeurs et la somme
+    de nb_termes d'entre elles (les efforts sont de petits entiers en kgf).
+
+    Args:
+        valeurs (numpy.ndarray): Les valeurs entieres.
+        nb_termes (int, optional): Nombre de valeurs additionnees par ligne (colonne Total). Par defaut : 1.
+
+    Returns:
+        numpy.dtype: int16, int32 ou int64.
+    """
+    if valeurs.size == 0:
+        return np.dtype(np.int16)
+    borne = max(abs(int(valeurs.min())), abs(int(valeurs.max()))) * nb_termes
+    for dtype in (np.int16, np.int32):
+        if borne <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
 def prepare_data(data):
     """
     Prepare les donnees pour une analyse ulterieure en regroupant et en sommant les colonnes.
 
+    Les efforts des capteurs et leur Total sont ranges dans un seul tableau 2-D contigu
+    du plus petit type entier suffisant (int16 en pratique), partage par toutes les
+    colonnes et indexe par l'index datetime64 commun. Si des echantillons sont manquants,
+    le tableau est en float32 et les NaN sont ignores dans le Total.
+
     Args:
         data (pandas.DataFrame): Le DataFrame e preparer.
 
     Returns:
-        pandas.DataFrame: Le DataFrame prepare.
+        pandas.DataFrame: Le DataFrame prepare, colonnes (capteur, "Efforts") puis ("Total", "Efforts").
 
     Raises:
         ValueError: Si data n'est pas un DataFrame pandas.
@@ -97,13 +453,41 @@ def prepare_data(data):
     if not isinstance(data, pd.DataFrame):
         raise ValueError("data doit etre un DataFrame pandas.")
 
-    df = {}
-    for col in data.columns:
-        df[col] = pd.DataFrame(data={"Efforts": data[col]}, index=data.index)
-        df[col].index.name = "date"
-    df = pd.concat(df, axis=1)
-    df_total = df.groupby(axis=1, level=1).sum()
-    for col in df_total.columns:
-        df[("Total", col)] = df_total[col]
+    valeurs = data.to_numpy()
+    nb_capteurs = valeurs.shape[1]
+    if np.issubdtype(valeurs.dtype, np.integer):
+        dtype = compact_dtype(valeurs, nb_capteurs)
+    else:
+        dtype = np.dtype(np.float32)
 
-    return df
+    bloc = np.empty((len(data), nb_capteurs + 1), dtype=dtype)
+    bloc[:, :nb_capteurs] = valeurs
+    if dtype.kind == "f":
+        np.nansum(bloc[:, :nb_capteurs], axis=1, out=bloc[:, nb_capteurs])
+    else:
+        np.sum(bloc[:, :nb_capteurs], axis=1, out=bloc[:, nb_capteurs])
+
+    index = pd.DatetimeIndex(data.index, name="date")
+    colonnes = pd.MultiIndex.from_tuples(
+        [(col, "Efforts") for col in data.columns] + [("Total", "Efforts")]
+    )
+    return pd.DataFrame(bloc, index=index, columns=colonnes, copy=False)
+
+
+def date_range_str(index):
+    """
+    Construit la chaine des dates de mesure utilisee dans les titres et les noms de fichiers.
+
+    Args:
+        index (pandas.DatetimeIndex): L'index des donnees.
+
+    Returns:
+        str: La date des mesures, ou "min - max" si les mesures sont sur plus d'un jour.
+    """
+    unique_dates = pd.Series(index.date).unique()
+    min_date = unique_dates.min()
+    max_date = unique_dates.max()
+    # si les mesures sont sur plus d'un jour on prend min et max, sinon just min
+    if len(unique_dates) > 1:
+        return f"{min_date} - {max_date}"
+    return f"{min_date}"
@@ -1,200 +1,460 @@
-import argparse
-import os
-import pytz
-import pathlib
-import pandas as pd
-from constants import DEFAULT_TIMEZONE, PLOTHTICKS, OUTPUTPLOT, OUTPUT, OUTPUTFILE
-from data_processing import load_datafficheur_file, add_notes, prepare_data
-from plotting import create_plot, create_histograms
-from utils import find_files, moving_average
-
-# traitement des arguments
-parser = argparse.ArgumentParser(
-    prog="Datafficheur",
-    description="Lecture des donnees du capteur Datafficheur. http://hippotese.free.fr/blog/index.php/?q=datafficheur",
-)
-requiredNamed = parser.add_argument_group("required arguments")
-requiredNamed.add_argument(
-    "-d",
-    "--dir",
-    help="Chemin vers le dossier contenant les donnees Datafficheur.",
-    required=True,
-    type=pathlib.Path,
-)
-parser.add_argument(
-    "-n",
-    "--note",
-    help=f"Fichier indiquant les temps de debut et fin et le type d'outil. Par defaut: note.csv",
-    default="note.csv",
-)
-parser.add_argument(
-    "-v", "--verbose", help="Affiche des messages sur la progression.", default=True
-)
-parser.add_argument(
-    "-o",
-    "--output",
-    help=f"Nom du fichier cree. Par defaut: output.csv",
-    default="output.csv",
-)
-parser.add_argument(
-    "-p",
-    "--plot",
-    help=f"Creation d'un graphique.",
-    action=argparse.BooleanOptionalAction,
-    default=True,
-)
-parser.add_argument(
-    "-op",
-    "--outputplot",
-    help=f"Sauvegarde du graphique (eg. format PDF, PNG, SVG). Par defaut: None",
-    default=None,
-)
-parser.add_argument(
-    "-pht",
-    "--plothticks",
-    type=int,
-    help=f"Segmentation de l'axe Y. Par defaut: 10",
-    default=10,
-    #default=20,
-)
-parser.add_argument(
-    "-z",
-    "--timezone",
-    help=f"Fuseau horaire. Par defaut: {DEFAULT_TIMEZONE}",
-)
-
-args = parser.parse_args()
-
-print(args)
-
-# definition de la timezone
-tz = args.timezone
-try:
-    tz = pytz.timezone(args.timezone)
-except pytz.exceptions.UnknownTimeZoneError:
-    if args.verbose:
-        print(f"TimeZone inconnu. utilisation de {DEFAULT_TIMEZONE}")
-    tz = DEFAULT_TIMEZONE
-
-#output = args.output # nom fichier csv
-output = OUTPUT
-note = args.note
-dir = args.dir
-hasNote = os.path.exists(os.path.join(dir, note))
-#plot = args.plot
-plot=True
-#outputplot = args.outputplot
-outputplot = OUTPUTPLOT # nom fichier pdf ou png
-outputfile = OUTPUTFILE # nom fichier pdf ou png
-verbose = args.verbose
-#args.plothticks = PLOTHTICKS
-plothticks = PLOTHTICKS
-
-def main(dir, hasNote, note, plot, verbose, outputplot, tz, output):
-    """
-    Fonction principale qui execute la chaine de traitement de donnees.
-
-    Args:
-        dir (str): Le repertoire contenant les fichiers de donnees.
-        hasNote (bool): Indique s'il faut ajouter des notes aux donnees.
-        note (str): Le nom du fichier contenant les notes.
-        plot (bool): Indique si un graphique doit etre cree.
-        verbose (bool): Si vrai, affiche des messages supplementaires pendant le processus.
-        outputplot (str): Le chemin du fichier de sortie pour le graphique.
-        tz (str): Le fuseau horaire a utiliser pour l'affichage des dates.
-        output (str): Le nom du fichier de sortie.
-    """
-
-    try:
-        # liste les fichiers sources
-        fichiers = find_files(dir)
-        if len(fichiers) == 0:
-            print(f"Aucun fichier de donnees dans {dir}")
-            exit()
-
-        # aggregation des datas
-        datas_par_fichier = [load_datafficheur_file(fichier) for fichier in fichiers]
-        concatenated_datas = pd.concat(datas_par_fichier)
-        # On trie et suppression des doublons
-        sorted_datas = concatenated_datas.sort_index()
-        datas = sorted_datas[~sorted_datas.index.duplicated("first")]
-
-        df = prepare_data(datas)
-
-        # collecte de la date de mesure pour intégration (titre graph + filename)
-        unique_dates = pd.Series(df.index.date).unique()
-        # Obtenir les dates minimale et maximale
-        min_date = unique_dates.min()
-        max_date = unique_dates.max()
-        date_str = ""
-        # si les mesures sont sur plus d'un jour ...
-        if len(unique_dates) > 1:
-            # ... on prend min et max
-            date_str = f"{min_date} - {max_date}"
-        else:
-            # ... sinon just min
-            date_str = f"{min_date}"
-
-        # ajout des notes au dataframe si existe
-        if hasNote:
-            df = add_notes(df, dir, note, verbose)
-
-        # creation des fichiers
-        if plot:
-            if verbose:
-                print("Creation des fichiers outputplot.")
-            create_plot(
-                df,
-                os.path.join(dir, date_str + "_Courbe-Efforts_" + outputplot) 
-                if outputplot 
-                else None,
-                verbose,
-                #args.plothticks,
-                plothticks,
-                date_str,
-            )
-            create_histograms(
-                df,
-                os.path.join(dir, date_str + "_Courbe-Freq_" + outputplot)
-                if outputplot
-                else None,
-            )
-            if verbose:
-                print("Creation des fichiers outputfile.")
-            create_plot(
-                df,
-                os.path.join(dir, date_str + "_Courbe-Efforts_" + outputfile) 
-                if outputfile 
-                else None,
-                verbose,
-                #args.plothticks,
-                plothticks,
-                date_str,
-				False
-            )
-            create_histograms(
-                df,
-                os.path.join(dir, date_str + "_Courbe-Freq_" + outputfile)
-                if outputfile
-                else None,
-                False,
-                show=False
-            )
-
-        df.columns = [" ".join(str(level) for level in col) for col in df.columns]
-        df.index = pd.MultiIndex.from_arrays(
-            [df.index.date, [t.strftime("%H:%M:%S.%f")[:10] for t in df.index.time]],
-            names=["date", "heure"],
-        )
-
-        if verbose:
-            #print(f"Ecriture du fichier de sortie {date_str}_{output}")
-            print(f"Creation du fichier CSV {date_str}_{output}")
-        df.to_csv(os.path.join(dir, date_str + "_" + output))
-
-    except Exception as e:
-        print(f"Une erreur s'est produite : {e}")
-
-
-if __name__ == "__main__":
-    main(dir, hasNote, note, plot, verbose, outputplot, tz, output)
+import argparse
+import os
+import pathlib
+from constants import DEFAULT_TIMEZONE, PLOTHTICKS, OUTPUTPLOT, OUTPUT, OUTPUTFILE, OUTPUTRESUME, OUTPUTPYRAMIDE, CACHE_DIR, CACHE_TAILLE_MAX, EXCLURE, EXCLURESUP, BINS, DENSITY, BINARY_FORMATS, STREAM_TAILLE_BLOC
+
+# Les dependances lourdes (pandas, numpy, matplotlib) sont importees dans les fonctions
+# qui s'en servent : --help repond immediatement et un traitement sans graphique
+# (--no-plot) n'importe jamais matplotlib.
+
+
+def build_parser():
+    """
+    Construit l'analyseur des arguments de la ligne de commande.
+
+    Returns:
+        argparse.ArgumentParser: L'analyseur des arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="Datafficheur",
+        description="Lecture des donnees du capteur Datafficheur. http://hippotese.free.fr/blog/index.php/?q=datafficheur",
+    )
+    requiredNamed = parser.add_argument_group("required arguments")
+    requiredNamed.add_argument(
+        "-d",
+        "--dir",
+        help="Chemin vers le dossier (ou l'archive ZIP) contenant les donnees Datafficheur.",
+        required=True,
+        type=pathlib.Path,
+    )
+    parser.add_argument(
+        "-n",
+        "--note",
+        help=f"Fichier indiquant les temps de debut et fin et le type d'outil. Par defaut: note.csv",
+        default="note.csv",
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Affiche des messages sur la progression.", default=True
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help=f"Nom du fichier cree. Par defaut: output.csv",
+        default="output.csv",
+    )
+    parser.add_argument(
+        "-p",
+        "--plot",
+        help=f"Creation d'un graphique.",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+    )
+    parser.add_argument(
+        "-op",
+        "--outputplot",
+        help=f"Sauvegarde du graphique (eg. format PDF, PNG, SVG). Par defaut: None",
+        default=None,
+    )
+    parser.add_argument(
+        "-pht",
+        "--plothticks",
+        type=int,
+        help=f"Segmentation de l'axe Y. Par defaut: 10",
+        default=10,
+        #default=20,
+    )
+    parser.add_argument(
+        "-z",
+        "--timezone",
+        help=f"Fuseau horaire. Par defaut: {DEFAULT_TIMEZONE}",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help=f"Nombre de fichiers lus en parallele (0 pour utiliser tous les coeurs). Par defaut: 1",
+        # None : option absente (refusee explicitement en mode surveillance)
+        default=None,
+    )
+    parser.add_argument(
+        "--cache",
+        help=f"Utilise le cache des fichiers deja analyses ({CACHE_DIR}). Par defaut: oui",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+    )
+    parser.add_argument(
+        "--show",
+        help=f"Affiche les graphiques a l'ecran en plus de les enregistrer.",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+    )
+    parser.add_argument(
+        "--raw",
+        help=f"Trace tous les echantillons de la courbe d'effort, sans reduction a l'enveloppe min/max.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        help=f"Format binaire colonnaire cree en plus du CSV (option repetable). Par defaut: aucun",
+        choices=list(BINARY_FORMATS),
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--resume",
+        help=f"Cree le resume des efforts (histogramme et moments) relu par compare.py. Par defaut: non",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+    )
+    parser.add_argument(
+        "--pyramide",
+        help=f"Cree la pyramide des efforts (minimum, maximum et moyenne par seconde, minute...) relue par pyramid.load_view. Par defaut: non",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+    )
+    parser.add_argument(
+        "--stream",
+        help=f"Traite les fichiers par blocs dans l'ordre du temps (tres longs enregistrements, memoire limitee).",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--chunk",
+        type=int,
+        help=f"Nombre de fichiers traites a la fois en mode flux. Par defaut: {STREAM_TAILLE_BLOC}",
+        default=STREAM_TAILLE_BLOC,
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        help=f"Surveille le dossier et traite les nouveaux fichiers au fil de l'eau (Ctrl+C pour arreter).",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        help=f"Periode de scrutation du dossier en mode surveillance, en secondes. Par defaut: 5",
+        default=5,
+    )
+    parser.add_argument(
+        "--plot-interval",
+        type=float,
+        help=f"Duree minimale entre deux rafraichissements des graphiques en mode surveillance, en secondes. Par defaut: 60",
+        default=60,
+    )
+    parser.add_argument(
+        "--clear-cache",
+        help=f"Vide le cache des fichiers deja analyses avant le traitement.",
+        action="store_true",
+    )
+    return parser
+
+
+def main(dir, hasNote, note, plot, verbose, outputplot, tz, output, jobs=1, cache=True, formats=(), raw=False, show=True, resume=False, outputfile=OUTPUTFILE, plothticks=PLOTHTICKS, stream=False, taille_bloc=STREAM_TAILLE_BLOC, pyramide=False):
+    """
+    Fonction principale qui execute la chaine de traitement de donnees.
+
+    Les erreurs sont propagees a l'appelant (run les affiche, le mode batch les
+    comptabilise par session).
+
+    Args:
+        dir (str): Le repertoire ou l'archive ZIP contenant les fichiers de donnees.
+        hasNote (bool): Indique s'il faut ajouter des notes aux donnees.
+        note (str): Le nom du fichier contenant les notes.
+        plot (bool): Indique si un graphique doit etre cree.
+        verbose (bool): Si vrai, affiche des messages supplementaires pendant le processus.
+        outputplot (str): Le chemin du fichier de sortie pour le graphique.
+        tz (str): Le fuseau horaire a utiliser pour l'affichage des dates.
+        output (str): Le nom du fichier de sortie.
+        jobs (int): Nombre de fichiers lus en parallele (0 pour tous les coeurs).
+        cache (bool): Indique si le cache des fichiers deja analyses doit etre utilise.
+        formats (list of str): Formats binaires (parquet, feather, npz) crees en plus du CSV.
+        raw (bool): Si vrai, la courbe d'effort trace tous les echantillons.
+        show (bool): Si vrai, les graphiques sont affiches a l'ecran.
+        resume (bool): Si vrai, le resume des efforts de la session est enregistre pour compare.py.
+        outputfile (str): Le nom du fichier de sortie pour les histogrammes.
+        plothticks (int): La segmentation de l'axe Y de la courbe d'effort.
+        stream (bool): Si vrai, la session est traitee par blocs de taille_bloc fichiers (voir stream.stream_session).
+        taille_bloc (int): Nombre de fichiers traites a la fois en mode flux.
+        pyramide (bool): Si vrai, la pyramide des efforts de la session est enregistree pour pyramid.load_view.
+
+    Raises:
+        ValueError: Si le dossier ne contient aucun fichier de donnees lisible.
+    """
+    import zipfile
+    from data_processing import load_datafficheur_files, merge_datafficheur_frames, add_notes, prepare_data, date_range_str
+    from distribution import histogram_stats, summary_from_stats, save_summary
+    from export import write_csv, write_binary
+    from utils import find_files, find_archive_members, find_archive_note, is_archive
+
+    # les fichiers d'une archive ZIP sont lus en memoire, sans extraction,
+    # et les sorties sont creees e cote de l'archive
+    archive = None
+    contenu_note = None
+    dossier_sortie = dir
+    prefixe = ""
+    if is_archive(dir):
+        archive = zipfile.ZipFile(dir)
+        dossier_sortie = os.path.dirname(os.path.abspath(dir))
+        prefixe = os.path.splitext(os.path.basename(dir))[0] + "_"
+
+    # liste les fichiers sources
+    fichiers = find_archive_members(archive) if archive else find_files(dir)
+    if len(fichiers) == 0:
+        raise ValueError(f"Aucun fichier de donnees dans {dir}")
+
+    if stream:
+        from stream import stream_session
+
+        if archive:
+            membre_note = find_archive_note(archive, note)
+            hasNote = membre_note is not None
+            if hasNote:
+                contenu_note = archive.read(membre_note)
+        if formats:
+            print("Les formats binaires ne sont pas crees en mode flux.")
+        try:
+            stream_session(
+                fichiers, dir, note, output, dossier_sortie, prefixe, archive, hasNote, contenu_note,
+                taille_bloc, jobs, CACHE_DIR if cache else None, CACHE_TAILLE_MAX, plot,
+                [sortie for sortie in (outputplot, outputfile) if sortie], plothticks, show, resume, verbose,
+                pyramide,
+            )
+        finally:
+            if archive:
+                archive.close()
+        return
+
+    # aggregation des datas
+    datas_par_fichier, erreurs = load_datafficheur_files(
+        fichiers,
+        jobs,
+        verbose,
+        archive,
+        CACHE_DIR if cache else None,
+        CACHE_TAILLE_MAX,
+    )
+    if archive:
+        membre_note = find_archive_note(archive, note)
+        hasNote = membre_note is not None
+        if hasNote:
+            contenu_note = archive.read(membre_note)
+        archive.close()
+    if erreurs:
+        print(f"{len(erreurs)} fichier(s) ignore(s) sur {len(fichiers)}.")
+    if len(datas_par_fichier) == 0:
+        raise ValueError(f"Aucun fichier de donnees lisible dans {dir}")
+    # fusion triee et suppression des doublons
+    fichiers_en_erreur = {fichier for fichier, _ in erreurs}
+    datas, _ = merge_datafficheur_frames(
+        datas_par_fichier,
+        [fichier for fichier in fichiers if fichier not in fichiers_en_erreur],
+        verbose=verbose,
+    )
+
+    # les copies intermediaires sont liberees au fur et e mesure
+    del datas_par_fichier
+    df = prepare_data(datas)
+    del datas
+
+    # collecte de la date de mesure pour intégration (titre graph + filename)
+    date_str = date_range_str(df.index)
+
+    # ajout des notes au dataframe si existe
+    if hasNote:
+        df = add_notes(df, dir, note, verbose, contenu_note)
+
+    # histogrammes et moments de toutes les colonnes, partages par le graphique et le resume
+    stats = None
+    if plot or resume:
+        efforts = df.select_dtypes("number")
+        stats = histogram_stats(efforts.to_numpy(), EXCLURE, EXCLURESUP, BINS, DENSITY)
+
+    # creation des fichiers : chaque figure est construite une fois puis
+    # enregistree dans tous les formats (outputplot et outputfile)
+    if plot:
+        from plotting import create_plot, create_histograms
+
+        sorties = [sortie for sortie in (outputplot, outputfile) if sortie]
+        if verbose:
+            print("Creation des graphiques.")
+        create_plot(
+            df,
+            [
+                os.path.join(dossier_sortie, prefixe + date_str + "_Courbe-Efforts_" + sortie)
+                for sortie in sorties
+            ],
+            verbose,
+            plothticks,
+            date_str,
+            show,
+            raw=raw,
+        )
+        create_histograms(
+            df,
+            [
+                os.path.join(dossier_sortie, prefixe + date_str + "_Courbe-Freq_" + sortie)
+                for sortie in sorties
+            ],
+            show=show,
+            stats=stats,
+        )
+
+    if resume:
+        nom = prefixe + date_str + "_" + OUTPUTRESUME + "_" + os.path.splitext(output)[0] + ".npz"
+        if verbose:
+            print(f"Creation du resume {nom}")
+        noms = [str(col[0]) if isinstance(col, tuple) else str(col) for col in efforts.columns]
+        save_summary(
+            summary_from_stats(noms, stats, EXCLURE, EXCLURESUP),
+            os.path.join(dossier_sortie, nom),
+        )
+
+    if pyramide:
+        from pyramid import build_pyramid, save_pyramid
+
+        nom = prefixe + date_str + "_" + OUTPUTPYRAMIDE + "_" + os.path.splitext(output)[0] + ".npz"
+        if verbose:
+            print(f"Creation de la pyramide {nom}")
+        save_pyramid(build_pyramid(df), os.path.join(dossier_sortie, nom))
+
+    if verbose:
+        #print(f"Ecriture du fichier de sortie {date_str}_{output}")
+        print(f"Creation du fichier CSV {prefixe}{date_str}_{output}")
+    write_csv(df, os.path.join(dossier_sortie, prefixe + date_str + "_" + output))
+
+    for format in formats:
+        nom = prefixe + date_str + "_" + os.path.splitext(output)[0] + BINARY_FORMATS[format]
+        if verbose:
+            print(f"Creation du fichier {nom}")
+        write_binary(df, os.path.join(dossier_sortie, nom), format)
+
+
+def plot_watch(df, date_str, dir, outputplot=OUTPUTPLOT, outputfile=OUTPUTFILE, verbose=False, plothticks=PLOTHTICKS, raw=False):
+    """
+    Rafraichit les graphiques du mode surveillance (fichiers outputplot et outputfile, sans affichage).
+
+    Args:
+        df (pandas.DataFrame): Le DataFrame prepare.
+        date_str (str): La date des mesures, utilisee dans le titre et le nom des fichiers.
+        dir (str): Le repertoire surveille, ou les graphiques sont crees.
+        outputplot (str): Le nom du fichier de sortie pour la courbe d'effort.
+        outputfile (str): Le nom du fichier de sortie pour les histogrammes.
+        verbose (bool): Si vrai, affiche des messages supplementaires.
+        plothticks (int): La segmentation de l'axe Y de la courbe d'effort.
+        raw (bool): Si vrai, la courbe d'effort trace tous les echantillons.
+    """
+    from plotting import create_plot, create_histograms
+
+    sorties = [sortie for sortie in (outputplot, outputfile) if sortie]
+    if not sorties:
+        return
+    if verbose:
+        print("Rafraichissement des graphiques.")
+    create_plot(
+        df,
+        [os.path.join(dir, date_str + "_Courbe-Efforts_" + sortie) for sortie in sorties],
+        verbose,
+        plothticks,
+        date_str,
+        False,
+        raw=raw,
+    )
+    create_histograms(
+        df,
+        [os.path.join(dir, date_str + "_Courbe-Freq_" + sortie) for sortie in sorties],
+        show=False,
+    )
+
+
+def run(argv=None):
+    """
+    Point d'entree de la ligne de commande : analyse les arguments puis traite le dossier
+    (ou le surveille avec --watch).
+
+    Args:
+        argv (list of str, optional): Les arguments de la ligne de commande. Par defaut : sys.argv.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    print(args)
+
+    import pytz
+    from utils import has_display, is_archive
+
+    if args.watch:
+        # la surveillance lit les fichiers un par un dans un dossier, sans cache
+        if is_archive(args.dir):
+            parser.error("--watch surveille un dossier, pas une archive ZIP.")
+        if args.jobs is not None:
+            parser.error("--jobs n'est pas utilise en mode surveillance (--watch).")
+        if args.cache is not None:
+            parser.error("--cache et --no-cache ne sont pas utilises en mode surveillance (--watch).")
+
+    # definition de la timezone
+    tz = args.timezone
+    try:
+        tz = pytz.timezone(args.timezone)
+    except pytz.exceptions.UnknownTimeZoneError:
+        if args.verbose:
+            print(f"TimeZone inconnu. utilisation de {DEFAULT_TIMEZONE}")
+        tz = DEFAULT_TIMEZONE
+
+    #output = args.output # nom fichier csv
+    output = OUTPUT
+    note = args.note
+    dir = args.dir
+    hasNote = os.path.exists(os.path.join(dir, note))
+    plot = args.plot
+    #outputplot = args.outputplot
+    outputplot = OUTPUTPLOT # nom fichier pdf ou png
+    outputfile = OUTPUTFILE # nom fichier pdf ou png
+    verbose = args.verbose
+    #args.plothticks = PLOTHTICKS
+    plothticks = PLOTHTICKS
+    # sans affichage, le backend Agg est choisi avant toute creation de figure
+    show = plot and args.show and has_display()
+    if plot and not show:
+        import matplotlib
+
+        matplotlib.use("Agg")
+    if args.clear_cache:
+        from cache import clear_cache
+
+        nb = clear_cache(CACHE_DIR)
+        if verbose:
+            print(f"Cache vide ({nb} fichiers supprimes)")
+
+    if args.watch:
+        from watch import watch
+
+        tracer = None
+        if plot:
+            def tracer(df, date_str):
+                plot_watch(df, date_str, dir, outputplot, outputfile, verbose, plothticks, args.raw)
+
+        watch(
+            dir,
+            note,
+            output,
+            verbose,
+            args.watch_interval,
+            args.plot_interval,
+            tracer,
+        )
+        return
+
+    try:
+        main(
+            dir, hasNote, note, plot, verbose, outputplot, tz, output,
+            1 if args.jobs is None else args.jobs, args.cache is not False,
+            args.format, args.raw, show, args.resume, outputfile, plothticks, args.stream, args.chunk,
+            args.pyramide,
+        )
+    except Exception as e:
+        print(f"Une erreur s'est produite : {e}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,511 @@
+import numpy as np
+
+# nombre maximal de cases de la grille fine utilisee par l'estimation de densite
+KDE_TAILLE_GRILLE_MAX = 1 << 20
+
+
+def integer_values(valeurs):
+    """
+    Convertit des efforts en entiers s'ils le sont deje en valeur (colonnes float32 de
+    prepare_data quand un capteur manque).
+
+    Args:
+        valeurs (numpy.ndarray): Les valeurs (NaN exclus au prealable).
+
+    Returns:
+        numpy.ndarray: Les valeurs en int64, ou None si l'une d'elles n'est pas entiere.
+    """
+    if np.issubdtype(valeurs.dtype, np.integer):
+        return valeurs.astype(np.int64, copy=False)
+    if np.all(np.floor(valeurs) == valeurs):
+        return valeurs.astype(np.int64)
+    return None
+
+
+def bin_counts(valeurs):
+    """
+    Compte les valeurs sur une grille reguliere : une case par kgf pour des efforts entiers
+    (comptage exact, voir integer_values), sinon une repartition lineaire sur 1024 cases.
+
+    Args:
+        valeurs (numpy.ndarray): Les valeurs (NaN exclus au prealable).
+
+    Returns:
+        tuple: Un tuple (origine, pas, comptes) ou comptes[k] est le poids de la valeur origine + k * pas.
+
+    Raises:
+        ValueError: Si valeurs est vide.
+    """
+    valeurs = np.asarray(valeurs)
+    if valeurs.size == 0:
+        raise ValueError("valeurs ne peut pas etre vide.")
+
+    entiers = integer_values(valeurs)
+    if entiers is not None:
+        origine = int(entiers.min())
+        return origine, 1.0, np.bincount(entiers - origine).astype(np.float64)
+
+    minimum, maximum = float(valeurs.min()), float(valeurs.max())
+    if minimum == maximum:
+        return minimum, 1.0, np.array([float(valeurs.size)])
+    pas = (maximum - minimum) / 1023
+    position = (valeurs - minimum) / pas
+    gauche = np.minimum(position.astype(np.int64), 1022)
+    poids_droite = position - gauche
+    comptes = np.bincount(gauche, weights=1 - poids_droite, minlength=1024)
+    comptes += np.bincount(gauche + 1, weights=poids_droite, minlength=1024)
+    return minimum, pas, comptes
+
+
+def normal_pdf(x, moyenne, ecart_type):
+    """
+    Densite de la loi normale, comme scipy.stats.norm.pdf(x, moyenne, ecart_type) sans
+    importer scipy.
+
+    Args:
+        x (numpy.ndarray): Les points ou evaluer la densite.
+        moyenne (float): La moyenne.
+        ecart_type (float): L'ecart type.
+
+    Returns:
+        numpy.ndarray: La densite aux points x (NaN si ecart_type n'est pas positif).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if not ecart_type > 0:
+        return np.full(x.shape, np.nan)
+    return np.exp(-0.5 * ((x - moyenne) / ecart_type) ** 2) / (ecart_type * np.sqrt(2 * np.pi))
+
+
+def kde_bandwidth(n, ecart_type, bw_adjust=0.5):
+    """
+    Largeur du noyau gaussien selon la regle de Scott, comme seaborn.kdeplot
+    (scipy.stats.gaussian_kde avec bw_method="scott", facteur multiplie par bw_adjust).
+
+    Args:
+        n (int): Nombre de valeurs.
+        ecart_type (float): Ecart type (ddof=1) des valeurs.
+        bw_adjust (float, optional): Facteur applique e la largeur. Par defaut : 0.5.
+
+    Returns:
+        float: L'ecart type du noyau.
+    """
+    return ecart_type * n ** (-1 / 5) * bw_adjust
+
+
+def binned_kde(origine, pas, comptes, bw, support):
+    """
+    Estimation de densite par noyau gaussien sur des valeurs deje comptees par cases,
+    par convolution FFT : le cout depend du nombre de cases et non du nombre de valeurs.
+
+    Les cases sont subdivisees pour que le pas de la grille fine ne depasse pas bw / 8,
+    la convolution y est exacte (noyau tronque e 6 bw) et la densite est ensuite
+    interpolee lineairement aux points du support.
+
+    Precision : avec des efforts entiers (une case par kgf), l'ecart e
+    scipy.stats.gaussian_kde (et donc e seaborn.kdeplot) reste inferieur e 0,5 % du
+    maximum de la densite. Avec la repartition lineaire des valeurs non entieres,
+    l'erreur est de l'ordre de (pas / bw)^2.
+
+    Args:
+        origine (float): Position de la premiere case.
+        pas (float): Ecart entre deux cases.
+        comptes (numpy.ndarray): Poids de chaque case (voir bin_counts).
+        bw (float): Ecart type du noyau.
+        support (numpy.ndarray): Points ou evaluer la densite.
+
+    Returns:
+        numpy.ndarray: La densite (d'integrale 1) aux points du support.
+
+    Raises:
+        ValueError: Si bw n'est pas positif ou si comptes est vide.
+    """
+    if not bw > 0:
+        raise ValueError("bw doit etre positif.")
+    total = comptes.sum()
+    if len(comptes) == 0 or total <= 0:
+        raise ValueError("comptes ne peut pas etre vide.")
+
+    # subdivision des cases : les valeurs restent sur des noeuds de la grille fine
+    subdivisions = max(1, int(np.ceil(8 * pas / bw)))
+    rayon = int(np.ceil(6 * bw / (pas / subdivisions)))
+    while (len(comptes) * subdivisions + 2 * rayon) > KDE_TAILLE_GRILLE_MAX and subdivisions > 1:
+        subdivisions = max(1, subdivisions // 2)
+        rayon = int(np.ceil(6 * bw / (pas / subdivisions)))
+    pas_fin = pas / subdivisions
+
+    grille = np.zeros((len(comptes) - 1) * subdivisions + 1 + 2 * rayon)
+    grille[rayon : rayon + len(comptes) * subdivisions : subdivisions] = comptes
+    ecarts = np.arange(-rayon, rayon + 1) * pas_fin
+    noyau = np.exp(-0.5 * (ecarts / bw) ** 2) / (bw * np.sqrt(2 * np.pi))
+
+    taille = 1 << int(np.ceil(np.log2(len(grille) + len(noyau) - 1)))
+    densite = np.fft.irfft(np.fft.rfft(grille, taille) * np.fft.rfft(noyau, taille), taille)
+    densite = densite[rayon : rayon + len(grille)] / total
+    np.maximum(densite, 0, out=densite)
+
+    positions = origine + (np.arange(len(grille)) - rayon) * pas_fin
+    return np.interp(support, positions, densite, left=0.0, right=0.0)
+
+
+def kde_curve(origine, pas, comptes, bw_adjust=0.5, gridsize=200, cut=3, ecart_type=None):
+    """
+    Courbe KDE equivalente e seaborn.kdeplot(data, bw_adjust=bw_adjust) calculee e partir
+    des comptes par cases : meme largeur de noyau (Scott), meme support de gridsize points
+    etendu de cut largeurs de noyau de part et d'autre des valeurs.
+
+    Args:
+        origine (float): Position de la premiere case.
+        pas (float): Ecart entre deux cases.
+        comptes (numpy.ndarray): Poids de chaque case (voir bin_counts).
+        bw_adjust (float, optional): Facteur applique e la largeur du noyau. Par defaut : 0.5.
+        gridsize (int, optional): Nombre de points de la courbe. Par defaut : 200.
+        cut (float, optional): Extension du support en largeurs de noyau. Par defaut : 3.
+        ecart_type (float, optional): Ecart type exact des valeurs s'il est connu, sinon il est
+            calcule sur les comptes. Par defaut : None.
+
+    Returns:
+        tuple: Un tuple (x, densite), ou (None, None) si la densite n'est pas definie
+        (moins de deux valeurs ou valeurs toutes egales).
+    """
+    n = comptes.sum()
+    positions = origine + np.arange(len(comptes)) * pas
+    if ecart_type is None and n > 1:
+        moyenne = (comptes * positions).sum() / n
+        ecart_type = np.sqrt((comptes * (positions - moyenne) ** 2).sum() / (n - 1))
+    if n < 2 or not ecart_type > 0:
+        return None, None
+
+    bw = kde_bandwidth(n, ecart_type, bw_adjust)
+    non_vides = np.flatnonzero(comptes)
+    minimum, maximum = positions[non_vides[0]], positions[non_vides[-1]]
+    x = np.linspace(minimum - cut * bw, maximum + cut * bw, gridsize)
+    return x, binned_kde(origine, pas, comptes, bw, x)
+
+
+def histogram_stats(valeurs, exclure, excluresup, bins=50, density=True, taille_max=1 << 22):
+    """
+    Calcule en une passe, pour toutes les colonnes e la fois, les histogrammes et les
+    moments des efforts compris strictement entre exclure et excluresup.
+
+    Le masque des valeurs retenues est calcule une seule fois pour le bloc entier. Les
+    efforts entiers (cas normal) sont comptes par kgf avec un seul np.bincount, chaque
+    colonne ayant sa propre plage de cases. Moments, barres de l'histogramme et courbe
+    KDE (kde_curve) sont ensuite deduits de ces comptes sans relire les donnees. Les
+    barres sont identiques e celles de plt.hist(data, bins=bins, density=density).
+    Des valeurs non entieres sont traitees colonne par colonne (comptes par bin_counts).
+
+    Args:
+        valeurs (numpy.ndarray): Le bloc des efforts, une colonne par capteur et pour le Total (NaN acceptes).
+        exclure (float): Seuil en dessous duquel (et auquel) les valeurs sont exclues.
+        excluresup (float): Seuil au dessus duquel (et auquel) les valeurs sont exclues.
+        bins (int, optional): Nombre de barres de l'histogramme. Par defaut : 50.
+        density (bool, optional): Si vrai, les hauteurs sont des densites, sinon des effectifs. Par defaut : True.
+        taille_max (int, optional): Nombre maximal de cases par kgf pour le comptage commun. Par defaut : 4194304.
+
+    Returns:
+        list: Une liste de dictionnaires, un par colonne, de cles "n", "moyenne", "ecart_type"
+        (ddof=1), "minimum", "maximum", "origine", "pas", "comptes" (comptes par case, voir
+        bin_counts), "bords" (bins + 1 bords des barres) et "hauteurs" (bins valeurs).
+        Les moments valent NaN pour une colonne sans valeur retenue.
+
+    Raises:
+        ValueError: Si valeurs n'est pas un tableau e deux dimensions ou si bins n'est pas positif.
+    """
+    valeurs = np.asarray(valeurs)
+    if valeurs.ndim != 2:
+        raise ValueError("valeurs doit etre un tableau e deux dimensions.")
+    if bins <= 0:
+        raise ValueError("bins doit etre un entier positif.")
+
+    nb_colonnes = valeurs.shape[1]
+    masque = (valeurs > exclure) & (valeurs < excluresup)
+    if np.issubdtype(valeurs.dtype, np.integer):
+        entiers = True
+    else:
+        entiers = bool(np.all(np.floor(valeurs) == valeurs, where=masque))
+
+    comptes_par_colonne = [None] * nb_colonnes
+    if entiers and masque.any():
+        # plage commune des cases : bornee par les seuils et par les valeurs presentes
+        origine = int(max(np.floor(exclure) + 1, np.nanmin(valeurs)))
+        fin = int(min(np.ceil(excluresup) - 1, np.nanmax(valeurs)))
+        largeur = max(fin - origine + 1, 1)
+        if largeur * nb_colonnes <= taille_max:
+            with np.errstate(invalid="ignore"):
+                # les NaN (toujours exclus) sont remplaces juste apres
+                cases = valeurs.astype(np.int64)
+            # case 0 de chaque colonne : valeurs exclues
+            cases[~masque] = origine - 1
+            cases += np.arange(nb_colonnes) * (largeur + 1) - (origine - 1)
+            comptes = np.bincount(cases.ravel(), minlength=nb_colonnes * (largeur + 1))
+            comptes = comptes.reshape(nb_colonnes, largeur + 1)[:, 1:].astype(np.float64)
+            for c in range(nb_colonnes):
+                non_vides = np.flatnonzero(comptes[c])
+                if len(non_vides):
+                    premiere, derniere = non_vides[0], non_vides[-1] + 1
+                    comptes_par_colonne[c] = (origine + int(premiere), 1.0, comptes[c, premiere:derniere])
+            entiers = True
+        else:
+            entiers = False
+
+    resultats = []
+    for c in range(nb_colonnes):
+        if entiers:
+            n = 0 if comptes_par_colonne[c] is None else int(comptes_par_colonne[c][2].sum())
+        else:
+            retenues = valeurs[masque[:, c], c].astype(np.float64)
+            n = len(retenues)
+        if n == 0:
+            bords = np.linspace(0, 1, bins + 1)
+            resultats.append({
+                "n": 0, "moyenne": np.nan, "ecart_type": np.nan, "minimum": np.nan, "maximum": np.nan,
+                "origine": None, "pas": None, "comptes": None, "bords": bords, "hauteurs": np.zeros(bins),
+            })
+            continue
+
+        if entiers:
+            origine, pas, comptes = comptes_par_colonne[c]
+            positions = origine + np.arange(len(comptes))
+            moyenne = (comptes * positions).sum() / n
+            carres = (comptes * (positions - moyenne) ** 2).sum()
+            minimum, maximum = positions[0], positions[-1]
+            effectifs_barres, bords = np.histogram(
+                positions, bins=bins, range=(minimum, maximum), weights=comptes
+            )
+        else:
+            origine, pas, comptes = bin_counts(retenues)
+            minimum, maximum = retenues.min(), retenues.max()
+            moyenne = retenues.mean()
+            carres = ((retenues - moyenne) ** 2).sum()
+            effectifs_barres, bords = np.histogram(retenues, bins=bins)
+
+        hauteurs = effectifs_barres / (n * np.diff(bords)) if density else effectifs_barres
+        resultats.append({
+            "n": n,
+            "moyenne": moyenne,
+            "ecart_type": np.sqrt(carres / (n - 1)) if n > 1 else np.nan,
+            "minimum": float(minimum),
+            "maximum": float(maximum),
+            "origine": origine,
+            "pas": pas,
+            "comptes": comptes,
+            "bords": bords,
+            "hauteurs": hauteurs,
+        })
+    return resultats
+
+
+def summary_from_stats(noms, stats, exclure, excluresup):
+    """
+    Construit le resume fusionnable d'une session e partir des resultats de histogram_stats :
+    pour chaque colonne, effectif, somme, somme des carres, minimum, maximum et comptes
+    par kgf (grille fixe, commune e toutes les sessions).
+
+    Args:
+        noms (list of str): Le nom de chaque colonne ("1", "2", "Total").
+        stats (list of dict): Les resultats de histogram_stats, dans le meme ordre.
+        exclure (float): Le seuil bas utilise par histogram_stats.
+        excluresup (float): Le seuil haut utilise par histogram_stats.
+
+    Returns:
+        dict: Un dictionnaire {"seuils": (exclure, excluresup), "colonnes": {nom: resume}}, ou
+        chaque resume est un dictionnaire de cles "n", "somme", "somme_carres", "minimum",
+        "maximum", "origine" et "comptes" (comptes[k] : effectif de la valeur origine + k kgf).
+    """
+    colonnes = {}
+    for nom, stat in zip(noms, stats):
+        n = stat["n"]
+        if n == 0:
+            colonnes[nom] = {
+                "n": 0, "somme": 0.0, "somme_carres": 0.0, "minimum": np.nan, "maximum": np.nan,
+                "origine": 0, "comptes": np.zeros(0),
+            }
+            continue
+        # les efforts non entiers sont comptes dans la case du kgf le plus proche
+        cases = np.rint(stat["origine"] + np.arange(len(stat["comptes"])) * stat["pas"]).astype(np.int64)
+        origine = int(cases[0])
+        moyenne = stat["moyenne"]
+        variance = stat["ecart_type"] ** 2 if n > 1 else 0.0
+        colonnes[nom] = {
+            "n": n,
+            "somme": moyenne * n,
+            "somme_carres": variance * (n - 1) + n * moyenne ** 2,
+            "minimum": stat["minimum"],
+            "maximum": stat["maximum"],
+            "origine": origine,
+            "comptes": np.bincount(cases - origine, weights=stat["comptes"]),
+        }
+    return {"seuils": (exclure, excluresup), "colonnes": colonnes}
+
+
+def merge_summaries(resume, autre):
+    """
+    Fusionne deux resumes (summary_from_stats) colonne par colonne : le resultat est celui
+    qu'aurait donne une seule session contenant les deux jeux de donnees. La taille d'un
+    resume ne depend que de la plage des efforts, pas du nombre de sessions fusionnees.
+
+    Args:
+        resume (dict): Le premier resume, ou None.
+        autre (dict): Le resume e ajouter.
+
+    Returns:
+        dict: Le resume fusionne (nouvel objet, les arguments ne sont pas modifies).
+    """
+    if resume is None:
+        return autre
+    if resume["seuils"] != autre["seuils"]:
+        print(
+            f"Attention : resumes calcules avec des seuils differents "
+            f"({resume['seuils']} et {autre['seuils']})."
+        )
+
+    colonnes = dict(resume["colonnes"])
+    for nom, b in autre["colonnes"].items():
+        a = colonnes.get(nom)
+        if a is None or a["n"] == 0:
+            colonnes[nom] = b
+            continue
+        if b["n"] == 0:
+            continue
+        origine = min(a["origine"], b["origine"])
+        fin = max(a["origine"] + len(a["comptes"]), b["origine"] + len(b["comptes"]))
+        comptes = np.zeros(fin - origine)
+        for c in (a, b):
+            comptes[c["origine"] - origine : c["origine"] - origine + len(c["comptes"])] += c["comptes"]
+        colonnes[nom] = {
+            "n": a["n"] + b["n"],
+            "somme": a["somme"] + b["somme"],
+            "somme_carres": a["somme_carres"] + b["somme_carres"],
+            "minimum": min(a["minimum"], b["minimum"]),
+            "maximum": max(a["maximum"], b["maximum"]),
+            "origine": origine,
+            "comptes": comptes,
+        }
+    return {"seuils": resume["seuils"], "colonnes": colonnes}
+
+
+def summary_moments(colonne):
+    """
+    Calcule la moyenne et l'ecart type (ddof=1) d'une colonne d'un resume.
+
+    Args:
+        colonne (dict): Le resume d'une colonne (voir summary_from_stats).
+
+    Returns:
+        tuple: Un tuple (moyenne, ecart_type), NaN si l'effectif est insuffisant.
+    """
+    n = colonne["n"]
+    if n == 0:
+        return np.nan, np.nan
+    moyenne = colonne["somme"] / n
+    if n == 1:
+        return moyenne, np.nan
+    variance = max(colonne["somme_carres"] - n * moyenne ** 2, 0.0) / (n - 1)
+    return moyenne, np.sqrt(variance)
+
+
+def save_summary(resume, chemin):
+    """
+    Enregistre un resume de session au format npz (sans objet Python, relisible par load_summary).
+
+    Args:
+        resume (dict): Le resume (voir summary_from_stats).
+        chemin (str): Le chemin du fichier .npz e creer.
+
+    Returns:
+        None
+    """
+    noms = list(resume["colonnes"])
+    tableaux = {
+        "noms": np.array(noms, dtype=str),
+        "seuils": np.array(resume["seuils"], dtype=np.float64),
+        "moments": np.array(
+            [
+                [c["n"], c["somme"], c["somme_carres"], c["minimum"], c["maximum"]]
+                for c in resume["colonnes"].values()
+            ],
+            dtype=np.float64,
+        ).reshape(len(noms), 5),
+        "origines": np.array([c["origine"] for c in resume["colonnes"].values()], dtype=np.int64),
+    }
+    for i, colonne in enumerate(resume["colonnes"].values()):
+        tableaux[f"comptes_{i}"] = colonne["comptes"]
+    with open(chemin, "wb") as f:
+        np.savez(f, **tableaux)
+
+
+def load_summary(chemin):
+    """
+    Relit un resume de session enregistre par save_summary.
+
+    Args:
+        chemin (str): Le chemin du fichier .npz.
+
+    Returns:
+        dict: Le resume (voir summary_from_stats).
+    """
+    with np.load(chemin, allow_pickle=False) as npz:
+        colonnes = {}
+        for i, nom in enumerate(npz["noms"].tolist()):
+            n, somme, somme_carres, minimum, maximum = npz["moments"][i].tolist()
+            colonnes[nom] = {
+                "n": int(n),
+                "somme": somme,
+                "somme_carres": somme_carres,
+                "minimum": minimum,
+                "maximum": maximum,
+                "origine": int(npz["origines"][i]),
+                "comptes": npz[f"comptes_{i}"],
+            }
+        seuils = tuple(npz["seuils"].tolist())
+    return {"seuils": seuils, "colonnes": colonnes}
+
+
+def stats_from_summary(resume, noms, bins=50, density=True):
+    """
+    Reconstruit, e partir d'un resume (eventuellement fusionne sur plusieurs blocs ou
+    sessions), les resultats qu'aurait donnes histogram_stats : ils peuvent etre passes
+    tels quels e create_histograms.
+
+    Args:
+        resume (dict): Le resume (voir summary_from_stats et merge_summaries).
+        noms (list of str): Les colonnes voulues, dans l'ordre des sous-graphiques.
+        bins (int, optional): Nombre de barres de l'histogramme. Par defaut : 50.
+        density (bool, optional): Si vrai, les hauteurs sont des densites, sinon des effectifs. Par defaut : True.
+
+    Returns:
+        list: Une liste de dictionnaires, un par colonne, de memes cles que histogram_stats.
+    """
+    resultats = []
+    for nom in noms:
+        colonne = resume["colonnes"].get(nom)
+        if colonne is None or colonne["n"] == 0:
+            resultats.append({
+                "n": 0, "moyenne": np.nan, "ecart_type": np.nan, "minimum": np.nan, "maximum": np.nan,
+                "origine": None, "pas": None, "comptes": None,
+                "bords": np.linspace(0, 1, bins + 1), "hauteurs": np.zeros(bins),
+            })
+            continue
+        n = colonne["n"]
+        moyenne, ecart_type = summary_moments(colonne)
+        comptes = colonne["comptes"]
+        # les cases arrondies au kgf restent dans la plage reelle des valeurs
+        positions = np.clip(
+            colonne["origine"] + np.arange(len(comptes)), colonne["minimum"], colonne["maximum"]
+        )
+        effectifs_barres, bords = np.histogram(
+            positions, bins=bins, range=(colonne["minimum"], colonne["maximum"]), weights=comptes
+        )
+        resultats.append({
+            "n": n,
+            "moyenne": moyenne,
+            "ecart_type": ecart_type,
+            "minimum": colonne["minimum"],
+            "maximum": colonne["maximum"],
+            "origine": colonne["origine"],
+            "pas": 1.0,
+            "comptes": comptes,
+            "bords": bords,
+            "hauteurs": effectifs_barres / (n * np.diff(bords)) if density else effectifs_barres,
+        })
+    return resultats
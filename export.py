@@ -0,0 +1,275 @@
+import csv
+import io
+import os
+import numpy as np
+import pandas as pd
+from constants import BINARY_FORMATS
+
+NS_PAR_JOUR = 86_400_000_000_000
+NS_PAR_SECONDE = 1_000_000_000
+
+# chaines "00" e "59" et "0" e "9" pour composer les heures sans strftime
+DEUX_CHIFFRES = np.array([f"{i:02d}" for i in range(60)], dtype=object)
+UN_CHIFFRE = np.array([str(i) for i in range(10)], dtype=object)
+
+
+def format_index(index):
+    """
+    Formate l'index temporel en colonnes date (aaaa-mm-jj) et heure (hh:mm:ss.d) de facon vectorisee.
+
+    Equivalent e [t.strftime("%H:%M:%S.%f")[:10] for t in index.time] (dixieme de seconde
+    tronque) et e index.date, sans appel Python par echantillon : les dates sont formatees
+    une fois par jour distinct et les heures composees e partir de tables de chaines.
+
+    Args:
+        index (pandas.DatetimeIndex): L'index des donnees (sans fuseau horaire).
+
+    Returns:
+        tuple: Un tuple (dates, heures) de tableaux numpy d'objets str.
+    """
+    ns = index.to_numpy(dtype="datetime64[ns]").view("int64")
+    jours, inverse = np.unique(ns // NS_PAR_JOUR, return_inverse=True)
+    dates = np.array(
+        [str(jour) for jour in jours.astype("datetime64[D]")], dtype=object
+    )[inverse]
+
+    dans_le_jour = ns % NS_PAR_JOUR
+    secondes = dans_le_jour // NS_PAR_SECONDE
+    dixiemes = (dans_le_jour % NS_PAR_SECONDE) // (NS_PAR_SECONDE // 10)
+    heures = (
+        DEUX_CHIFFRES[secondes // 3600]
+        + ":"
+        + DEUX_CHIFFRES[(secondes // 60) % 60]
+        + ":"
+        + DEUX_CHIFFRES[secondes % 60]
+        + "."
+        + UN_CHIFFRE[dixiemes]
+    )
+    return dates, heures
+
+
+def quote_csv(valeurs):
+    """
+    Met des valeurs au format d'un champ CSV (guillemets si necessaire, comme pandas.to_csv).
+
+    Args:
+        valeurs (iterable): Les valeurs e formater, None ou NaN donnent un champ vide.
+
+    Returns:
+        list: Les champs formates.
+    """
+    tampon = io.StringIO()
+    # meme fin de ligne que pandas.to_csv : elle determine aussi les champs e mettre entre guillemets
+    writer = csv.writer(tampon, lineterminator=os.linesep)
+    champs = []
+    for valeur in valeurs:
+        if pd.isna(valeur) or valeur == "":
+            # un champ vide seul sur sa ligne serait ecrit "" par le module csv
+            champs.append("")
+            continue
+        tampon.seek(0)
+        tampon.truncate()
+        writer.writerow([valeur])
+        champs.append(tampon.getvalue()[: -len(os.linesep)])
+    return champs
+
+
+def format_column(serie):
+    """
+    Formate une colonne en champs CSV de facon vectorisee.
+
+    Les entiers passent par une table des valeurs distinctes (les efforts couvrent une petite
+    plage), les categories (colonne "action") ne sont formatees qu'une fois par libelle.
+
+    Args:
+        serie (pandas.Series): La colonne e formater.
+
+    Returns:
+        numpy.ndarray: Un tableau d'objets str.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        libelles = np.array(quote_csv(serie.cat.categories) + [""], dtype=object)
+        # le code -1 (pas de libelle) designe le dernier element : le champ vide
+        return libelles[serie.cat.codes.to_numpy()]
+
+    valeurs = serie.to_numpy()
+    if np.issubdtype(valeurs.dtype, np.integer):
+        if len(valeurs) == 0:
+            return valeurs.astype(object)
+        minimum = int(valeurs.min())
+        maximum = int(valeurs.max())
+        if maximum - minimum <= len(valeurs):
+            table = np.array([str(i) for i in range(minimum, maximum + 1)], dtype=object)
+            return table[valeurs - minimum]
+        return valeurs.astype(str).astype(object)
+    if np.issubdtype(valeurs.dtype, np.floating):
+        return np.where(np.isnan(valeurs), "", valeurs.astype(str)).astype(object)
+    return np.array(quote_csv(valeurs), dtype=object)
+
+
+def write_csv(df, chemin, mode="w", chunksize=100_000):
+    """
+    Ecrit le DataFrame prepare dans le fichier CSV de sortie (une ligne par dixieme
+    de seconde, colonnes date et heure puis une colonne par capteur).
+
+    Le format est identique octet pour octet e celui de df.to_csv avec un index
+    (date, heure) formate par strftime, mais les colonnes sont formatees de facon
+    vectorisee et le fichier est ecrit par gros blocs de lignes.
+
+    Args:
+        df (pandas.DataFrame): Le DataFrame prepare par prepare_data (et add_notes). Il n'est pas modifie.
+        chemin (str): Le chemin du fichier CSV.
+        mode (str, optional): "w" pour creer le fichier, "a" pour ajouter des lignes sans en-tete. Par defaut : "w".
+        chunksize (int, optional): Nombre de lignes assemblees et ecrites e la fois. Par defaut : 100000.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: Si mode n'est pas "w" ou "a", ou si df n'a pas un index temporel.
+    """
+    if mode not in ("w", "a"):
+        raise ValueError("mode doit etre 'w' ou 'a'.")
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise ValueError("df doit etre indexe par des dates.")
+
+    # meme fin de ligne que pandas.to_csv
+    fin_de_ligne = os.linesep
+    dates, heures = format_index(df.index)
+    colonnes = [dates, heures] + [
+        format_column(df.iloc[:, i]) for i in range(len(df.columns))
+    ]
+
+    with open(chemin, mode, encoding="utf-8", newline="", buffering=1 << 20) as f:
+        if mode == "w":
+            noms = [
+                " ".join(str(level) for level in col) if isinstance(col, tuple) else str(col)
+                for col in df.columns
+            ]
+            f.write(",".join(quote_csv(["date", "heure"] + noms)) + fin_de_ligne)
+        for debut in range(0, len(df), chunksize):
+            lignes = zip(*(colonne[debut : debut + chunksize] for colonne in colonnes))
+            f.write(fin_de_ligne.join(map(",".join, lignes)) + fin_de_ligne)
+
+
+
+def flatten_columns(df):
+    """
+    Remplace les colonnes (capteur, "Efforts") par des noms simples ("1 Efforts", "Total Efforts", "action").
+
+    Args:
+        df (pandas.DataFrame): Le DataFrame prepare. Il n'est pas modifie.
+
+    Returns:
+        pandas.DataFrame: Une copie superficielle (sans copie des donnees) aux colonnes renommees.
+    """
+    df = df.copy(deep=False)
+    df.columns = [
+        " ".join(str(level) for level in col).strip() if isinstance(col, tuple) else str(col)
+        for col in df.columns
+    ]
+    return df
+
+
+def require_pyarrow(format):
+    """
+    Verifie que pyarrow, dependance optionnelle des formats parquet et feather, est installe.
+
+    Args:
+        format (str): Le format demande, pour le message d'erreur.
+
+    Raises:
+        ImportError: Si pyarrow n'est pas installe.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print(f"Le format {format} necessite pyarrow (pip install pyarrow).")
+        raise
+
+
+def write_binary(df, chemin, format):
+    """
+    Ecrit le DataFrame prepare dans un format binaire colonnaire, relisible par read_binary
+    sans analyse de texte.
+
+    L'index datetime64, les colonnes de chaque capteur et du Total (type entier compact)
+    et la colonne categorielle "action" sont conserves. Les fichiers ne sont pas
+    compresses : feather est relu par projection memoire (memory-map), npz colonne
+    par colonne sans conversion.
+
+    Args:
+        df (pandas.DataFrame): Le DataFrame prepare par prepare_data (et add_notes).
+        chemin (str): Le chemin du fichier e creer.
+        format (str): "parquet", "feather" ou "npz".
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: Si le format est inconnu.
+        ImportError: Si pyarrow est necessaire mais absent.
+    """
+    if format not in BINARY_FORMATS:
+        raise ValueError(f"format doit etre l'un de {', '.join(BINARY_FORMATS)}.")
+
+    df = flatten_columns(df)
+    if format == "parquet":
+        require_pyarrow(format)
+        df.to_parquet(chemin, index=True, compression=None)
+    elif format == "feather":
+        require_pyarrow(format)
+        # feather ne stocke pas l'index : il devient la colonne "date"
+        df.rename_axis("date").reset_index().to_feather(chemin, compression="uncompressed")
+    else:
+        tableaux = {"index": df.index.to_numpy(dtype="datetime64[ns]").view("int64")}
+        for i, nom in enumerate(df.columns):
+            colonne = df.iloc[:, i]
+            if isinstance(colonne.dtype, pd.CategoricalDtype):
+                tableaux[f"codes_{i}"] = colonne.cat.codes.to_numpy()
+                tableaux[f"categories_{i}"] = colonne.cat.categories.to_numpy(dtype=str)
+            else:
+                tableaux[f"valeurs_{i}"] = colonne.to_numpy()
+        tableaux["colonnes"] = np.array(df.columns, dtype=str)
+        with open(chemin, "wb") as f:
+            np.savez(f, **tableaux)
+
+
+def read_binary(chemin):
+    """
+    Relit un fichier ecrit par write_binary (format deduit de l'extension).
+
+    Args:
+        chemin (str): Le chemin du fichier .parquet, .feather ou .npz.
+
+    Returns:
+        pandas.DataFrame: Le DataFrame indexe par la colonne "date" (datetime64), colonnes
+        "1 Efforts", ..., "Total Efforts" et eventuellement "action" (categorielle).
+
+    Raises:
+        ValueError: Si l'extension est inconnue.
+        ImportError: Si pyarrow est necessaire mais absent.
+    """
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension == ".parquet":
+        require_pyarrow("parquet")
+        return pd.read_parquet(chemin, memory_map=True)
+    if extension == ".feather":
+        require_pyarrow("feather")
+        from pyarrow import feather
+
+        table = feather.read_table(chemin, memory_map=True)
+        return table.to_pandas().set_index("date")
+    if extension == ".npz":
+        with np.load(chemin, allow_pickle=False) as npz:
+            colonnes = {}
+            for i, nom in enumerate(npz["colonnes"].tolist()):
+                if f"codes_{i}" in npz:
+                    colonnes[nom] = pd.Categorical.from_codes(
+                        npz[f"codes_{i}"], categories=npz[f"categories_{i}"].astype(object)
+                    )
+                else:
+                    colonnes[nom] = npz[f"valeurs_{i}"]
+            index = pd.DatetimeIndex(npz["index"].view("datetime64[ns]"), name="date")
+        return pd.DataFrame(colonnes, index=index)
+    raise ValueError(f"Extension {extension} inconnue.")
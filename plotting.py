@@ -1,40 +1,171 @@
 from matplotlib import pyplot as plt
-import matplotlib
 import numpy as np
 import pandas as pd
-import seaborn as sns
-from scipy.stats import norm
-from constants import GRAPH_ALPHA, HISTO_SUBDIVISIONS_X, PLOTHTICKS, DENSITY, BINS, EXCLURE, EXCLURESUP, OUTPUTFILE
+from constants import GRAPH_ALPHA, HISTO_SUBDIVISIONS_X, PLOTHTICKS, DENSITY, BINS, EXCLURE, EXCLURESUP, OUTPUTFILE, KDE_SEABORN
+from distribution import histogram_stats, kde_curve, summary_moments, normal_pdf
 
 
-def create_plot(df, outputplot=None, verbose=False, hticks=10, sufixe=None, show=True):
+# taille et resolution de la figure de la courbe d'effort
+COURBE_FIGSIZE = (9.60, 5.40)
+COURBE_DPI = 200
+# nombre de segments rendus d'un bloc par Agg : une enveloppe min/max en zigzag rendue
+# d'un seul trait occupe plusieurs centaines de Mo pendant l'enregistrement en PNG
+COURBE_PATH_CHUNKSIZE = 1000
+
+
+def minmax_positions(temps, valeurs, nb_pixels, debut=None, fin=None):
+    """
+    Positions des echantillons de l'enveloppe min/max : l'intervalle [debut, fin] est
+    decoupe en nb_pixels intervalles egaux et la premiere position du minimum et du
+    maximum de chaque intervalle est gardee.
+
+    Avec des bornes debut et fin fixees (celles de toute la session), l'enveloppe d'une
+    suite de blocs est celle de la session entiere : les blocs peuvent etre reduits
+    separement puis concatenes et reduits de nouveau.
+
+    Args:
+        temps (numpy.ndarray): Les instants en nanosecondes (int64), tries.
+        valeurs (numpy.ndarray): Les valeurs correspondantes.
+        nb_pixels (int): Nombre d'intervalles.
+        debut (int, optional): Debut de l'axe en nanosecondes. Par defaut : temps[0].
+        fin (int, optional): Fin de l'axe en nanosecondes. Par defaut : temps[-1].
+
+    Returns:
+        numpy.ndarray: Les positions retenues, triees et sans doublon.
+    """
+    n = len(valeurs)
+    debut = temps[0] if debut is None else debut
+    fin = temps[-1] if fin is None else fin
+    duree = max(int(fin - debut), 1)
+    intervalle = ((temps - debut) * (nb_pixels / duree)).astype(np.int64)
+    np.clip(intervalle, 0, nb_pixels - 1, out=intervalle)
+    debuts = np.flatnonzero(np.concatenate(([True], intervalle[1:] != intervalle[:-1])))
+    tailles = np.diff(np.append(debuts, n))
+
+    # les NaN ne doivent pas masquer les valeurs de leur intervalle
+    v = valeurs.astype(np.float64)
+    bas = np.where(np.isnan(v), np.inf, v)
+    haut = np.where(np.isnan(v), -np.inf, v)
+    minimums = np.minimum.reduceat(bas, debuts)
+    maximums = np.maximum.reduceat(haut, debuts)
+
+    # premiere position du minimum et du maximum dans chaque intervalle
+    numero = np.repeat(np.arange(len(debuts)), tailles)
+    pos_min = np.flatnonzero(bas == minimums[numero])
+    pos_min = pos_min[np.unique(numero[pos_min], return_index=True)[1]]
+    pos_max = np.flatnonzero(haut == maximums[numero])
+    pos_max = pos_max[np.unique(numero[pos_max], return_index=True)[1]]
+
+    positions = np.sort(np.concatenate((pos_min, pos_max)))
+    return positions[np.concatenate(([True], positions[1:] != positions[:-1]))]
+
+
+def decimate_minmax(index, valeurs, nb_pixels):
+    """
+    Reduit une courbe e son enveloppe min/max : l'axe du temps est decoupe en nb_pixels
+    intervalles egaux et seuls le minimum et le maximum de chaque intervalle sont gardes,
+    dans leur ordre chronologique. Les pics d'effort restent donc visibles e l'ecran.
+
+    Args:
+        index (numpy.ndarray): Les instants (datetime64) tries.
+        valeurs (numpy.ndarray): Les valeurs correspondantes.
+        nb_pixels (int): Nombre d'intervalles, en pratique la largeur du graphique en pixels.
+
+    Returns:
+        tuple: Un tuple (index, valeurs) d'au plus 2 * nb_pixels points, ou les tableaux
+        d'origine s'ils sont deje assez courts.
+
+    Raises:
+        ValueError: Si nb_pixels n'est pas positif.
+    """
+    if nb_pixels <= 0:
+        raise ValueError("nb_pixels doit etre un entier positif.")
+    if len(valeurs) <= 2 * nb_pixels:
+        return index, valeurs
+
+    positions = minmax_positions(index.astype("datetime64[ns]").view("int64"), valeurs, nb_pixels)
+    return index[positions], valeurs[positions]
+
+
+def output_paths(outputs, nom):
+    """
+    Normalise la ou les destinations d'un graphique en une liste de chemins.
+
+    Args:
+        outputs (str ou list of str): Un chemin, une liste de chemins (un par format, ex. PDF et PNG) ou None.
+        nom (str): Le nom du parametre, pour le message d'erreur.
+
+    Returns:
+        list: La liste des chemins (vide si outputs est None).
+
+    Raises:
+        ValueError: Si outputs n'est ni None, ni une chaine, ni une liste de chaines.
+    """
+    if outputs is None:
+        return []
+    if isinstance(outputs, str):
+        return [outputs]
+    outputs = list(outputs)
+    if not all(isinstance(output, str) for output in outputs):
+        raise ValueError(f"{nom} doit etre une chaine de caracteres ou une liste de chaines.")
+    return outputs
+
+
+def save_figure(fig, outputs, show, verbose=False):
+    """
+    Enregistre une figure deje construite dans chacun des fichiers demandes (le format
+    est deduit de l'extension), puis la ferme pour liberer la memoire sauf si elle doit
+    etre affichee.
+
+    Args:
+        fig (matplotlib.figure.Figure): La figure e enregistrer.
+        outputs (list of str): Les chemins des fichiers.
+        show (bool): Si vrai, la figure reste ouverte pour etre affichee par plt.show().
+        verbose (bool, optional): Si vrai, affiche les fichiers crees. Par defaut : False.
+    """
+    for output in outputs:
+        if verbose:
+            print(f"Export du graphique dans {output}.")
+        fig.savefig(output)
+    if not show:
+        plt.close(fig)
+
+
+def create_plot(df, outputplot=None, verbose=False, hticks=10, sufixe=None, show=True, raw=False):
     """
     Cree un graphique a partir des donnees fournies et l'enregistre dans un fichier si specifie.
 
+    Par defaut chaque courbe est reduite e son enveloppe min/max e la resolution de la
+    figure (decimate_minmax) : le temps de rendu et la taille des PDF ne dependent plus
+    de la duree de la session, et les pics restent visibles.
+
     Args:
         df (pandas.DataFrame): Le DataFrame a representer graphiquement.
-        outputplot (str, optional): Le nom du fichier ou sauvegarder le graphique. Si None, le graphique est affiche. Par defaut : None.
+        outputplot (str ou list of str, optional): Le ou les fichiers ou sauvegarder le graphique, la figure
+            n'est construite qu'une fois pour tous les formats. Par defaut : None.
         verbose (bool, optional): Si vrai, affiche des messages supplementaires pendant la creation du graphique. Par defaut : False.
+        show (bool, optional): Si vrai, la figure reste ouverte pour etre affichee par plt.show(),
+            sinon elle est fermee apres l'enregistrement. Par defaut : True.
+        raw (bool, optional): Si vrai, trace tous les echantillons sans reduction. Par defaut : False.
 
     Returns:
         None
 
     Raises:
         ValueError: Si df n'est pas un DataFrame pandas 
-                    Si outputplot n'est pas une chaine de caracteres
+                    Si outputplot n'est pas une chaine de caracteres ou une liste de chaines
                     Si df n'a pas deux ou trois colonnes
     """
     if not isinstance(df, pd.DataFrame):
         raise ValueError("df doit etre un DataFrame pandas.")
-    if outputplot is not None and not isinstance(outputplot, str):
-        raise ValueError("outputplot doit etre une chaine de caracteres.")
+    outputs = output_paths(outputplot, "outputplot")
 
-    if not show:
-        matplotlib.use('Agg')
+    # la colonne "action" ajoutee par add_notes n'est pas tracee
+    df = df.select_dtypes("number")
 
     #plt.figure(figsize=(19.20, 10.80), dpi=300)    
     #plt.figure(figsize=(19.20, 10.80), dpi=200)
-    plt.figure(figsize=(9.60, 5.40), dpi=200)
+    fig = plt.figure(figsize=COURBE_FIGSIZE, dpi=COURBE_DPI)
     #plt.figure(figsize=(19.20, 10.80), dpi=100)
     #plt.figure(figsize=(19.20, 10.80), dpi=50)
 
@@ -48,8 +179,13 @@ def create_plot(df, outputplot=None, verbose=False, hticks=10, sufixe=None, show
     else:
         raise ValueError("Le DataFrame doit avoir deux ou trois colonnes.")
 
+    nb_pixels = int(fig.get_figwidth() * fig.dpi)
+    index = df.index.to_numpy()
     for col, label in zip(df.columns, labels):
-        plt.plot(df[col], label=label, alpha=GRAPH_ALPHA)
+        x, y = index, df[col].to_numpy()
+        if not raw:
+            x, y = decimate_minmax(x, y, nb_pixels)
+        plt.plot(x, y, label=label, alpha=GRAPH_ALPHA)
 
     max_y = df.max().max()  # Obtient la valeur maximale dans le DataFrame
     plt.yticks(
@@ -67,14 +203,15 @@ def create_plot(df, outputplot=None, verbose=False, hticks=10, sufixe=None, show
     plt.xlabel("Temps")
     plt.ylabel("kgf (kilogramme force - comparable au daN)")
 
-    plt.savefig(outputplot)
+    with plt.rc_context({"agg.path.chunksize": COURBE_PATH_CHUNKSIZE}):
+        save_figure(fig, outputs, show, verbose)
 
 
 
 ###########
 ###########
 #def create_histograms(df, outputfile=None, exclure=9, verbose=False):
-def create_histograms(df, outputfile=OUTPUTFILE, exclure=EXCLURE, excluresup=EXCLURESUP, verbose=False, show=True):
+def create_histograms(df, outputfile=OUTPUTFILE, exclure=EXCLURE, excluresup=EXCLURESUP, verbose=False, show=True, stats=None):
     """
     Crée un histogramme et une courbe KDE pour chaque colonne du DataFrame,
     excluant les valeurs inférieures à un certain seuil.
@@ -82,54 +219,70 @@ def create_histograms(df, outputfile=OUTPUTFILE, exclure=EXCLURE, excluresup=EXC
 
     Args:
         df (pandas.DataFrame): Le DataFrame dont les donnees seront utilisees pour les histogrammes.
-        outputfile (str): Le nom du fichier ou sauvegarder le graphique.
+        outputfile (str ou list of str): Le ou les fichiers ou sauvegarder le graphique, la figure
+            (histogrammes, KDE et lois normales) n'est calculee qu'une fois pour tous les formats.
         exclure (float, optional): Le seuil en dessous duquel les valeurs seront exclues de l'histogramme. Par defaut : 9.
         excluresup (float, optional): Le seuil en dessus duquel les valeurs seront exclues de l'histogramme. Par defaut : 9.
+        show (bool, optional): Si vrai, affiche les figures ouvertes avec plt.show() puis les ferme,
+            sinon seule la figure des histogrammes est fermee apres l'enregistrement. Par defaut : True.
+        stats (list of dict, optional): Resultats deje calcules par histogram_stats avec les memes
+            seuils, pour ne pas relire les donnees. Par defaut : None.
 
     Returns:
         None
 
     Raises:
         ValueError: Si df n'est pas un DataFrame pandas.
-                    Si outputfile n'est pas une chaîne de caracteres.
+                    Si outputfile n'est pas une chaîne de caracteres ou une liste de chaînes.
                     Si exclure n'est pas un nombre.
     """
     if not isinstance(df, pd.DataFrame):
         raise ValueError("df doit être un DataFrame pandas.")
-    #if not isinstance(outputfile, str):
-    if outputfile is not None and not isinstance(outputfile, str):
-        raise ValueError("outputfile doit être une chaîne de caractères.")
+    outputs = output_paths(outputfile, "outputfile")
     if not isinstance(exclure, (int, float)):
         raise ValueError("exclure doit être un nombre.")
 
-
-    if not show:
-        matplotlib.use('Agg')
+    # la colonne "action" ajoutee par add_notes n'est pas tracee
+    df = df.select_dtypes("number")
 
     num_cols = len(df.columns)
     fig, axs = plt.subplots(num_cols, figsize=(10, 6 * num_cols))
 
+    # histogrammes et moments de toutes les colonnes en une passe (masque exclure/excluresup commun)
+    if stats is None:
+        stats = histogram_stats(df.to_numpy(), exclure, excluresup, bins=BINS, density=DENSITY)
+
     # Pour chaque colonne du DataFrame
     for i, column_name in enumerate(df.columns):
-        data = df[column_name]
-        data = data[data > exclure]  # Exclure les valeurs inférieures
-        data = data[data < excluresup]  # Exclure les valeurs inférieures
+        mu, std = stats[i]["moyenne"], stats[i]["ecart_type"]
+        bords = stats[i]["bords"]
 
         # Créer l'histogramme avec des espaces entre les barres (c.f. Note density)
+        # les barres deje calculees sont tracees telles quelles (une valeur ponderee par barre)
         axs[i].hist(
             #data, bins=30, rwidth=0.9, density=True, alpha=0.3, label=column_name
             ################### densité à la place du nombre d'occurences pour pouvoir comparer différentes mesures
             ###################
-            data, bins=BINS, rwidth=0.9, density=DENSITY, alpha=0.3, label=column_name
+            bords[:-1], bins=bords, weights=stats[i]["hauteurs"], rwidth=0.9, alpha=0.3, label=column_name
         )
 
         # Ajouter une courbe de distribution de noyau (c.f. Note KDE)
-        sns.kdeplot(data, bw_adjust=0.5, ax=axs[i])
-        
+        if KDE_SEABORN:
+            import seaborn as sns
+
+            data = df[column_name]
+            sns.kdeplot(data[(data > exclure) & (data < excluresup)], bw_adjust=0.5, ax=axs[i])
+        elif stats[i]["n"] > 0:
+            x, densite = kde_curve(
+                stats[i]["origine"], stats[i]["pas"], stats[i]["comptes"], bw_adjust=0.5, ecart_type=std
+            )
+            if x is not None:
+                axs[i].plot(x, densite)
+                axs[i].set_ylabel("Density")
+
         # Ajouter une courbe de distribution normale
-        mu, std = data.mean(), data.std()
-        x = np.linspace(data.min(), data.max(), 100)
-        p = norm.pdf(x, mu, std)
+        x = np.linspace(stats[i]["minimum"], stats[i]["maximum"], 100)
+        p = normal_pdf(x, mu, std)
         axs[i].plot(x, p, "k", linestyle="--", label="Distribution Normale")
 
         # Ajouter des droites verticales pour la moyenne et l'écart type
@@ -174,16 +327,83 @@ def create_histograms(df, outputfile=OUTPUTFILE, exclure=EXCLURE, excluresup=EXC
 
 
 
-    #if outputfile:
-    #if verbose:
-    #    print(f"Export du graphique dans {outputfile}.")
-    plt.savefig(outputfile)
-    #plt.close()  # Ferme la figure pour liberer de la memoire
-    #else:
+    save_figure(fig, outputs, True, verbose)
+
+    ### affiche aussi la courbe d'effort laissee ouverte par create_plot, puis libere les figures
+    if show:
+        plt.show()
+        plt.close("all")
+    else:
+        plt.close(fig)
+
+
+def create_comparison(groupes, colonne="Total", outputfile=None, bins=BINS, density=DENSITY, verbose=False, show=True):
+    """
+    Superpose les histogrammes d'effort de plusieurs sessions ou groupes de sessions e
+    partir de leurs resumes (voir distribution.summary_from_stats), sans relire les
+    donnees brutes. Toutes les courbes partagent les memes barres.
+
+    Args:
+        groupes (list of tuple): Les couples (libelle, resume) e comparer.
+        colonne (str, optional): La colonne comparee ("1", "2" ou "Total"). Par defaut : "Total".
+        outputfile (str ou list of str, optional): Le ou les fichiers ou sauvegarder le graphique. Par defaut : None.
+        bins (int, optional): Nombre de barres. Par defaut : BINS.
+        density (bool, optional): Si vrai, trace des densites (comparables entre sessions de durees differentes),
+            sinon des effectifs. Par defaut : DENSITY.
+        verbose (bool, optional): Si vrai, affiche les fichiers crees. Par defaut : False.
+        show (bool, optional): Si vrai, affiche la figure avec plt.show(). Par defaut : True.
 
-    ### mis en commentaire pour pas afficher 2 fois le graphique à l'écran
+    Returns:
+        None
+
+    Raises:
+        ValueError: Si aucun groupe ne contient de valeur pour la colonne demandee.
+    """
+    outputs = output_paths(outputfile, "outputfile")
+    resumes = [
+        (libelle, resume["colonnes"][colonne])
+        for libelle, resume in groupes
+        if colonne in resume["colonnes"] and resume["colonnes"][colonne]["n"] > 0
+    ]
+    if not resumes:
+        raise ValueError(f"Aucune valeur pour la colonne {colonne}.")
+
+    # barres communes e tous les groupes
+    minimum = min(resume["minimum"] for _, resume in resumes)
+    maximum = max(resume["maximum"] for _, resume in resumes)
+    if minimum == maximum:
+        minimum, maximum = minimum - 0.5, maximum + 0.5
+    bords = np.linspace(minimum, maximum, bins + 1)
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for libelle, resume in resumes:
+        n = resume["n"]
+        comptes = resume["comptes"]
+        positions = resume["origine"] + np.arange(len(comptes))
+        effectifs, _ = np.histogram(positions, bins=bords, weights=comptes)
+        hauteurs = effectifs / (n * np.diff(bords)) if density else effectifs
+        mu, std = summary_moments(resume)
+        barres = ax.hist(
+            bords[:-1], bins=bords, weights=hauteurs, histtype="step", linewidth=1.5,
+            label=f"{libelle} : {n} mesures, moyenne {mu:.0f} kgf, ec-typ {std:.0f} kgf",
+        )
+        couleur = barres[2][0].get_edgecolor()
+        ax.axvline(mu, color=couleur, linestyle="dotted", alpha=0.7, linewidth=2)
+        x, densite = kde_curve(resume["origine"], 1.0, comptes, bw_adjust=0.5, ecart_type=std)
+        if x is not None:
+            ax.plot(x, densite if density else densite * n * np.diff(bords)[0], color=couleur, alpha=0.7)
+
+    ax.set_title(f"DATAFFICHEUR - Comparaison des fréquences d'apparition des valeurs d'effort pour capt : {colonne}")
+    ax.legend()
+    ax.xaxis.set_major_locator(plt.MaxNLocator(HISTO_SUBDIVISIONS_X))
+    ax.set_xlabel("kgf (kilogramme force - comparable au daN)")
+    ax.set_ylabel("Density" if density else "Nombre de mesures")
+    plt.tight_layout()
+
+    save_figure(fig, outputs, show, verbose)
     if show:
         plt.show()
+        plt.close(fig)
 
 
 # Note density :
@@ -216,3 +436,7 @@ def create_histograms(df, outputfile=OUTPUTFILE, exclure=EXCLURE, excluresup=EXC
 #   Au lieu de "biner" les données, elle utilise une "fonction de noyau" (d'où le nom "Kernel Density Estimation") 
 #   pour créer une courbe lisse qui s'adapte aux données. Cette courbe peut alors être utilisée 
 #   pour estimer la densité de probabilité à n'importe quel point.
+#
+#   La courbe est calculee par distribution.kde_curve (comptes par kgf de histogram_stats convolues par FFT) avec
+#   les memes reglages que seaborn.kdeplot(data, bw_adjust=0.5), qui reste utilisable avec
+#   KDE_SEABORN = True dans constants.py.
@@ -0,0 +1,457 @@
+import glob
+import os
+import shutil
+import tempfile
+import zipfile
+import numpy as np
+import pandas as pd
+from cache import session_dir
+from constants import CACHE_DIR, OUTPUT, OUTPUTPYRAMIDE, PYRAMIDE_NIVEAUX
+from store import load_range, time_bounds
+from utils import find_files, is_archive
+
+# statistiques de chaque intervalle, dans l'ordre des colonnes de query_pyramid
+PYRAMIDE_STATS = ["minimum", "maximum", "moyenne"]
+# tableaux de chaque niveau, une ligne par intervalle
+PYRAMIDE_CLES = ("debut", "minimum", "maximum", "somme", "nombre")
+
+
+def raw_level(df):
+    """
+    Niveau de depart de la pyramide : chaque echantillon est un intervalle de duree nulle.
+
+    Args:
+        df (pandas.DataFrame): Le DataFrame prepare (prepare_data), la colonne "action" est ignoree.
+
+    Returns:
+        dict: Le niveau (debut, minimum, maximum, somme, nombre), voir reduce_level.
+    """
+    efforts = df.select_dtypes("number")
+    valeurs = efforts.to_numpy()
+    presents = ~np.isnan(valeurs) if valeurs.dtype.kind == "f" else np.ones(valeurs.shape, dtype=bool)
+    return {
+        "pas": 0,
+        "debut": efforts.index.to_numpy(dtype="datetime64[ns]").view("int64"),
+        "minimum": valeurs,
+        "maximum": valeurs,
+        "somme": np.where(presents, valeurs, 0).astype(np.float64),
+        "nombre": presents.astype(np.int64),
+    }
+
+
+def reduce_level(niveau, pas):
+    """
+    Regroupe un niveau de la pyramide en intervalles de pas secondes alignes sur l'origine
+    des temps : minimum des minimums, maximum des maximums, sommes des sommes et des
+    nombres d'echantillons (les NaN sont ignores). Les intervalles sans echantillon ne
+    sont pas stockes.
+
+    Args:
+        niveau (dict): Le niveau e regrouper, cles "debut" (debut des intervalles en nanosecondes),
+            "minimum", "maximum", "somme" et "nombre" (une ligne par intervalle, une colonne par capteur).
+        pas (int): La duree des nouveaux intervalles en secondes, multiple de celle de niveau.
+
+    Returns:
+        dict: Le nouveau niveau, memes cles et cle "pas".
+    """
+    pas_ns = int(pas) * 1_000_000_000
+    debut = niveau["debut"]
+    if len(debut) > 1 and not (debut[1:] >= debut[:-1]).all():
+        # niveaux de deux pyramides concatenes (merge_pyramids)
+        ordre = np.argsort(debut, kind="stable")
+        niveau = {cle: niveau[cle][ordre] for cle in PYRAMIDE_CLES}
+        debut = niveau["debut"]
+    cles = debut // pas_ns
+    if len(cles) == 0:
+        return {"pas": pas, **{cle: niveau[cle][:0] for cle in PYRAMIDE_CLES}}
+    positions = np.flatnonzero(np.concatenate(([True], cles[1:] != cles[:-1])))
+    return {
+        "pas": pas,
+        "debut": cles[positions] * pas_ns,
+        "minimum": np.fmin.reduceat(niveau["minimum"], positions, axis=0),
+        "maximum": np.fmax.reduceat(niveau["maximum"], positions, axis=0),
+        "somme": np.add.reduceat(niveau["somme"], positions, axis=0),
+        "nombre": np.add.reduceat(niveau["nombre"], positions, axis=0),
+    }
+
+
+def build_pyramid(df, niveaux=PYRAMIDE_NIVEAUX):
+    """
+    Construit la pyramide des efforts d'une session : pour chaque duree de niveaux, le
+    minimum, le maximum et la moyenne de chaque colonne par intervalle. Chaque niveau est
+    calcule e partir du precedent, en un passage sur les donnees.
+
+    Args:
+        df (pandas.DataFrame): Le DataFrame prepare (prepare_data), trie par date.
+        niveaux (list of int, optional): Les durees des intervalles en secondes, croissantes et
+            chacune multiple de la precedente. Par defaut : PYRAMIDE_NIVEAUX.
+
+    Returns:
+        dict: La pyramide, cles "noms" (noms des colonnes) et "niveaux" (liste des niveaux,
+        du plus fin au plus grossier, voir reduce_level).
+
+    Raises:
+        ValueError: Si niveaux est vide ou si une duree n'est pas multiple de la precedente.
+    """
+    if len(niveaux) == 0:
+        raise ValueError("niveaux ne peut pas etre vide.")
+    for fin, grossier in zip(niveaux[:-1], niveaux[1:]):
+        if grossier <= fin or grossier % fin:
+            raise ValueError("Chaque duree de niveaux doit etre un multiple de la precedente.")
+
+    efforts = df.select_dtypes("number")
+    noms = [str(col[0]) if isinstance(col, tuple) else str(col) for col in efforts.columns]
+    niveau = raw_level(efforts)
+    pyramide = []
+    for pas in niveaux:
+        niveau = reduce_level(niveau, pas)
+        pyramide.append(niveau)
+    return {"noms": noms, "niveaux": pyramide}
+
+
+def merge_pyramids(pyramide, autre):
+    """
+    Fusionne deux pyramides (par exemple deux blocs consecutifs du mode flux) : le resultat
+    est celui qu'aurait donne build_pyramid sur l'ensemble des donnees, les intervalles
+    partages par les deux pyramides etant regroupes.
+
+    Args:
+        pyramide (dict): La premiere pyramide, ou None.
+        autre (dict): La pyramide e ajouter.
+
+    Returns:
+        dict: La pyramide fusionnee (nouvel objet, les arguments ne sont pas modifies).
+
+    Raises:
+        ValueError: Si les deux pyramides n'ont pas les memes colonnes et les memes niveaux.
+    """
+    if pyramide is None:
+        return autre
+    if pyramide["noms"] != autre["noms"] or [n["pas"] for n in pyramide["niveaux"]] != [n["pas"] for n in autre["niveaux"]]:
+        raise ValueError("Les pyramides doivent avoir les memes colonnes et les memes niveaux.")
+    niveaux = []
+    for a, b in zip(pyramide["niveaux"], autre["niveaux"]):
+        concatene = {
+            cle: np.concatenate((a[cle], b[cle])) for cle in PYRAMIDE_CLES
+        }
+        niveaux.append(reduce_level(concatene, a["pas"]))
+    return {"noms": pyramide["noms"], "niveaux": niveaux}
+
+
+def append_pyramid(etat, autre, dossier=None):
+    """
+    Ajoute e la pyramide d'une session celle du bloc suivant (mode flux), sans relire les
+    blocs precedents : dans chaque niveau, seul l'intervalle e cheval sur les deux blocs est
+    regroupe. Les intervalles termines sont ajoutes e des fichiers temporaires et seul le
+    dernier intervalle de chaque niveau reste en memoire : la memoire utilisee ne depend
+    pas de la duree de la session. Le resultat de save_appended_pyramid est celui de
+    build_pyramid sur l'ensemble des blocs.
+
+    Args:
+        etat (dict): L'etat retourne par l'appel precedent, ou None pour le premier bloc.
+        autre (dict): La pyramide du bloc (build_pyramid), posterieure aux blocs deje ajoutes.
+        dossier (str, optional): Le dossier des fichiers temporaires (premier bloc). Par defaut : dossier temporaire du systeme.
+
+    Returns:
+        dict: Le nouvel etat, e passer e l'appel suivant puis e save_appended_pyramid.
+
+    Raises:
+        ValueError: Si les pyramides n'ont pas les memes colonnes et les memes niveaux, ou si le
+            bloc commence avant la fin des blocs deje ajoutes.
+    """
+    if etat is None:
+        etat = {
+            "dossier": tempfile.mkdtemp(prefix=".pyramide-", dir=dossier),
+            "noms": autre["noms"],
+            "niveaux": [{"pas": niveau["pas"], "dernier": None, "segments": []} for niveau in autre["niveaux"]],
+        }
+    elif etat["noms"] != autre["noms"] or [n["pas"] for n in etat["niveaux"]] != [n["pas"] for n in autre["niveaux"]]:
+        raise ValueError("Les pyramides doivent avoir les memes colonnes et les memes niveaux.")
+
+    for i, (courant, niveau) in enumerate(zip(etat["niveaux"], autre["niveaux"])):
+        if len(niveau["debut"]) == 0:
+            continue
+        niveau = {cle: niveau[cle] for cle in PYRAMIDE_CLES}
+        dernier = courant["dernier"]
+        if dernier is not None:
+            if niveau["debut"][0] < dernier["debut"][0]:
+                raise ValueError("Les blocs doivent etre ajoutes dans l'ordre du temps.")
+            if niveau["debut"][0] == dernier["debut"][0]:
+                # intervalle e cheval : regroupe avec le premier intervalle du bloc
+                niveau = {cle: valeurs.astype(np.result_type(valeurs, dernier[cle])) for cle, valeurs in niveau.items()}
+                niveau["minimum"][0] = np.fmin(dernier["minimum"][0], niveau["minimum"][0])
+                niveau["maximum"][0] = np.fmax(dernier["maximum"][0], niveau["maximum"][0])
+                niveau["somme"][0] += dernier["somme"][0]
+                niveau["nombre"][0] += dernier["nombre"][0]
+            else:
+                spool_level(etat["dossier"], i, courant, dernier)
+        spool_level(etat["dossier"], i, courant, {cle: valeurs[:-1] for cle, valeurs in niveau.items()})
+        courant["dernier"] = {cle: valeurs[-1:].copy() for cle, valeurs in niveau.items()}
+    return etat
+
+
+def spool_level(dossier, i, courant, lignes):
+    # ajoute des intervalles termines du niveau i e ses fichiers temporaires (un par cle)
+    if len(lignes["debut"]) == 0:
+        return
+    for cle in PYRAMIDE_CLES:
+        with open(os.path.join(dossier, f"{cle}_{i}"), "ab") as f:
+            np.ascontiguousarray(lignes[cle]).tofile(f)
+    # le type des minimums et maximums peut varier d'un bloc e l'autre (prepare_data)
+    courant["segments"].append((len(lignes["debut"]), {cle: lignes[cle].dtype for cle in PYRAMIDE_CLES}, lignes["minimum"].shape[1:]))
+
+
+def save_appended_pyramid(etat, chemin, lignes_par_lecture=65536):
+    """
+    Enregistre la pyramide construite par append_pyramid (meme format que save_pyramid)
+    en recopiant les fichiers temporaires par morceaux, puis les supprime.
+
+    Args:
+        etat (dict): L'etat retourne par le dernier appel de append_pyramid.
+        chemin (str): Le chemin du fichier .npz e creer.
+        lignes_par_lecture (int, optional): Nombre d'intervalles recopies e la fois. Par defaut : 65536.
+
+    Returns:
+        None
+    """
+    try:
+        for i, courant in enumerate(etat["niveaux"]):
+            if courant["dernier"] is not None:
+                spool_level(etat["dossier"], i, courant, courant["dernier"])
+                courant["dernier"] = None
+        # meme contenu que np.savez (membres .npy non compresses)
+        with zipfile.ZipFile(chemin, "w", zipfile.ZIP_STORED, allowZip64=True) as npz:
+            for nom, tableau in (
+                ("noms", np.array(etat["noms"], dtype=str)),
+                ("niveaux", np.array([courant["pas"] for courant in etat["niveaux"]], dtype=np.int64)),
+            ):
+                with npz.open(nom + ".npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array(f, tableau, allow_pickle=False)
+            for i, courant in enumerate(etat["niveaux"]):
+                segments = courant["segments"]
+                nb_lignes = sum(n for n, _, _ in segments)
+                nb_colonnes = segments[0][2] if segments else (len(etat["noms"]),)
+                for cle in PYRAMIDE_CLES:
+                    forme = (nb_lignes,) if cle == "debut" else (nb_lignes, *nb_colonnes)
+                    types = [dtypes[cle] for _, dtypes, _ in segments]
+                    dtype = np.result_type(*types) if types else np.dtype(np.int64 if cle in ("debut", "nombre") else np.float64)
+                    with npz.open(f"{cle}_{i}.npy", "w", force_zip64=True) as f, open(
+                        os.path.join(etat["dossier"], f"{cle}_{i}"), "ab+"
+                    ) as source:
+                        source.seek(0)
+                        np.lib.format.write_array_header_2_0(
+                            f, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": forme}
+                        )
+                        for n, dtypes, colonnes in segments:
+                            taille_ligne = dtypes[cle].itemsize * (1 if cle == "debut" else int(np.prod(colonnes)))
+                            for debut in range(0, n, lignes_par_lecture):
+                                nb = min(lignes_par_lecture, n - debut)
+                                morceau = np.frombuffer(source.read(nb * taille_ligne), dtype=dtypes[cle])
+                                f.write(morceau.astype(dtype, copy=False).tobytes())
+    finally:
+        discard_appended_pyramid(etat)
+
+
+def discard_appended_pyramid(etat):
+    """
+    Supprime les fichiers temporaires de append_pyramid (traitement interrompu).
+
+    Args:
+        etat (dict): L'etat retourne par append_pyramid, ou None.
+    """
+    if etat is not None:
+        shutil.rmtree(etat["dossier"], ignore_errors=True)
+
+
+def save_pyramid(pyramide, chemin):
+    """
+    Enregistre une pyramide au format npz (sans objet Python, relisible par load_pyramid).
+
+    Args:
+        pyramide (dict): La pyramide (voir build_pyramid).
+        chemin (str): Le chemin du fichier .npz e creer.
+
+    Returns:
+        None
+    """
+    tableaux = {
+        "noms": np.array(pyramide["noms"], dtype=str),
+        "niveaux": np.array([niveau["pas"] for niveau in pyramide["niveaux"]], dtype=np.int64),
+    }
+    for i, niveau in enumerate(pyramide["niveaux"]):
+        for cle in PYRAMIDE_CLES:
+            tableaux[f"{cle}_{i}"] = niveau[cle]
+    with open(chemin, "wb") as f:
+        np.savez(f, **tableaux)
+
+
+def load_pyramid(chemin):
+    """
+    Relit une pyramide enregistree par save_pyramid.
+
+    Args:
+        chemin (str): Le chemin du fichier .npz.
+
+    Returns:
+        dict: La pyramide (voir build_pyramid).
+    """
+    with np.load(chemin, allow_pickle=False) as npz:
+        niveaux = [
+            {"pas": int(pas), **{cle: npz[f"{cle}_{i}"] for cle in PYRAMIDE_CLES}}
+            for i, pas in enumerate(npz["niveaux"].tolist())
+        ]
+        noms = npz["noms"].tolist()
+    return {"noms": noms, "niveaux": niveaux}
+
+
+def level_frame(niveau, noms, debut=0, fin=None):
+    """
+    Met les lignes debut:fin d'un niveau sous forme de DataFrame.
+
+    Args:
+        niveau (dict): Le niveau (voir reduce_level).
+        noms (list of str): Les noms des colonnes.
+        debut (int, optional): La premiere ligne. Par defaut : 0.
+        fin (int, optional): La ligne suivant la derniere, None pour la fin du niveau. Par defaut : None.
+
+    Returns:
+        pandas.DataFrame: Indexe par le debut des intervalles, colonnes (nom, "minimum"),
+        (nom, "maximum") et (nom, "moyenne") pour chaque colonne.
+    """
+    tranche = slice(debut, fin)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        moyenne = niveau["somme"][tranche] / niveau["nombre"][tranche]
+    blocs = (niveau["minimum"][tranche], niveau["maximum"][tranche], moyenne)
+    return pd.DataFrame(
+        {(nom, stat): bloc[:, i] for i, nom in enumerate(noms) for stat, bloc in zip(PYRAMIDE_STATS, blocs)},
+        index=pd.DatetimeIndex(niveau["debut"][tranche].view("datetime64[ns]"), name="date"),
+    )
+
+
+def query_pyramid(pyramide, start=None, end=None, nb_pixels=1920):
+    """
+    Choisit le niveau de la pyramide adapte e une fenetre de temps et e une largeur en
+    pixels, puis retourne ses intervalles dans la fenetre : le niveau le plus grossier
+    qui a encore au moins nb_pixels intervalles sur la fenetre. Le nombre de lignes
+    retournees est donc de l'ordre de nb_pixels quelle que soit la duree de la fenetre.
+
+    Args:
+        pyramide (dict): La pyramide (voir build_pyramid).
+        start (str ou pandas.Timestamp, optional): Le debut de la fenetre, None pour le debut de la session. Par defaut : None.
+        end (str ou pandas.Timestamp, optional): La fin de la fenetre (incluse), None pour la fin de la session. Par defaut : None.
+        nb_pixels (int, optional): La largeur du graphique en pixels. Par defaut : 1920.
+
+    Returns:
+        tuple: Un tuple (pas, vue) ou pas est la duree des intervalles en secondes et vue le
+        DataFrame des intervalles qui recouvrent la fenetre (voir level_frame). Si la fenetre
+        est trop courte pour le niveau le plus fin, pas et vue valent None : les echantillons
+        eux-memes sont necessaires (store.load_range).
+
+    Raises:
+        ValueError: Si nb_pixels n'est pas positif.
+    """
+    if nb_pixels <= 0:
+        raise ValueError("nb_pixels doit etre un entier positif.")
+    debut, fin = time_bounds(start, end)
+
+    # fenetre restreinte aux donnees de la session
+    plus_fin = pyramide["niveaux"][0]
+    if len(plus_fin["debut"]):
+        debut = max(debut, int(plus_fin["debut"][0]))
+        fin = min(fin, int(plus_fin["debut"][-1]) + plus_fin["pas"] * 1_000_000_000 - 1)
+    duree = max(fin - debut + 1, 0)
+
+    for niveau in reversed(pyramide["niveaux"]):
+        pas_ns = niveau["pas"] * 1_000_000_000
+        if duree >= nb_pixels * pas_ns:
+            # intervalles [d, d + pas[ qui recouvrent [debut, fin]
+            premiere = np.searchsorted(niveau["debut"], debut - pas_ns, side="right")
+            derniere = np.searchsorted(niveau["debut"], fin, side="right")
+            return niveau["pas"], level_frame(niveau, pyramide["noms"], premiere, derniere)
+    return None, None
+
+
+def pyramid_path(dir, date_str, output=OUTPUT, cache=None):
+    """
+    Chemin du fichier de la pyramide d'une session : e cote du CSV (voir datafficheur.main),
+    ou dans le dossier du cache (voir cache.session_dir) si cache est donne.
+
+    Args:
+        dir (str): Le dossier ou l'archive ZIP de la session.
+        date_str (str): La date des mesures (voir date_range_str).
+        output (str, optional): Le nom du fichier CSV de la session. Par defaut : OUTPUT.
+        cache (str, optional): Le dossier du cache, ou None. Par defaut : None.
+
+    Returns:
+        str: Le chemin du fichier .npz.
+    """
+    dossier_sortie, prefixe = dir, ""
+    if cache is not None:
+        dossier_sortie = session_dir(cache, dir)
+    elif is_archive(dir):
+        dossier_sortie = os.path.dirname(os.path.abspath(dir))
+        prefixe = os.path.splitext(os.path.basename(dir))[0] + "_"
+    return os.path.join(
+        dossier_sortie, prefixe + date_str + "_" + OUTPUTPYRAMIDE + "_" + os.path.splitext(output)[0] + ".npz"
+    )
+
+
+def load_view(dir, start=None, end=None, nb_pixels=1920, output=OUTPUT, cache=True, verbose=False):
+    """
+    Donnees d'un graphique de la fenetre [start, end] d'une session, e cout constant :
+    le niveau adapte de la pyramide de la session, ou les echantillons (store.load_range)
+    pour une fenetre de moins de nb_pixels secondes.
+
+    La pyramide creee par datafficheur.py --pyramide e cote de la session est relue si
+    elle est e jour. Sinon la pyramide est (re)construite depuis toute la session et
+    enregistree dans le dossier du cache (jamais dans le dossier des donnees), ou
+    seulement gardee en memoire sans cache.
+
+    Args:
+        dir (str): Le dossier ou l'archive ZIP de la session.
+        start (str ou pandas.Timestamp, optional): Le debut de la fenetre. Par defaut : None.
+        end (str ou pandas.Timestamp, optional): La fin de la fenetre (incluse). Par defaut : None.
+        nb_pixels (int, optional): La largeur du graphique en pixels. Par defaut : 1920.
+        output (str, optional): Le nom du fichier CSV de la session. Par defaut : OUTPUT.
+        cache (bool, optional): Indique si le cache (fichiers deja analyses, index et pyramide) doit etre utilise. Par defaut : True.
+        verbose (bool, optional): Si vrai, affiche des messages supplementaires. Par defaut : False.
+
+    Returns:
+        tuple: Un tuple (pas, vue) comme query_pyramid. Pour les echantillons, pas vaut None
+        et le minimum, le maximum et la moyenne de chaque ligne sont l'echantillon.
+
+    Raises:
+        ValueError: Si la session ne contient aucun echantillon lisible.
+    """
+    dossier_cache = CACHE_DIR if cache else None
+    chemins = glob.glob(pyramid_path(dir, "*", output))
+    if dossier_cache:
+        chemins += glob.glob(pyramid_path(dir, "*", output, dossier_cache))
+    chemin = max(chemins, key=os.path.getmtime) if chemins else None
+    if chemin is not None:
+        sources = [dir] if is_archive(dir) else find_files(dir)
+        if any(os.path.getmtime(source) > os.path.getmtime(chemin) for source in sources):
+            chemin = None
+
+    if chemin is None:
+        df = load_range(dir, cache=cache, verbose=verbose)
+        if df.empty:
+            raise ValueError(f"Aucun echantillon lisible dans {dir}")
+        from data_processing import date_range_str
+
+        pyramide = build_pyramid(df)
+        if dossier_cache:
+            chemin = pyramid_path(dir, date_range_str(df.index), output, dossier_cache)
+            if verbose:
+                print(f"Creation de la pyramide {chemin}")
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            save_pyramid(pyramide, chemin)
+        del df
+    else:
+        pyramide = load_pyramid(chemin)
+
+    pas, vue = query_pyramid(pyramide, start, end, nb_pixels)
+    if pas is None:
+        df = load_range(dir, start, end, cache=cache, verbose=verbose)
+        vue = level_frame(raw_level(df), pyramide["noms"])
+    return pas, vue
@@ -0,0 +1,292 @@
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+from cache import session_dir
+from constants import CACHE_DIR, CACHE_TAILLE_MAX, STORE_INDEX, STREAM_TAILLE_BLOC
+from data_processing import load_datafficheur_files, merge_datafficheur_frames, read_notes, add_notes, prepare_data
+from stream import index_files, session_columns
+from utils import find_files, find_archive_members, find_archive_note, is_archive
+
+# colonnes du fichier d'index, une ligne par fichier de donnees
+INDEX_COLONNES = ["fichier", "signature", "debut", "fin", "capteurs", "lacunes"]
+
+
+def index_path(dir, cache=CACHE_DIR):
+    """
+    Chemin du fichier d'index d'une session, dans le dossier du cache (voir
+    cache.session_dir) et non dans le dossier des donnees.
+
+    Args:
+        dir (str): Le dossier ou l'archive ZIP de la session.
+        cache (str, optional): Le dossier du cache. Par defaut : CACHE_DIR.
+
+    Returns:
+        str: Le chemin du fichier d'index.
+    """
+    return os.path.join(session_dir(cache, dir), STORE_INDEX)
+
+
+def file_signature(fichier, archive=None):
+    """
+    Signature d'un fichier de donnees, qui change des que le fichier est modifie : taille
+    et date de modification sur disque, taille et CRC pour un membre d'archive (lus
+    dans le repertoire de l'archive, sans decompression).
+
+    Args:
+        fichier (str): Chemin du fichier, ou nom du membre si archive est donnee.
+        archive (zipfile.ZipFile, optional): L'archive contenant le fichier. Par defaut : None.
+
+    Returns:
+        str: La signature.
+
+    Raises:
+        FileNotFoundError: Si le fichier n'existe pas.
+    """
+    if archive is None:
+        stat = os.stat(fichier)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+    info = archive.getinfo(fichier)
+    return f"{info.file_size}-{info.CRC:08x}"
+
+
+def read_index(chemin):
+    """
+    Lit le fichier d'index d'une session.
+
+    Args:
+        chemin (str): Le chemin du fichier d'index.
+
+    Returns:
+        dict: Pour chaque nom de fichier, le tuple (signature, debut, fin, colonnes, lacunes).
+        Vide si l'index est absent ou illisible.
+    """
+    try:
+        index = pd.read_csv(chemin, dtype={"fichier": str, "signature": str, "capteurs": str})
+    except (OSError, ValueError):
+        return {}
+    if list(index.columns) != INDEX_COLONNES:
+        return {}
+    return {
+        fichier: (signature, int(debut), int(fin), tuple(int(c) for c in capteurs.split()), bool(lacunes))
+        for fichier, signature, debut, fin, capteurs, lacunes in index.itertuples(index=False)
+    }
+
+
+def write_index(chemin, entrees):
+    """
+    Enregistre le fichier d'index d'une session (CSV, une ligne par fichier).
+
+    Args:
+        chemin (str): Le chemin du fichier d'index.
+        entrees (list of tuple): Les tuples (fichier, signature, debut, fin, colonnes, lacunes).
+
+    Returns:
+        None
+    """
+    index = pd.DataFrame(
+        [
+            (fichier, signature, debut, fin, " ".join(str(c) for c in colonnes), int(lacunes))
+            for fichier, signature, debut, fin, colonnes, lacunes in entrees
+        ],
+        columns=INDEX_COLONNES,
+    )
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    index.to_csv(temporaire, index=False)
+    # remplacement atomique pour ne jamais laisser un index tronque
+    os.replace(temporaire, chemin)
+
+
+def update_index(dir, archive=None, jobs=1, cache=None, cache_taille_max=None, verbose=False):
+    """
+    Met e jour l'index des fichiers d'une session : seuls les fichiers nouveaux ou
+    modifies depuis le dernier passage sont lus (voir stream.index_files), puis
+    l'index est enregistre s'il a change. L'index est conserve dans le dossier du cache
+    (voir index_path) : sans cache, il est recalcule e chaque appel.
+
+    Args:
+        dir (str): Le dossier ou l'archive ZIP de la session.
+        archive (zipfile.ZipFile, optional): L'archive deje ouverte si dir en est une. Par defaut : None.
+        jobs (int, optional): Nombre de processus de lecture. Par defaut : 1.
+        cache (str, optional): Le dossier du cache et de l'index, ou None. Par defaut : None.
+        cache_taille_max (int, optional): Taille maximale du cache en octets. Par defaut : None.
+        verbose (bool, optional): Si vrai, affiche des messages supplementaires. Par defaut : False.
+
+    Returns:
+        list: L'index au format de stream.index_files : un tuple (fichier, debut, fin, colonnes,
+        lacunes) par fichier lisible et non vide, dans l'ordre de find_files.
+    """
+    fichiers = find_archive_members(archive) if archive else find_files(dir)
+    chemin = index_path(dir, cache) if cache else None
+    existant = read_index(chemin) if chemin else {}
+
+    signatures = {}
+    a_indexer = []
+    for fichier in fichiers:
+        nom = fichier if archive else os.path.basename(fichier)
+        try:
+            signatures[fichier] = file_signature(fichier, archive)
+        except (FileNotFoundError, KeyError):
+            continue
+        entree = existant.get(nom)
+        if entree is None or entree[0] != signatures[fichier]:
+            a_indexer.append(fichier)
+
+    nouveaux = {}
+    if a_indexer:
+        if verbose:
+            print(f"Indexation de {len(a_indexer)} fichier(s)")
+        for fichier, debut, fin, colonnes, lacunes in index_files(
+            a_indexer, STREAM_TAILLE_BLOC, jobs, archive, cache, cache_taille_max, verbose
+        ):
+            nouveaux[fichier] = (debut, fin, colonnes, lacunes)
+
+    entrees = []
+    infos = []
+    for fichier in fichiers:
+        if fichier not in signatures:
+            continue
+        nom = fichier if archive else os.path.basename(fichier)
+        if fichier in nouveaux:
+            debut, fin, colonnes, lacunes = nouveaux[fichier]
+        elif fichier not in a_indexer:
+            _, debut, fin, colonnes, lacunes = existant[nom]
+        else:
+            # fichier illisible ou vide : relu au prochain passage
+            continue
+        entrees.append((nom, signatures[fichier], debut, fin, colonnes, lacunes))
+        infos.append((fichier, debut, fin, colonnes, lacunes))
+
+    if chemin and (a_indexer or len(entrees) != len(existant)):
+        try:
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            write_index(chemin, entrees)
+        except OSError as e:
+            print(f"Impossible d'ecrire l'index {chemin} : {e}")
+    return infos
+
+
+def time_bounds(start=None, end=None):
+    """
+    Bornes en nanosecondes d'une plage de temps, avec la meme resolution que df.loc[start:end] :
+    "2023-05-23 08:45" couvre toute la minute, "2023-05-23" toute la journee.
+
+    Args:
+        start (str ou pandas.Timestamp, optional): Le debut de la plage, None pour aucune limite. Par defaut : None.
+        end (str ou pandas.Timestamp, optional): La fin de la plage (incluse), None pour aucune limite. Par defaut : None.
+
+    Returns:
+        tuple: Un tuple (debut, fin) d'entiers en nanosecondes.
+    """
+    debut, fin = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+    if start is not None:
+        debut = (pd.Period(start).start_time if isinstance(start, str) else pd.Timestamp(start)).value
+    if end is not None:
+        fin = (pd.Period(end).end_time if isinstance(end, str) else pd.Timestamp(end)).value
+    return debut, fin
+
+
+def load_range(dir, start=None, end=None, action=None, note="note.csv", jobs=1, cache=True, verbose=False):
+    """
+    Charge une plage de temps d'une session sans lire toute la session : l'index des
+    fichiers (premier et dernier instant de chaque MMDDhhmm.TXT, voir update_index)
+    designe les seuls fichiers qui recouvrent la plage.
+
+    Le resultat est identique aux lignes correspondantes du traitement de la session
+    complete : memes colonnes et type (prepare_data), memes doublons ignores et meme
+    colonne "action" si la session a un fichier de notes.
+
+    Args:
+        dir (str): Le dossier ou l'archive ZIP de la session.
+        start (str ou pandas.Timestamp, optional): Le debut de la plage, None pour le debut de la session. Par defaut : None.
+        end (str ou pandas.Timestamp, optional): La fin de la plage (incluse), None pour la fin de la session. Par defaut : None.
+        action (str, optional): Ne garde que les echantillons notes avec cette action dans le fichier des notes. Par defaut : None.
+        note (str, optional): Le nom du fichier contenant les notes. Par defaut : "note.csv".
+        jobs (int, optional): Nombre de processus de lecture. Par defaut : 1.
+        cache (bool, optional): Indique si le cache des fichiers deja analyses et de l'index doit etre utilise. Par defaut : True.
+        verbose (bool, optional): Si vrai, affiche des messages supplementaires. Par defaut : False.
+
+    Returns:
+        pandas.DataFrame: Les echantillons de la plage, colonnes (capteur, "Efforts"), ("Total", "Efforts")
+        puis ("action", "") si la session a un fichier de notes.
+
+    Raises:
+        ValueError: Si la session ne contient aucun fichier lisible, si action est donnee
+                    sans fichier de notes ou si elle n'apparait pas dans les notes.
+    """
+    archive = zipfile.ZipFile(dir) if is_archive(dir) else None
+    try:
+        infos = update_index(
+            dir, archive, jobs, CACHE_DIR if cache else None, CACHE_TAILLE_MAX, verbose
+        )
+        if not infos:
+            raise ValueError(f"Aucun fichier de donnees lisible dans {dir}")
+
+        contenu_note = None
+        if archive:
+            membre_note = find_archive_note(archive, note)
+            hasNote = membre_note is not None
+            if hasNote:
+                contenu_note = archive.read(membre_note)
+        else:
+            hasNote = os.path.exists(os.path.join(dir, note))
+
+        # plages recherchees : la fenetre demandee, restreinte aux intervalles de l'action
+        debut, fin = time_bounds(start, end)
+        plages = [(debut, fin)]
+        if action is not None:
+            if not hasNote:
+                raise ValueError(f"Pas de fichier de notes {note} dans {dir}")
+            notes = read_notes(dir, note, contenu_note)
+            notes = notes[notes["action"] == action]
+            if notes.empty:
+                raise ValueError(f"L'action {action} n'apparait pas dans le fichier des notes.")
+            plages = []
+            for start_note, end_note in zip(notes["start"], notes["end"]):
+                debut_note, fin_note = time_bounds(start_note, end_note)
+                if max(debut, debut_note) <= min(fin, fin_note):
+                    plages.append((max(debut, debut_note), min(fin, fin_note)))
+
+        # un doublon de la plage appartient e un fichier qui la recouvre : la fusion des
+        # seuls fichiers selectionnes garde le meme echantillon que celle de la session
+        selection = [
+            fichier for fichier, debut_fichier, fin_fichier, _, _ in infos
+            if any(debut_fichier <= fin_plage and fin_fichier >= debut_plage for debut_plage, fin_plage in plages)
+        ]
+        if verbose:
+            print(f"{len(selection)} fichier(s) sur {len(infos)} dans la plage demandee")
+        frames = []
+        if selection:
+            frames, erreurs = load_datafficheur_files(
+                selection, jobs, verbose, archive, CACHE_DIR if cache else None, CACHE_TAILLE_MAX
+            )
+            en_erreur = {fichier for fichier, _ in erreurs}
+            selection = [fichier for fichier in selection if fichier not in en_erreur]
+    finally:
+        if archive:
+            archive.close()
+
+    # colonnes et type de la session complete
+    colonnes, lacunes = session_columns(infos)
+    if frames:
+        datas, _ = merge_datafficheur_frames(frames, selection, verbose=verbose)
+        del frames
+    else:
+        datas = pd.DataFrame(
+            np.empty((0, len(colonnes)), dtype=np.int64),
+            index=pd.DatetimeIndex([], dtype="datetime64[ns]"),
+            columns=colonnes,
+        )
+    if not datas.columns.equals(colonnes):
+        datas = datas.reindex(columns=colonnes)
+    if lacunes:
+        datas = datas.astype(np.float64)
+    datas = datas.loc[start:end]
+
+    df = prepare_data(datas)
+    del datas
+    if hasNote:
+        df = add_notes(df, dir, note, verbose, contenu_note)
+        if action is not None:
+            df = df[df[("action", "")] == action]
+    return df
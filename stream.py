@@ -0,0 +1,273 @@
+import os
+import numpy as np
+import pandas as pd
+from constants import EXCLURE, EXCLURESUP, BINS, DENSITY, OUTPUTRESUME, OUTPUTPYRAMIDE, PLOTHTICKS
+from data_processing import load_datafficheur_files, merge_datafficheur_frames, merge_order, add_notes, prepare_data, date_range_str
+from distribution import histogram_stats, summary_from_stats, merge_summaries, save_summary, stats_from_summary
+from export import write_csv
+
+
+def index_files(fichiers, taille_bloc=60, jobs=1, archive=None, cache=None, cache_taille_max=None, verbose=False):
+    """
+    Premier passage du mode flux : lit les fichiers par groupes de taille_bloc et ne garde
+    de chacun que sa plage de temps, ses colonnes et la presence d'echantillons manquants.
+
+    Avec le cache (recommande), le second passage relit les fichiers deje analyses
+    depuis le cache au lieu de les analyser de nouveau.
+
+    Args:
+        fichiers (list of str): Les fichiers (ou membres de l'archive) de la session.
+        taille_bloc (int, optional): Nombre de fichiers en memoire e la fois. Par defaut : 60.
+        jobs (int, optional): Nombre de processus de lecture. Par defaut : 1.
+        archive (zipfile.ZipFile, optional): L'archive contenant les fichiers. Par defaut : None.
+        cache (str, optional): Le dossier du cache, ou None. Par defaut : None.
+        cache_taille_max (int, optional): Taille maximale du cache en octets. Par defaut : None.
+        verbose (bool, optional): Si vrai, affiche des messages supplementaires. Par defaut : False.
+
+    Returns:
+        list: Pour chaque fichier lisible et non vide, dans l'ordre de fichiers, un tuple
+        (fichier, debut, fin, colonnes, lacunes) : premier et dernier instant en nanosecondes
+        (int), tuple des capteurs presents et vrai si des echantillons sont manquants.
+    """
+    infos = []
+    for k in range(0, len(fichiers), taille_bloc):
+        groupe = fichiers[k : k + taille_bloc]
+        frames, erreurs = load_datafficheur_files(groupe, jobs, verbose, archive, cache, cache_taille_max)
+        en_erreur = {fichier for fichier, _ in erreurs}
+        for fichier, datas in zip([f for f in groupe if f not in en_erreur], frames):
+            if datas.empty:
+                continue
+            index = datas.index.to_numpy(dtype="datetime64[ns]").view("int64")
+            infos.append(
+                (fichier, int(index.min()), int(index.max()), tuple(datas.columns), bool(datas.isna().to_numpy().any()))
+            )
+    return infos
+
+
+def session_columns(infos):
+    """
+    Colonnes et type de la fusion en memoire de toute la session, d'apres l'index des
+    fichiers : union des capteurs, et decimal si un fichier a des echantillons manquants
+    ou s'il lui manque un capteur.
+
+    Args:
+        infos (list of tuple): L'index des fichiers retourne par index_files (non vide).
+
+    Returns:
+        tuple: Un tuple (colonnes, lacunes) ou colonnes est le pandas.Index des capteurs
+        et lacunes vrai si les donnees fusionnees contiennent des NaN.
+    """
+    # les fichiers d'une session ont presque tous les memes capteurs
+    distinctes = list(dict.fromkeys(info[3] for info in infos))
+    colonnes = pd.Index(distinctes[0])
+    for colonnes_fichier in distinctes[1:]:
+        colonnes = colonnes.union(pd.Index(colonnes_fichier))
+    lacunes = len(distinctes) > 1 or any(info[4] for info in infos)
+    return colonnes, lacunes
+
+
+def stream_session(
+    fichiers,
+    dir,
+    note,
+    output,
+    dossier_sortie=None,
+    prefixe="",
+    archive=None,
+    hasNote=False,
+    contenu_note=None,
+    taille_bloc=60,
+    jobs=1,
+    cache=None,
+    cache_taille_max=None,
+    plot=True,
+    sorties=(),
+    plothticks=PLOTHTICKS,
+    show=False,
+    resume=False,
+    verbose=False,
+    pyramide=False,
+):
+    """
+    Traite une session par blocs de taille_bloc fichiers, dans l'ordre du temps : lecture,
+    fusion et suppression des doublons, notes, ajout au CSV, accumulation des histogrammes
+    et de l'enveloppe de la courbe d'effort. La memoire utilisee depend de taille_bloc et
+    non de la duree de l'enregistrement.
+
+    Le resultat est identique e celui du traitement en memoire (meme CSV, memes
+    histogrammes). Les echantillons d'un bloc posterieurs au debut du premier fichier
+    du bloc suivant sont reportes dans ce bloc, ou ceux deje lus l'emportent sur les
+    doublons (regle de merge_datafficheur_frames). Les colonnes et leur type (entier, ou
+    decimal si des echantillons manquent) sont fixes des le premier passage (index_files).
+
+    Args:
+        fichiers (list of str): Les fichiers (ou membres de l'archive) de la session.
+        dir (str): Le repertoire de la session (fichier des notes).
+        note (str): Le nom du fichier contenant les notes.
+        output (str): Le nom du fichier CSV de sortie, prefixe par la date des mesures.
+        dossier_sortie (str, optional): Le dossier des fichiers crees. Par defaut : dir.
+        prefixe (str, optional): Prefixe des fichiers crees. Par defaut : "".
+        archive (zipfile.ZipFile, optional): L'archive contenant les fichiers. Par defaut : None.
+        hasNote (bool, optional): Indique s'il faut ajouter les notes. Par defaut : False.
+        contenu_note (bytes, optional): Contenu deje lu du fichier des notes. Par defaut : None.
+        taille_bloc (int, optional): Nombre de fichiers traites e la fois. Par defaut : 60.
+        jobs (int, optional): Nombre de processus de lecture. Par defaut : 1.
+        cache (str, optional): Le dossier du cache, ou None. Par defaut : None.
+        cache_taille_max (int, optional): Taille maximale du cache en octets. Par defaut : None.
+        plot (bool, optional): Indique si les graphiques doivent etre crees. Par defaut : True.
+        sorties (list of str, optional): Les noms des fichiers des graphiques (ex. PDF et PNG). Par defaut : ().
+        plothticks (int, optional): La segmentation de l'axe Y de la courbe d'effort. Par defaut : PLOTHTICKS.
+        show (bool, optional): Si vrai, les graphiques sont affiches e l'ecran. Par defaut : False.
+        resume (bool, optional): Si vrai, le resume des efforts est enregistre pour compare.py. Par defaut : False.
+        verbose (bool, optional): Si vrai, affiche des messages supplementaires. Par defaut : False.
+        pyramide (bool, optional): Si vrai, la pyramide des efforts est enregistree pour pyramid.load_view. Par defaut : False.
+
+    Returns:
+        str: La date des mesures (voir date_range_str).
+
+    Raises:
+        ValueError: Si taille_bloc n'est pas positif ou si aucun fichier n'est lisible.
+    """
+    if taille_bloc <= 0:
+        raise ValueError("taille_bloc doit etre un entier positif.")
+    if dossier_sortie is None:
+        dossier_sortie = dir
+
+    infos = index_files(fichiers, taille_bloc, jobs, archive, cache, cache_taille_max, verbose)
+    if not infos:
+        raise ValueError(f"Aucun fichier de donnees lisible dans {dir}")
+
+    # colonnes et type communs e tous les blocs, comme pour la fusion en memoire
+    colonnes, lacunes = session_columns(infos)
+
+    debut_session = min(info[1] for info in infos)
+    fin_session = max(info[2] for info in infos)
+    date_str = date_range_str(pd.DatetimeIndex(np.array([debut_session, fin_session]).view("datetime64[ns]")))
+    chemin_csv = os.path.join(dossier_sortie, prefixe + date_str + "_" + output)
+
+    # ordre de la fusion en memoire
+    infos = [infos[i] for i in merge_order([info[1] for info in infos])]
+
+    if plot:
+        from plotting import COURBE_FIGSIZE, COURBE_DPI, minmax_positions
+
+        nb_pixels = int(COURBE_FIGSIZE[0] * COURBE_DPI)
+
+        def reduire(df):
+            # lignes de l'enveloppe min/max d'au moins une colonne sur l'axe de toute la session
+            temps = df.index.to_numpy(dtype="datetime64[ns]").view("int64")
+            valeurs = df.to_numpy()
+            positions = np.unique(
+                np.concatenate([
+                    minmax_positions(temps, valeurs[:, c], nb_pixels, debut_session, fin_session)
+                    for c in range(valeurs.shape[1])
+                ])
+            )
+            return df.iloc[positions]
+
+    if pyramide:
+        from pyramid import append_pyramid, build_pyramid, discard_appended_pyramid, save_appended_pyramid
+
+    report = None
+    resume_session = None
+    pyramide_session = None
+    enveloppe = []
+    nb_lignes_enveloppe = 0
+    mode = "w"
+    noms = None
+    try:
+        for k in range(0, len(infos), taille_bloc):
+            groupe = [info[0] for info in infos[k : k + taille_bloc]]
+            if verbose:
+                print(f"Bloc de {len(groupe)} fichiers ({k + len(groupe)}/{len(infos)})")
+            frames, _ = load_datafficheur_files(groupe, jobs, False, archive, cache, cache_taille_max)
+            datas, _ = merge_datafficheur_frames(frames, groupe, verbose=verbose)
+            del frames
+            if not datas.columns.equals(colonnes):
+                datas = datas.reindex(columns=colonnes)
+            if lacunes:
+                datas = datas.astype(np.float64)
+
+            # les echantillons reportes du bloc precedent l'emportent sur les doublons
+            if report is not None:
+                datas = pd.concat([report, datas[~datas.index.isin(report.index)]]).sort_index(kind="stable")
+
+            # tout fichier restant commence au plus tot e la limite : ce qui precede est definitif
+            if k + taille_bloc < len(infos):
+                limite = np.datetime64(infos[k + taille_bloc][1], "ns")
+                coupure = datas.index.searchsorted(limite, side="left")
+                report = datas.iloc[coupure:]
+                datas = datas.iloc[:coupure]
+            else:
+                report = None
+            if datas.empty:
+                continue
+
+            df = prepare_data(datas)
+            del datas
+            if hasNote:
+                df = add_notes(df, dir, note, verbose and mode == "w", contenu_note)
+
+            write_csv(df, chemin_csv, mode=mode)
+            mode = "a"
+
+            efforts = df.select_dtypes("number")
+            if noms is None:
+                noms = [str(col[0]) if isinstance(col, tuple) else str(col) for col in efforts.columns]
+            stats = histogram_stats(efforts.to_numpy(), EXCLURE, EXCLURESUP, BINS, DENSITY)
+            resume_session = merge_summaries(resume_session, summary_from_stats(noms, stats, EXCLURE, EXCLURESUP))
+            if pyramide:
+                # intervalles termines ecrits dans des fichiers temporaires, seul celui e cheval
+                # sur deux blocs est regroupe
+                pyramide_session = append_pyramid(pyramide_session, build_pyramid(efforts), dossier_sortie)
+
+            if plot:
+                enveloppe.append(reduire(efforts))
+                nb_lignes_enveloppe += len(enveloppe[-1])
+                if nb_lignes_enveloppe > 8 * nb_pixels * len(noms):
+                    enveloppe = [reduire(pd.concat(enveloppe))]
+                    nb_lignes_enveloppe = len(enveloppe[0])
+            del df, efforts
+    except BaseException:
+        if pyramide:
+            discard_appended_pyramid(pyramide_session)
+        raise
+
+    if verbose:
+        print(f"Creation du fichier CSV {prefixe}{date_str}_{output}")
+
+    if plot and enveloppe:
+        from plotting import create_plot, create_histograms
+
+        courbe = reduire(pd.concat(enveloppe))
+        if verbose:
+            print("Creation des graphiques.")
+        create_plot(
+            courbe,
+            [os.path.join(dossier_sortie, prefixe + date_str + "_Courbe-Efforts_" + sortie) for sortie in sorties],
+            verbose,
+            plothticks,
+            date_str,
+            show,
+            raw=True,
+        )
+        create_histograms(
+            courbe.iloc[:0],
+            [os.path.join(dossier_sortie, prefixe + date_str + "_Courbe-Freq_" + sortie) for sortie in sorties],
+            show=show,
+            stats=stats_from_summary(resume_session, noms, BINS, DENSITY),
+        )
+
+    if resume and resume_session is not None:
+        nom = prefixe + date_str + "_" + OUTPUTRESUME + "_" + os.path.splitext(output)[0] + ".npz"
+        if verbose:
+            print(f"Creation du resume {nom}")
+        save_summary(resume_session, os.path.join(dossier_sortie, nom))
+
+    if pyramide and pyramide_session is not None:
+        nom = prefixe + date_str + "_" + OUTPUTPYRAMIDE + "_" + os.path.splitext(output)[0] + ".npz"
+        if verbose:
+            print(f"Creation de la pyramide {nom}")
+        save_appended_pyramid(pyramide_session, os.path.join(dossier_sortie, nom))
+
+    return date_str
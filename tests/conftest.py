@@ -0,0 +1,129 @@
+# Outils partages par les tests : fichiers bruts du Datafficheur, sessions synthetiques
+# et traitement de reference d'une session entiere en memoire.
+
+import glob
+import os
+import shutil
+import zipfile
+import numpy as np
+import pandas as pd
+import pytest
+from data_processing import add_notes, load_datafficheur_files, merge_datafficheur_frames, prepare_data
+from utils import find_archive_members, find_archive_note, find_files, is_archive
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_TEST = os.path.join(RACINE, "data_test")
+ARCHIVES = sorted(glob.glob(os.path.join(DATA_TEST, "*.zip")))
+
+
+def write_raw_file(dir, debut, lignes, nom=None):
+    """
+    Ecrit un fichier brut MMDDhhmm.TXT : une ligne par seconde e partir de debut, compteur,
+    date, heure puis 10 echantillons par capteur, les capteurs les uns apres les autres.
+    """
+    debut = pd.Timestamp(debut)
+    texte = []
+    for k, valeurs in enumerate(lignes):
+        t = debut + pd.Timedelta(seconds=k)
+        texte.append(f"{k + 1},{t:%d/%m/%Y},{t:%H:%M:%S}," + ",".join(map(str, valeurs)) + "\r\n")
+    with open(os.path.join(dir, nom or f"{debut:%m%d%H%M}.TXT"), "w", newline="") as fichier:
+        fichier.write("".join(texte))
+
+
+def write_session(
+    dir,
+    debut="2022-08-21 23:55:00",
+    minutes=8,
+    doubles=(2, 3, 6),
+    vides=(4,),
+    absentes=(),
+    recouvrement=5,
+    notes=True,
+    graine=1,
+):
+    """
+    Ecrit une session synthetique d'un fichier par minute (par defaut de part et d'autre de minuit).
+
+    Args:
+        doubles: Les minutes avec un deuxieme capteur (colonnes differentes, donc des NaN).
+        vides: Les minutes avec un echantillon vide.
+        absentes: Les minutes sans fichier (trous).
+        recouvrement: La minute dont le fichier commence 20 s plus tot (doublons avec la
+            precedente, valeurs 999), None pour aucune.
+        notes: Si vrai, ecrit aussi note.csv.
+
+    Returns:
+        str: Le dossier de la session.
+    """
+    os.makedirs(dir, exist_ok=True)
+    generateur = np.random.default_rng(graine)
+    debut = pd.Timestamp(debut)
+    for minute in range(minutes):
+        capteurs = 2 if minute in doubles else 1
+        lignes = generateur.integers(0, 300, size=(60, 10 * capteurs)).astype(str)
+        if minute in vides:
+            lignes[10, 3] = ""
+        if minute in absentes:
+            continue
+        write_raw_file(dir, debut + pd.Timedelta(minutes=minute), lignes.tolist())
+    if recouvrement is not None:
+        minute = debut + pd.Timedelta(minutes=recouvrement)
+        write_raw_file(dir, minute - pd.Timedelta(seconds=20), [[999] * 10] * 30, nom=f"{minute:%m%d%H%M}.TXT")
+    if notes:
+        with open(os.path.join(dir, "note.csv"), "w") as fichier:
+            fichier.write(
+                f"{debut + pd.Timedelta('90s')},{debut + pd.Timedelta('130s')},labour\n"
+                f"{debut + pd.Timedelta('290s')},{debut + pd.Timedelta('360s')},virage\n"
+            )
+    return str(dir)
+
+
+@pytest.fixture
+def synthetic(tmp_path):
+    # session synthetique par defaut (voir write_session)
+    return write_session(tmp_path / "source")
+
+
+def copy_session(tmp_path, source, nom):
+    """
+    Copie une session (dossier ou archive ZIP) dans tmp_path/nom, pour ne rien ecrire e cote des originaux.
+
+    Returns:
+        str: Le chemin de la copie.
+    """
+    dossier = tmp_path / nom
+    dossier.mkdir()
+    if os.path.isdir(source):
+        for fichier in os.listdir(source):
+            shutil.copy(os.path.join(source, fichier), dossier)
+        return str(dossier)
+    shutil.copy(source, dossier)
+    return str(dossier / os.path.basename(source))
+
+
+def full_session(dir, note="note.csv"):
+    """
+    Traitement de toute la session en memoire, comme datafficheur.main : DataFrame prepare
+    (prepare_data) avec les notes si la session en a.
+    """
+    archive = zipfile.ZipFile(dir) if is_archive(dir) else None
+    try:
+        fichiers = find_archive_members(archive) if archive else find_files(dir)
+        frames, erreurs = load_datafficheur_files(fichiers, archive=archive)
+        contenu_note = None
+        if archive:
+            membre_note = find_archive_note(archive, note)
+            hasNote = membre_note is not None
+            if hasNote:
+                contenu_note = archive.read(membre_note)
+        else:
+            hasNote = os.path.exists(os.path.join(dir, note))
+    finally:
+        if archive:
+            archive.close()
+    en_erreur = {fichier for fichier, _ in erreurs}
+    datas, _ = merge_datafficheur_frames(frames, [f for f in fichiers if f not in en_erreur])
+    df = prepare_data(datas)
+    if hasNote:
+        df = add_notes(df, dir, note, contenu=contenu_note)
+    return df
@@ -0,0 +1,107 @@
+import threading
+import matplotlib
+import numpy as np
+import pytest
+from acquisition import RingBuffer, SerialReader, parse_line
+
+matplotlib.use("Agg")
+
+
+class FakePort:
+    """
+    Port serie simule : retourne les morceaux donnes un par un (b"" quand il n'y en a
+    plus, comme un delai de lecture ecoule), ou leve l'exception d'un morceau.
+    """
+
+    def __init__(self, morceaux):
+        self.morceaux = list(morceaux)
+        self.fini = threading.Event()
+
+    def readline(self):
+        if not self.morceaux:
+            self.fini.set()
+            self.fini.wait(0.01)
+            return b""
+        morceau = self.morceaux.pop(0)
+        if isinstance(morceau, Exception):
+            raise morceau
+        return morceau
+
+    def close(self):
+        pass
+
+
+def test_ring_buffer_wraps_and_counts_lost():
+    tampon = RingBuffer(4, 2)
+    for k in range(3):
+        tampon.append(float(k), (k, -k))
+    temps, valeurs, position, perdues = tampon.read_since(0)
+    assert list(temps) == [0, 1, 2] and position == 3 and perdues == 0
+    for k in range(3, 9):
+        tampon.append(float(k), (k, -k))
+    temps, valeurs, position, perdues = tampon.read_since(position)
+    assert list(temps) == [5, 6, 7, 8] and list(valeurs[:, 1]) == [-5, -6, -7, -8]
+    assert position == 9 and perdues == 2
+    assert list(tampon.last(2)[0]) == [7, 8]
+    assert len(tampon) == 4 and tampon.wait(9, timeout=0) == 9
+
+
+def test_ring_buffer_rejects_empty():
+    with pytest.raises(ValueError):
+        RingBuffer(0, 2)
+
+
+def test_parse_line():
+    assert parse_line(b"12.5 ; 30\r\n") == (12.5, 30.0)
+    for ligne in (b"12.5 ;\r\n", b"a ; 3\r\n"):
+        with pytest.raises(ValueError):
+            parse_line(ligne)
+
+
+def run_reader(morceaux):
+    port = FakePort(morceaux)
+    tampon = RingBuffer(100, 2)
+    lecteur = SerialReader(port, tampon)
+    lecteur.start()
+    port.fini.wait(5)
+    lecteur.stop(5)
+    return lecteur, tampon
+
+
+def test_serial_reader_joins_partial_lines():
+    lecteur, tampon = run_reader([b"1 ; 2\r\n", b"3 ;", b"", b" 4\r\n", b"oups\r\n", b"\xff ; 1\r\n", b"5 ; 6\r\n"])
+    assert not lecteur.is_alive() and lecteur.erreur is None
+    assert lecteur.nb_lignes == 3 and lecteur.nb_erreurs == 2
+    assert tampon.last(10)[1].tolist() == [[1, 2], [3, 4], [5, 6]]
+
+
+def test_serial_reader_stops_on_port_error():
+    # Arduino debranche : serial.SerialException est une sous-classe d'OSError
+    erreur = OSError(5, "Input/output error")
+    port = FakePort([b"1 ; 2\r\n", erreur, b"3 ; 4\r\n"])
+    lecteur = SerialReader(port, RingBuffer(10, 2))
+    lecteur.start()
+    lecteur.join(5)
+    assert not lecteur.is_alive()
+    assert lecteur.erreur is erreur and lecteur.nb_lignes == 1
+
+
+def test_live_plot_shows_reader_error():
+    import matplotlib.pyplot as plt
+    from liveplot import LivePlot
+
+    port = FakePort([b"1 ; 2\r\n", OSError("port debranche")])
+    tampon = RingBuffer(10, 2)
+    lecteur = SerialReader(port, tampon)
+    lecteur.start()
+    lecteur.join(5)
+    graphique = LivePlot(tampon, 10, 10, figsize=(4, 3), dpi=50, lecteur=lecteur)
+    try:
+        graphique.draw_frame()
+        assert graphique.erreur is lecteur.erreur
+        assert "port debranche" in graphique.info.get_text()
+        assert np.array_equal(graphique.ligne_moy.get_ydata(), [1])
+        graphique.draw_frame()
+        assert graphique.nb_images == 1
+    finally:
+        plt.close(graphique.fig)
@@ -0,0 +1,65 @@
+import glob
+import os
+import subprocess
+import sys
+import pytest
+import batch
+from conftest import ARCHIVES, RACINE, copy_session, full_session
+from constants import OUTPUT
+from export import write_csv
+
+SESSIONS = ["Burdignes-16h21-16h52-en-simple.zip", "23-05-31-Dalton-buttoir.zip"]
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    # deux archives de data_test et une session dont le seul fichier est illisible
+    archives = [copy_session(tmp_path, os.path.join(os.path.dirname(ARCHIVES[0]), nom), f"s{k}") for k, nom in enumerate(SESSIONS)]
+    cassee = tmp_path / "cassee"
+    cassee.mkdir()
+    (cassee / "08211514.TXT").write_bytes(b"1,21/08/2022,xx:yy,1,2\r\n")
+    return archives, str(cassee)
+
+
+def csv_outputs(session):
+    dossier = os.path.dirname(session) if session.endswith(".zip") else session
+    return glob.glob(os.path.join(dossier, "*_" + OUTPUT))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch(tmp_path, sessions, workers, capsys):
+    archives, cassee = sessions
+    resultats = batch.run_batch(archives + [cassee], workers, plot=False, cache=False, resume=False, pyramide=False)
+
+    assert [session for session, _, _ in resultats] == archives + [cassee]
+    assert [erreur is None for _, _, erreur in resultats] == [True, True, False]
+    assert isinstance(resultats[2][2], ValueError)
+    for archive in archives:
+        (chemin,) = csv_outputs(archive)
+        write_csv(full_session(archive), str(tmp_path / "attendu.csv"))
+        with open(chemin, "rb") as obtenu, open(tmp_path / "attendu.csv", "rb") as attendu:
+            assert obtenu.read() == attendu.read()
+    assert csv_outputs(cassee) == []
+
+    sortie = capsys.readouterr().out
+    lignes = sortie[sortie.index("Resume du traitement :") :].splitlines()
+    assert lignes[1].endswith(f"{archives[0]}  OK") and lignes[2].endswith(f"{archives[1]}  OK")
+    assert f"{cassee}  ERREUR : " in lignes[3]
+    assert lignes[4].startswith("3 session(s), 1 erreur(s)")
+
+
+def test_batch_exit_code(tmp_path, sessions):
+    archives, cassee = sessions
+    commande = [sys.executable, os.path.join(RACINE, "batch.py"), "--no-plot", "--no-cache", "--no-resume", "--no-pyramide", "-w", "2"]
+    environnement = dict(os.environ, HOME=str(tmp_path), MPLBACKEND="Agg")
+    assert subprocess.run(commande + archives, env=environnement, capture_output=True).returncode == 0
+    execution = subprocess.run(commande + archives + [cassee], env=environnement, capture_output=True, text=True)
+    assert execution.returncode == 1
+    assert "1 erreur(s)" in execution.stdout
+
+
+def test_batch_rejects_missing_sessions(tmp_path):
+    with pytest.raises(SystemExit):
+        batch.run([str(tmp_path / "absent*.zip")])
+    with pytest.raises(ValueError):
+        batch.run_batch([], -1)
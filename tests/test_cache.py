@@ -0,0 +1,125 @@
+import os
+import zipfile
+import pandas as pd
+import pytest
+import data_processing
+from cache import cache_key, clear_cache, evict_cache, load_cached, save_cached
+from conftest import write_session
+from data_processing import load_datafficheur_files
+from utils import find_files
+
+
+@pytest.fixture
+def analyses(monkeypatch):
+    # fichiers reellement analyses (absents du cache)
+    analyses = []
+    analyser = data_processing.load_datafficheur_file
+
+    def compter(fichier, verbose=False, contenu=None):
+        analyses.append(os.path.basename(fichier))
+        return analyser(fichier, verbose, contenu)
+
+    monkeypatch.setattr(data_processing, "load_datafficheur_file", compter)
+    return analyses
+
+
+@pytest.fixture
+def session(tmp_path):
+    return find_files(write_session(tmp_path / "session", minutes=4, doubles=(1,), recouvrement=None, notes=False))
+
+
+def entries(cache):
+    return sorted(nom for nom in os.listdir(cache) if nom.endswith(".npz"))
+
+
+def assert_same_frames(obtenus, attendus):
+    assert len(obtenus) == len(attendus)
+    for obtenu, attendu in zip(obtenus, attendus):
+        pd.testing.assert_frame_equal(obtenu, attendu)
+
+
+def test_hit_and_miss(tmp_path, session, analyses):
+    cache = str(tmp_path / "cache")
+    attendus, _ = load_datafficheur_files(session)
+    del analyses[:]
+
+    frames, _ = load_datafficheur_files(session, cache=cache)
+    assert len(analyses) == 4 and len(entries(cache)) == 4
+    assert_same_frames(frames, attendus)
+
+    frames, _ = load_datafficheur_files(session, cache=cache)
+    assert len(analyses) == 4
+    assert_same_frames(frames, attendus)
+
+    # taille modifiee (ligne ajoutee), puis date de modification seule
+    with open(session[0], "a", newline="") as fichier:
+        fichier.write("61,21/08/2022,23:56:00," + ",".join(["1"] * 10) + "\r\n")
+    stat = os.stat(session[1])
+    os.utime(session[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    frames, _ = load_datafficheur_files(session, cache=cache)
+    assert analyses[4:] == [os.path.basename(session[0]), os.path.basename(session[1])]
+    assert len(frames[0]) == len(attendus[0]) + 10
+    assert_same_frames(frames[1:], attendus[1:])
+
+
+def test_parser_version_invalidates(tmp_path, session, analyses, monkeypatch):
+    cache = str(tmp_path / "cache")
+    load_datafficheur_files(session, cache=cache)
+    anciennes = entries(cache)
+    monkeypatch.setattr(data_processing, "PARSER_VERSION", data_processing.PARSER_VERSION + 1)
+    load_datafficheur_files(session, cache=cache)
+    assert len(analyses) == 8
+    # les anciennes entrees restent jusqu'e leur eviction, 4 nouvelles sont creees
+    assert set(anciennes) < set(entries(cache)) and len(entries(cache)) == 8
+
+
+def test_archive_member_keys(tmp_path, session, analyses):
+    # la cle d'un membre ne depend que de son contenu, pas de l'archive ni de sa date
+    cache = str(tmp_path / "cache")
+    archives = []
+    for nom, fichiers in (("a.zip", session), ("b.zip", session[:2])):
+        with zipfile.ZipFile(tmp_path / nom, "w") as archive:
+            for fichier in fichiers:
+                archive.write(fichier, "session/" + os.path.basename(fichier))
+        archives.append(zipfile.ZipFile(tmp_path / nom))
+    try:
+        membres = [archive.namelist() for archive in archives]
+        frames, _ = load_datafficheur_files(membres[0], archive=archives[0], cache=cache)
+        assert len(analyses) == 4
+        autres, _ = load_datafficheur_files(membres[1], archive=archives[1], cache=cache)
+        assert len(analyses) == 4
+        assert_same_frames(autres, frames[:2])
+        contenu = archives[0].read(membres[0][0])
+        assert cache_key("x.TXT", 1, contenu) == cache_key(membres[0][0], 1, contenu)
+        assert cache_key(membres[0][0], 1, contenu) != cache_key(membres[0][0], 1, contenu + b"\r\n")
+        assert cache_key(membres[0][0], 1, contenu) != cache_key(membres[0][0], 2, contenu)
+    finally:
+        for archive in archives:
+            archive.close()
+
+
+def test_lru_eviction(tmp_path):
+    cache = str(tmp_path / "cache")
+    datas = pd.DataFrame({1: range(100)}, index=pd.date_range("2022-08-21", periods=100, freq="100ms"))
+    for k, cle in enumerate("abcd"):
+        save_cached(cache, cle, datas)
+        os.utime(os.path.join(cache, cle + ".npz"), ns=(0, (k + 1) * 1_000_000_000))
+    (tmp_path / "cache" / "autre.txt").write_text("ignore")
+    taille = os.path.getsize(os.path.join(cache, "a.npz"))
+
+    # a est relu : il devient le plus recemment utilise
+    pd.testing.assert_frame_equal(load_cached(cache, "a"), datas, check_freq=False)
+    assert evict_cache(cache, 4 * taille) == 0
+    assert evict_cache(cache, 2 * taille) == 2
+    assert entries(cache) == ["a.npz", "d.npz"]
+    assert load_cached(cache, "b") is None
+
+    assert clear_cache(cache) == 2
+    assert entries(cache) == [] and os.listdir(cache) == ["autre.txt"]
+    assert clear_cache(str(tmp_path / "absent")) == 0
+
+
+def test_size_limit_after_loading(tmp_path, session):
+    cache = str(tmp_path / "cache")
+    load_datafficheur_files(session, cache=cache, cache_taille_max=1)
+    assert entries(cache) == []
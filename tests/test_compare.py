@@ -0,0 +1,122 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import compare
+from conftest import ARCHIVES, full_session
+from constants import EXCLURE, EXCLURESUP, OUTPUTRESUME
+from distribution import histogram_stats, load_summary, merge_summaries, save_summary, summary_from_stats, summary_moments
+
+SESSIONS = ["Burdignes-15h14-16h10-en-double.zip", "Burdignes-16h21-16h52-en-simple.zip", "2023-05-30-Marianne.zip"]
+
+
+def summary(df):
+    # resume d'une session, comme datafficheur.main
+    efforts = df.select_dtypes("number")
+    noms = [str(col[0]) for col in efforts.columns]
+    return summary_from_stats(noms, histogram_stats(efforts.to_numpy(), EXCLURE, EXCLURESUP), EXCLURE, EXCLURESUP)
+
+
+def assert_summary_equal(resume, attendu):
+    assert resume["seuils"] == attendu["seuils"]
+    assert sorted(resume["colonnes"]) == sorted(attendu["colonnes"])
+    for nom, colonne in attendu["colonnes"].items():
+        obtenue = resume["colonnes"][nom]
+        assert obtenue["n"] == colonne["n"], nom
+        assert obtenue["origine"] == colonne["origine"], nom
+        np.testing.assert_array_equal(obtenue["comptes"], colonne["comptes"], err_msg=nom)
+        for cle in ("somme", "somme_carres", "minimum", "maximum"):
+            assert obtenue[cle] == pytest.approx(colonne[cle], rel=1e-12, nan_ok=True), (nom, cle)
+
+
+@pytest.fixture(scope="module")
+def sessions():
+    return {nom: full_session(os.path.join(os.path.dirname(ARCHIVES[0]), nom)) for nom in SESSIONS}
+
+
+def test_merge_equals_concatenated_session(sessions):
+    frames = list(sessions.values())
+    resume = None
+    for df in frames:
+        resume = merge_summaries(resume, summary(df))
+    # sessions sans les memes capteurs : les colonnes absentes d'une session sont vides
+    attendu = summary(pd.concat(frames).sort_index().astype(np.float64))
+    assert_summary_equal(resume, attendu)
+
+    total = np.concatenate([df[("Total", "Efforts")].to_numpy(np.float64) for df in frames])
+    total = total[(total > EXCLURE) & (total < EXCLURESUP)]
+    moyenne, ecart_type = summary_moments(resume["colonnes"]["Total"])
+    assert moyenne == pytest.approx(total.mean(), rel=1e-12)
+    assert ecart_type == pytest.approx(total.std(ddof=1), rel=1e-9)
+
+
+def test_merge_does_not_modify_arguments(sessions):
+    premier, second = (summary(df) for df in list(sessions.values())[:2])
+    comptes = premier["colonnes"]["Total"]["comptes"].copy()
+    fusion = merge_summaries(premier, second)
+    np.testing.assert_array_equal(premier["colonnes"]["Total"]["comptes"], comptes)
+    assert fusion["colonnes"]["Total"]["n"] == premier["colonnes"]["Total"]["n"] + second["colonnes"]["Total"]["n"]
+    assert merge_summaries(None, premier) is premier
+
+
+def test_merge_warns_on_different_thresholds(sessions, capsys):
+    premier = summary(next(iter(sessions.values())))
+    autre = dict(premier, seuils=(0, 100))
+    merge_summaries(premier, autre)
+    assert "seuils differents" in capsys.readouterr().out
+
+
+def test_save_load_round_trip(tmp_path, sessions):
+    for k, df in enumerate(sessions.values()):
+        resume = summary(df)
+        chemin = str(tmp_path / f"{k}.npz")
+        save_summary(resume, chemin)
+        assert_summary_equal(load_summary(chemin), resume)
+
+
+@pytest.fixture
+def resumes(tmp_path, sessions):
+    # un fichier de resume par session, nomme comme par datafficheur.main
+    chemins = []
+    for k, df in enumerate(sessions.values()):
+        chemin = tmp_path / f"session{k}_{OUTPUTRESUME}_sortie.npz"
+        save_summary(summary(df), str(chemin))
+        chemins.append(str(chemin))
+    (tmp_path / "autre.npz").write_bytes(b"")
+    return chemins
+
+
+def test_expand_summaries(tmp_path, resumes):
+    assert compare.expand_summaries([str(tmp_path)]) == resumes
+    assert compare.expand_summaries([resumes[1], str(tmp_path / "session*.npz"), resumes[0]]) == resumes
+    assert compare.expand_summaries([str(tmp_path / "absent*.npz")]) == []
+
+
+def test_aggregate_summaries(resumes, sessions):
+    attendu = None
+    for df in sessions.values():
+        attendu = merge_summaries(attendu, summary(df))
+    assert_summary_equal(compare.aggregate_summaries(resumes), attendu)
+    assert compare.aggregate_summaries([]) is None
+
+
+def test_compare_main(tmp_path, resumes, monkeypatch):
+    curves = []
+    monkeypatch.setattr("plotting.create_comparison", lambda groupes, colonne, sorties, *args: curves.append((groupes, colonne, sorties)))
+    compare.main([resumes[0], "-g", "Burdignes", resumes[0], resumes[1], "-g", "vide", str(tmp_path / "absent*.npz"), "-c", "1", "-o", "c.pdf", "--no-show"])
+    ((groupes, colonne, sorties),) = curves
+    assert [libelle for libelle, _ in groupes] == [os.path.splitext(os.path.basename(resumes[0]))[0], "Burdignes"]
+    assert colonne == "1" and sorties == ["c.pdf"]
+    assert groupes[1][1]["colonnes"]["1"]["n"] == sum(load_summary(c)["colonnes"]["1"]["n"] for c in resumes[:2])
+
+
+def test_compare_writes_figure(tmp_path, resumes):
+    sortie = tmp_path / "comparaison.png"
+    compare.main([str(tmp_path), "-o", str(sortie), "--no-show"])
+    assert sortie.stat().st_size > 0
+
+
+@pytest.mark.parametrize("argv", [[], ["-g", "seul"], ["absent.npz"]])
+def test_compare_rejects_missing_summaries(argv):
+    with pytest.raises(SystemExit):
+        compare.main(argv + ["--no-show"])
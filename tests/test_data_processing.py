@@ -0,0 +1,209 @@
+import io
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import ARCHIVES
+from data_processing import add_notes, load_datafficheur_files, merge_datafficheur_frames
+from utils import find_archive_members, find_files
+
+
+def frame(debut, n, valeur=0, colonnes=(1,)):
+    # n echantillons e 10 Hz, valeurs valeur, valeur + 1, ... (decalees de 1000 par capteur)
+    index = pd.date_range(debut, periods=n, freq="100ms")
+    return pd.DataFrame(
+        {c: valeur + np.arange(n) + 1000 * k for k, c in enumerate(colonnes)},
+        index=index,
+    )
+
+
+def reference_merge(frames):
+    # fichiers par premier echantillon (tri stable), concatenation, tri stable et premier doublon conserve
+    colonnes = pd.Index(sorted(set().union(*(f.columns for f in frames))))
+    frames = [f.reindex(columns=colonnes) for f in frames if not f.empty]
+    ordre = sorted(range(len(frames)), key=lambda i: frames[i].index.min())
+    datas = pd.concat([frames[i] for i in ordre]).sort_index(kind="stable")
+    # un seul bloc de valeurs, comme la fusion : decimal des qu'un capteur manque
+    return datas[~datas.index.duplicated()].astype(np.result_type(*datas.dtypes))
+
+
+@pytest.fixture
+def fichiers():
+    # dans l'ordre de la liste (noms tries) :
+    # a et e commencent ensemble, b chevauche a puis c, c suit a sans trou, d apres un trou de 10,1 s,
+    # f suit d (0,1 s) et g est vide
+    c = frame("2022-08-21 10:01:00", 600, 3000)
+    # c n'est pas trie et contient un doublon : le premier des deux est conserve
+    c = pd.concat([c, frame("2022-08-21 10:01:30", 1, -1), c.iloc[:5]])
+    return {
+        "a": frame("2022-08-21 10:00:00", 600, 1000),
+        "b": frame("2022-08-21 10:00:40", 300, 2000),
+        "c": c,
+        "d": frame("2022-08-21 10:02:10", 100, 4000, colonnes=(1, 2)),
+        "e": frame("2022-08-21 10:00:00", 50, 5000),
+        "f": frame("2022-08-21 10:02:20", 10, 6000),
+        "g": frame("2022-08-21 09:00:00", 0),
+    }
+
+
+def test_merge_matches_reference(fichiers):
+    datas, _ = merge_datafficheur_frames(list(fichiers.values()), list(fichiers))
+    attendu = reference_merge(list(fichiers.values()))
+    pd.testing.assert_frame_equal(datas, attendu)
+    assert datas.index.is_unique and datas.index.is_monotonic_increasing
+    # a commence le plus tot : il l'emporte sur e, puis sur b, qui l'emporte sur c
+    assert datas.loc[pd.Timestamp("2022-08-21 10:00:00"), 1] == 1000
+    assert datas.loc[pd.Timestamp("2022-08-21 10:00:50"), 1] == 1500
+    assert datas.loc[pd.Timestamp("2022-08-21 10:01:05"), 1] == 2250
+    assert datas.loc[pd.Timestamp("2022-08-21 10:01:30"), 1] == 3300
+    assert datas.loc[pd.Timestamp("2022-08-21 10:02:10"), 2] == 5000
+
+
+@pytest.mark.parametrize("ordre", [[0, 1, 2, 3, 4, 5, 6], [6, 5, 4, 3, 2, 1, 0], [2, 0, 6, 3, 5, 1, 4]])
+def test_merge_order_of_the_list(fichiers, ordre):
+    # seul l'ordre de e et a (meme debut) depend de l'ordre de la liste
+    noms = [list(fichiers)[i] for i in ordre]
+    datas, _ = merge_datafficheur_frames([fichiers[nom] for nom in noms], noms)
+    attendu = reference_merge([fichiers[nom] for nom in noms])
+    pd.testing.assert_frame_equal(datas, attendu)
+    premier = "a" if noms.index("a") < noms.index("e") else "e"
+    assert datas.loc[pd.Timestamp("2022-08-21 10:00:00"), 1] == fichiers[premier].iloc[0, 0]
+
+
+def test_merge_diagnostics(fichiers):
+    _, diagnostics = merge_datafficheur_frames(list(fichiers.values()), list(fichiers))
+    t = pd.Timestamp
+    assert diagnostics["chevauchements"] == [
+        ("e", t("2022-08-21 10:00:00"), t("2022-08-21 10:00:04.9"), 50),
+        ("b", t("2022-08-21 10:00:40"), t("2022-08-21 10:00:59.9"), 200),
+        ("c", t("2022-08-21 10:01:00"), t("2022-08-21 10:01:09.9"), 100),
+    ]
+    assert diagnostics["trous"] == [
+        ("c", "d", t("2022-08-21 10:01:59.9"), t("2022-08-21 10:02:10"), pd.Timedelta("10.1s")),
+    ]
+
+
+def test_merge_adjacent_files_need_no_merge():
+    fichiers = [frame("2022-08-21 10:00:00", 600), frame("2022-08-21 10:01:00", 600, 600)]
+    datas, diagnostics = merge_datafficheur_frames(fichiers)
+    assert datas[1].tolist() == list(range(1200))
+    assert diagnostics == {"chevauchements": [], "trous": []}
+    # l'ecart de 0,1 s entre les deux fichiers n'est un trou qu'au-dessus du seuil
+    _, diagnostics = merge_datafficheur_frames(fichiers, seuil_trou=pd.Timedelta("50ms"))
+    assert [trou[:2] for trou in diagnostics["trous"]] == [("0", "1")]
+
+
+def test_merge_empty():
+    with pytest.raises(ValueError):
+        merge_datafficheur_frames([])
+    datas, diagnostics = merge_datafficheur_frames([frame("2022-08-21 10:00:00", 0)])
+    assert datas.empty and diagnostics == {"chevauchements": [], "trous": []}
+
+
+def reference_notes(df, contenu):
+    # ancienne boucle : une affectation df.loc[start:end, "action"] par note
+    df = df.copy()
+    notes = pd.read_csv(io.BytesIO(contenu), header=None, names=["start", "end", "action"])
+    for _, row in notes.iterrows():
+        df.loc[row["start"] : row["end"], "action"] = row["action"]
+    return df
+
+
+@pytest.fixture
+def efforts():
+    # deux plages de 10 Hz separees par un trou, colonnes de prepare_data
+    index = pd.date_range("2022-08-21 10:00:00", "2022-08-21 10:01:00", freq="100ms").append(
+        pd.date_range("2022-08-21 10:05:00", "2022-08-21 10:06:00", freq="100ms")
+    )
+    df = pd.DataFrame({(1, "Efforts"): np.arange(len(index)) % 300}, index=index)
+    df[("Total", "Efforts")] = df[(1, "Efforts")]
+    return df
+
+
+NOTES = {
+    "chevauchements": (
+        "2022-08-21 10:00:05,2022-08-21 10:00:40,labour\n"
+        "2022-08-21 10:00:10.5,2022-08-21 10:00:20,virage\n"
+        "2022-08-21 10:00:15,2022-08-21 10:05:30,\"labour, retour\"\n"
+        "2022-08-21 10:00:30.25,2022-08-21 10:00:31.75,virage\n"
+        "2022-08-21 10:05,2022-08-21 10:05:00.3,arret\n"
+    ),
+    "hors-donnees": (
+        "2022-08-21 09:00:00,2022-08-21 09:30:00,avant\n"
+        "2022-08-21 10:02:00,2022-08-21 10:04:00,trou\n"
+        "2022-08-21 10:00:59.95,2022-08-21 10:04:59.95,bord\n"
+        "2022-08-21 11:00:00,2022-08-21 12:00:00,apres\n"
+    ),
+    "fin-avant-debut": "2022-08-21 10:00:20,2022-08-21 10:00:10,inverse\n2022-08-21 10:00:00,2022-08-21 10:00:00,premier\n",
+}
+
+
+@pytest.mark.parametrize("notes", list(NOTES))
+def test_add_notes_matches_loop(efforts, notes):
+    contenu = NOTES[notes].encode()
+    obtenu = add_notes(efforts.copy(), None, None, contenu=contenu)
+    attendu = reference_notes(efforts, contenu)
+    assert obtenu.columns.equals(attendu.columns)
+    libelles = obtenu[("action", "")]
+    assert isinstance(libelles.dtype, pd.CategoricalDtype)
+    codes = pd.Categorical(attendu[("action", "")], categories=libelles.cat.categories).codes
+    np.testing.assert_array_equal(libelles.cat.codes.to_numpy(), codes)
+    pd.testing.assert_frame_equal(obtenu.drop(columns=("action", "")), efforts)
+
+
+def test_add_notes_keeps_existing_labels(efforts):
+    premieres = b"2022-08-21 10:00:00,2022-08-21 10:00:30,labour\n"
+    secondes = b"2022-08-21 10:00:20,2022-08-21 10:05:10,virage\n"
+    obtenu = add_notes(add_notes(efforts.copy(), None, None, contenu=premieres), None, None, contenu=secondes)
+    attendu = reference_notes(reference_notes(efforts, premieres), secondes)
+    assert obtenu[("action", "")].astype(object).equals(attendu[("action", "")].astype(object))
+
+
+def test_add_notes_empty_file(tmp_path, efforts):
+    (tmp_path / "note.csv").write_bytes(b"")
+    obtenu = add_notes(efforts.copy(), str(tmp_path), "note.csv")
+    assert obtenu.columns.equals(reference_notes(efforts, b"").columns)
+    pd.testing.assert_frame_equal(obtenu, efforts)
+
+
+@pytest.fixture
+def dossier_corrompu(tmp_path):
+    # 12 minutes d'une archive, dont une illisible au milieu
+    with zipfile.ZipFile(ARCHIVES[0]) as archive:
+        for membre in find_archive_members(archive)[:12]:
+            (tmp_path / os.path.basename(membre)).write_bytes(archive.read(membre))
+    fichiers = find_files(str(tmp_path))
+    with open(fichiers[5], "wb") as fichier:
+        fichier.write(b"1,21/08/2022,xx:yy,1,2\r\n")
+    return fichiers, fichiers[5]
+
+
+@pytest.mark.parametrize("jobs", [2, 3])
+def test_parallel_loading_keeps_order(dossier_corrompu, jobs):
+    fichiers, corrompu = dossier_corrompu
+    attendus, erreurs_attendues = load_datafficheur_files(fichiers)
+    frames, erreurs = load_datafficheur_files(fichiers, jobs=jobs)
+    assert [fichier for fichier, _ in erreurs] == [fichier for fichier, _ in erreurs_attendues] == [corrompu]
+    assert isinstance(erreurs[0][1], ValueError)
+    assert len(frames) == len(fichiers) - 1
+    for obtenu, attendu in zip(frames, attendus):
+        pd.testing.assert_frame_equal(obtenu, attendu)
+    # dans l'ordre des fichiers : chaque fichier commence apres le precedent
+    assert all(a.index[0] < b.index[0] for a, b in zip(frames[:-1], frames[1:]))
+
+
+def test_parallel_loading_archive():
+    with zipfile.ZipFile(ARCHIVES[0]) as archive:
+        membres = find_archive_members(archive)
+        attendus, _ = load_datafficheur_files(membres, archive=archive)
+        frames, erreurs = load_datafficheur_files(membres + ["absent.TXT"], jobs=2, archive=archive)
+    assert [fichier for fichier, _ in erreurs] == ["absent.TXT"]
+    assert len(frames) == len(attendus)
+    for obtenu, attendu in zip(frames, attendus):
+        pd.testing.assert_frame_equal(obtenu, attendu)
+
+
+def test_loading_rejects_negative_jobs():
+    with pytest.raises(ValueError):
+        load_datafficheur_files([], jobs=-1)
@@ -0,0 +1,124 @@
+import os
+import numpy as np
+import pytest
+from scipy.stats import gaussian_kde
+from conftest import ARCHIVES, full_session
+from constants import EXCLURE, EXCLURESUP
+from distribution import bin_counts, binned_kde, histogram_stats, kde_curve
+
+# ecart maximal e scipy.stats.gaussian_kde documente par binned_kde, relatif au maximum de la densite
+TOLERANCE_KDE = 0.005
+
+
+@pytest.fixture(scope="module", params=ARCHIVES, ids=os.path.basename)
+def efforts(request):
+    return full_session(request.param)
+
+
+def reference_kde(valeurs, x, bw_adjust=0.5):
+    # seaborn.kdeplot : regle de Scott, facteur multiplie par bw_adjust
+    kde = gaussian_kde(valeurs, bw_method="scott")
+    kde.set_bandwidth(kde.factor * bw_adjust)
+    return kde(x)
+
+
+def assert_kde_close(valeurs, bw_adjust=0.5):
+    x, densite = kde_curve(*bin_counts(valeurs), bw_adjust=bw_adjust)
+    attendue = reference_kde(valeurs.astype(np.float64), x, bw_adjust)
+    assert np.abs(densite - attendue).max() <= TOLERANCE_KDE * attendue.max()
+
+
+def test_kde_matches_gaussian_kde(efforts):
+    for capteur in efforts.columns:
+        valeurs = efforts[capteur].to_numpy()
+        valeurs = valeurs[~np.isnan(valeurs)] if valeurs.dtype.kind == "f" else valeurs
+        x, _ = kde_curve(*bin_counts(valeurs))
+        if x is not None:
+            assert_kde_close(valeurs)
+
+
+@pytest.mark.parametrize("bw_adjust", [0.2, 0.5, 1.0])
+def test_kde_matches_gaussian_kde_bw_adjust(bw_adjust):
+    valeurs = np.random.default_rng(0).gamma(2.0, 30.0, 20000).round().astype(np.int16)
+    assert_kde_close(valeurs, bw_adjust)
+
+
+def test_kde_non_integer_values():
+    # repartition lineaire sur 1024 cases : erreur de l'ordre de (pas / bw)^2
+    valeurs = np.random.default_rng(1).normal(100.0, 15.0, 5000)
+    assert_kde_close(valeurs)
+
+
+@pytest.mark.parametrize("valeurs", [np.array([42]), np.full(100, 7), np.full(10, 3.5)], ids=["unique", "constante", "constante-decimale"])
+def test_kde_degenerate(valeurs):
+    assert kde_curve(*bin_counts(valeurs)) == (None, None)
+
+
+def test_kde_null_standard_deviation():
+    valeurs = np.arange(10)
+    assert kde_curve(*bin_counts(valeurs), ecart_type=0.0) == (None, None)
+    x, densite = kde_curve(*bin_counts(valeurs), ecart_type=float(np.std(valeurs, ddof=1)))
+    np.testing.assert_allclose(densite, reference_kde(valeurs, x), atol=TOLERANCE_KDE * densite.max())
+
+
+def test_binned_kde_rejects_invalid_arguments():
+    with pytest.raises(ValueError):
+        binned_kde(0.0, 1.0, np.array([1.0, 2.0]), 0.0, np.arange(3))
+    with pytest.raises(ValueError):
+        binned_kde(0.0, 1.0, np.array([]), 1.0, np.arange(3))
+    with pytest.raises(ValueError):
+        bin_counts(np.array([]))
+
+
+def reference_stats(colonne, exclure, excluresup, bins=50, density=True):
+    # moments numpy et barres de plt.hist (np.histogram) des valeurs retenues
+    retenues = colonne[(colonne > exclure) & (colonne < excluresup)].astype(np.float64)
+    hauteurs, bords = np.histogram(retenues, bins=bins, density=density)
+    return {
+        "n": len(retenues),
+        "moyenne": retenues.mean(),
+        "ecart_type": retenues.std(ddof=1),
+        "minimum": retenues.min(),
+        "maximum": retenues.max(),
+        "bords": bords,
+        "hauteurs": hauteurs,
+    }
+
+
+def assert_stats_close(stats, valeurs, exclure, excluresup, density=True):
+    for c, stat in enumerate(stats):
+        attendu = reference_stats(valeurs[:, c], exclure, excluresup, density=density)
+        assert stat["n"] == attendu["n"]
+        for cle in ("moyenne", "ecart_type", "minimum", "maximum"):
+            assert stat[cle] == pytest.approx(attendu[cle], rel=1e-12), cle
+        np.testing.assert_allclose(stat["bords"], attendu["bords"], rtol=1e-12)
+        np.testing.assert_allclose(stat["hauteurs"], attendu["hauteurs"], rtol=1e-9, atol=1e-15)
+
+
+@pytest.mark.parametrize("seuils", [(EXCLURE, EXCLURESUP), (-1, 10**6), (40, 120)])
+def test_histogram_stats_match_numpy(efforts, seuils):
+    valeurs = efforts.to_numpy()
+    assert_stats_close(histogram_stats(valeurs, *seuils), valeurs, *seuils)
+
+
+def test_histogram_stats_missing_and_non_integer_values():
+    generateur = np.random.default_rng(2)
+    entiers = generateur.integers(0, 500, size=(5000, 3)).astype(np.float32)
+    entiers[generateur.random(entiers.shape) < 0.1] = np.nan
+    decimaux = entiers + 0.25
+    for valeurs in (entiers, decimaux):
+        assert_stats_close(histogram_stats(valeurs, EXCLURE, EXCLURESUP), valeurs, EXCLURE, EXCLURESUP)
+        assert_stats_close(histogram_stats(valeurs, EXCLURE, EXCLURESUP, density=False), valeurs, EXCLURE, EXCLURESUP, False)
+    # plage trop large pour le comptage commun : colonne par colonne
+    assert_stats_close(histogram_stats(entiers, EXCLURE, EXCLURESUP, taille_max=100), entiers, EXCLURE, EXCLURESUP)
+
+
+def test_histogram_stats_empty_column():
+    valeurs = np.array([[1, 50], [2, 60], [3, 70]])
+    vide, pleine = histogram_stats(valeurs, EXCLURE, EXCLURESUP)
+    assert vide["n"] == 0 and np.isnan(vide["moyenne"]) and vide["comptes"] is None
+    assert pleine["n"] == 3 and pleine["moyenne"] == 60
+    with pytest.raises(ValueError):
+        histogram_stats(valeurs[:, 0], EXCLURE, EXCLURESUP)
+    with pytest.raises(ValueError):
+        histogram_stats(valeurs, EXCLURE, EXCLURESUP, bins=0)
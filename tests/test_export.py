@@ -0,0 +1,67 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import ARCHIVES, full_session
+from data_processing import add_notes
+from export import write_csv
+
+
+def reference_csv(df, chemin, mode="w"):
+    # ancienne ecriture (write_output_csv) : index (date, heure) formate par strftime puis to_csv
+    df = df.copy(deep=False)
+    df.columns = [" ".join(str(level) for level in col) for col in df.columns]
+    df.index = pd.MultiIndex.from_arrays(
+        [df.index.date, [t.strftime("%H:%M:%S.%f")[:10] for t in df.index.time]],
+        names=["date", "heure"],
+    )
+    df.to_csv(chemin, mode=mode, header=(mode == "w"))
+
+
+def with_notes(df):
+    # notes qui se chevauchent, dont une hors des donnees et des libelles e mettre entre guillemets
+    instants = df.index[(np.array([0.1, 0.3, 0.25, 0.5, 0.6, 0.7]) * len(df)).astype(int)]
+    fin = df.index[-1]
+    notes = (
+        f"{instants[0]},{instants[1]},labour\n"
+        f"{instants[2]},{instants[3]},\"virage, demi-tour\"\n"
+        f"{instants[4]},{instants[5]},\"dit \"\"butee\"\"\"\n"
+        f"{fin + pd.Timedelta('1h')},{fin + pd.Timedelta('2h')},apres\n"
+    )
+    return add_notes(df, None, None, contenu=notes.encode())
+
+
+def assert_same_csv(tmp_path, df, blocs=1):
+    # blocs > 1 : le fichier est cree avec le premier bloc puis complete en mode "a"
+    attendu, obtenu = tmp_path / "attendu.csv", tmp_path / "obtenu.csv"
+    for k, bloc in enumerate(np.array_split(np.arange(len(df)), blocs)):
+        mode = "w" if k == 0 else "a"
+        reference_csv(df.iloc[bloc], attendu, mode)
+        write_csv(df.iloc[bloc], str(obtenu), mode, chunksize=7919)
+    assert obtenu.read_bytes() == attendu.read_bytes()
+
+
+@pytest.fixture(scope="module", params=ARCHIVES, ids=os.path.basename)
+def efforts(request):
+    return full_session(request.param)
+
+
+@pytest.mark.parametrize("notes", [False, True])
+@pytest.mark.parametrize("blocs", [1, 3])
+def test_write_csv_matches_to_csv(tmp_path, efforts, notes, blocs):
+    assert_same_csv(tmp_path, with_notes(efforts) if notes else efforts, blocs)
+
+
+def test_write_csv_missing_values(tmp_path, synthetic):
+    # echantillons manquants (colonnes decimales) et notes de la session synthetique
+    df = full_session(synthetic)
+    assert df.iloc[:, 0].dtype.kind == "f" and ("action", "") in df.columns
+    assert_same_csv(tmp_path, df, 2)
+
+
+def test_write_csv_rejects_invalid_arguments(tmp_path, synthetic):
+    df = full_session(synthetic)
+    with pytest.raises(ValueError):
+        write_csv(df, str(tmp_path / "sortie.csv"), mode="x")
+    with pytest.raises(ValueError):
+        write_csv(df.reset_index(drop=True), str(tmp_path / "sortie.csv"))
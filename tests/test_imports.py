@@ -0,0 +1,50 @@
+import os
+import shutil
+import subprocess
+import sys
+import pytest
+from conftest import DATA_TEST, RACINE
+
+LOURDS = {"matplotlib", "seaborn", "scipy"}
+
+
+def python(*args):
+    return subprocess.run([sys.executable, *args], cwd=RACINE, capture_output=True, text=True, check=True)
+
+
+@pytest.mark.parametrize("module", ["datafficheur", "batch", "compare"])
+def test_import_is_light(module):
+    python("-c", f"import {module}, sys; lourds = {LOURDS | {'pandas'}!r} & set(sys.modules); assert not lourds, lourds")
+
+
+def test_utils_does_not_import_pandas():
+    python("-c", "import utils, sys; assert 'pandas' not in sys.modules")
+
+
+@pytest.mark.parametrize("script", ["datafficheur.py", "batch.py", "compare.py"])
+def test_help_is_light(script):
+    # --help execute comme en ligne de commande, puis modules charges par le meme interpreteur
+    code = f"""
+import runpy, sys
+sys.argv = [{script!r}, "--help"]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit as e:
+    assert not e.code, e.code
+lourds = {LOURDS | {"pandas"}!r} & set(sys.modules)
+assert not lourds, lourds
+"""
+    assert "usage:" in python("-c", code).stdout
+
+
+def test_no_plot_run_does_not_import_plotting(tmp_path):
+    # les fichiers crees le sont e cote de l'archive
+    archive = shutil.copy(os.path.join(DATA_TEST, "Burdignes-16h21-16h52-en-simple.zip"), tmp_path)
+    code = (
+        "import sys, datafficheur; "
+        f"datafficheur.run(['-d', {archive!r}, '--no-plot', "
+        "'--no-cache', '--no-resume', '--no-pyramide']); "
+        f"lourds = {LOURDS!r} & set(sys.modules); assert not lourds, lourds"
+    )
+    python("-c", code)
+    assert any(nom.endswith(".csv") for nom in os.listdir(tmp_path))
@@ -0,0 +1,82 @@
+import time
+import matplotlib
+import numpy as np
+import pytest
+from acquisition import RingBuffer
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+from liveplot import LivePlot
+from livestats import LiveStats
+
+
+def fill(tampon, n=30):
+    # n mesures (k, 2k) recues e 10 Hz jusqu'e maintenant
+    maintenant = time.time()
+    for k in range(n):
+        tampon.append(maintenant - (n - k) * 0.1, (k, 2 * k))
+    return tampon
+
+
+@pytest.fixture
+def tampon():
+    return fill(RingBuffer(100, 2))
+
+
+def make_plot(tampon, **options):
+    return LivePlot(tampon, 10, 10, figsize=(4, 3), dpi=50, **options)
+
+
+def test_draw_frame_shows_last_points(tampon):
+    graphique = make_plot(tampon)
+    try:
+        graphique.draw_frame()
+        assert graphique.nb_images == 1 and graphique.fond is not None
+        assert graphique.ligne_moy.get_ydata().tolist() == list(range(20, 30))
+        assert graphique.ligne_max.get_ydata().tolist() == [2 * k for k in range(20, 30)]
+        assert "mesures = 30" in graphique.info.get_text()
+        assert 0 <= graphique.latence < 5
+
+        tampon.append(time.time(), (100, 200))
+        graphique.draw_frame()
+        assert graphique.ligne_moy.get_ydata()[-1] == 100
+        assert graphique.nb_images == 2
+    finally:
+        plt.close(graphique.fig)
+
+
+def test_draw_frame_with_stats():
+    tampon = RingBuffer(100, 2)
+    # statistiques creees avant la lecture, comme dans DataMoyGraph.main
+    statistiques = LiveStats(tampon, lissage=5)
+    graphique = make_plot(fill(tampon), stats=statistiques)
+    try:
+        graphique.draw_frame()
+        x, lisse = graphique.ligne_lisse.get_data()
+        # moyenne des 5 mesures precedentes pour chacun des 10 points affiches
+        assert x.tolist() == list(range(10))
+        np.testing.assert_allclose(lisse, np.arange(18, 28))
+        assert "session" in graphique.panneau.get_text()
+        assert statistiques.summary()["session"]["nombre"] == 30
+        # le panneau n'est redessine qu'apres periode_panneau
+        prochain = graphique.prochain_panneau
+        graphique.draw_frame()
+        assert graphique.prochain_panneau == prochain and graphique.nb_images == 2
+    finally:
+        plt.close(graphique.fig)
+
+
+def test_empty_buffer():
+    graphique = make_plot(RingBuffer(10, 2))
+    try:
+        graphique.draw_frame()
+        assert len(graphique.ligne_moy.get_ydata()) == 0 and graphique.latence is None
+    finally:
+        plt.close(graphique.fig)
+
+
+@pytest.mark.parametrize("nb_points, fps", [(0, 10), (10, 0), (-1, 10)])
+def test_rejects_invalid_parameters(nb_points, fps):
+    with pytest.raises(ValueError):
+        LivePlot(RingBuffer(10, 2), nb_points, fps)
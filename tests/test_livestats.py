@@ -0,0 +1,126 @@
+import math
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from acquisition import RingBuffer
+from livestats import HistogramSketch, LiveStats, RollingWindow, SessionStats
+
+RACINE = os.path.dirname(os.path.dirname(__file__))
+
+
+@pytest.fixture
+def mesures():
+    # mesures irregulieres (0.05 e 0.3 s), avec des NaN et une interruption de 20 s
+    generateur = np.random.default_rng(3)
+    ecarts = generateur.uniform(0.05, 0.3, 5000)
+    ecarts[2500] = 20.0
+    temps = 1661094000.0 + np.cumsum(ecarts)
+    valeurs = generateur.gamma(2.0, 40.0, len(temps))
+    valeurs[generateur.random(len(temps)) < 0.02] = np.nan
+    return temps, valeurs
+
+
+def test_windows_match_pandas(mesures):
+    temps, valeurs = mesures
+    statistiques = LiveStats(RingBuffer(10, 1), fenetres=(10, 60))
+    serie = pd.Series(valeurs, index=pd.to_datetime(temps, unit="s")).dropna()
+    for k, (t, valeur) in enumerate(zip(temps, valeurs)):
+        statistiques.add(t, valeur)
+        if k % 500 != 499:
+            continue
+        # comme update : les fenetres se vident aussi sans nouvelle mesure
+        for fenetre in statistiques.fenetres:
+            fenetre.evict(t)
+        resume = statistiques.summary()
+        for libelle, duree in (("10 s", 10), ("1 min", 60)):
+            fenetre = serie[(serie.index > pd.to_datetime(t - duree, unit="s")) & (serie.index <= pd.to_datetime(t, unit="s"))]
+            assert resume[libelle]["nombre"] == len(fenetre)
+            assert resume[libelle]["moyenne"] == pytest.approx(fenetre.mean(), rel=1e-9)
+            assert resume[libelle]["ecart_type"] == pytest.approx(fenetre.std(ddof=1), rel=1e-6, nan_ok=True)
+            assert resume[libelle]["maximum"] == fenetre.max()
+        session = serie[: pd.to_datetime(t, unit="s")]
+        assert resume["session"]["nombre"] == len(session)
+        assert resume["session"]["moyenne"] == pytest.approx(session.mean(), rel=1e-12)
+        assert resume["session"]["ecart_type"] == pytest.approx(session.std(ddof=1), rel=1e-12)
+        assert resume["session"]["maximum"] == session.max()
+        for centile in (50, 90, 99):
+            # e une demi-classe pres (centre de la classe)
+            assert abs(resume["session"][f"p{centile}"] - np.percentile(session, centile, method="inverted_cdf")) <= 0.5
+
+
+def test_session_memory_is_constant():
+    session = SessionStats()
+    for k in range(10000):
+        session.add(float(k), float(k % 100))
+    assert len(session) == 10000
+    assert not any(isinstance(valeur, (list, tuple, dict)) or hasattr(valeur, "append") for valeur in vars(session).values())
+    assert session.ecart_type == pytest.approx(np.std(np.arange(10000) % 100, ddof=1))
+
+
+def test_standard_deviation_needs_two_measurements():
+    fenetre, session = RollingWindow(10), SessionStats()
+    for statistiques in (fenetre, session):
+        assert math.isnan(statistiques.moyenne) and math.isnan(statistiques.maximum)
+        statistiques.add(0.0, 5.0)
+        assert statistiques.moyenne == 5.0 and math.isnan(statistiques.ecart_type)
+        statistiques.add(0.1, 7.0)
+        assert statistiques.ecart_type == pytest.approx(math.sqrt(2))
+
+
+def test_impulse_and_work():
+    statistiques = LiveStats(RingBuffer(10, 1), vitesse_avancement=3.6)
+    for t, valeur in ((0.0, 10.0), (1.0, 20.0), (2.0, math.nan), (3.0, 20.0), (20.0, 100.0)):
+        statistiques.add(t, valeur)
+    # trapezes 0-1 s et 1-3 s (la mesure NaN est ignoree), l'ecart de 17 s n'est pas compte
+    assert statistiques.impulsion == pytest.approx(15.0 + 40.0)
+    assert statistiques.travail == pytest.approx(55.0 * 9.81)
+
+
+def test_smooth_matches_pandas():
+    statistiques = LiveStats(RingBuffer(10, 1), lissage=4)
+    valeurs = np.arange(10, dtype=np.float64) ** 2
+    np.testing.assert_allclose(statistiques.smooth(valeurs), pd.Series(valeurs).rolling(4).mean().dropna())
+    assert len(statistiques.smooth(valeurs[:3])) == 0
+
+
+def test_update_reads_buffer():
+    tampon = RingBuffer(4, 2)
+    statistiques = LiveStats(tampon, colonne=1)
+    for k in range(6):
+        tampon.append(1e12 + k, (k, 10 * k))
+    assert statistiques.update() == 4
+    assert statistiques.nb_perdues == 2
+    assert statistiques.summary()["session"]["maximum"] == 50
+
+
+def test_histogram_sketch():
+    histogramme = HistogramSketch(0, 10, 1)
+    for valeur in (0.2, 1.5, 1.7, 9.9, 50):
+        histogramme.add(valeur)
+    histogramme.remove(0.2)
+    assert histogramme.quantiles([0.5, 1.0]).tolist() == [1.5, 9.5]
+    with pytest.raises(ValueError):
+        HistogramSketch(0, 10, 0)
+
+
+def test_livestats_import_leaves_sys_path():
+    # utils.moving_average est importe depuis le dossier parent, sans modifier sys.path
+    code = (
+        "import os, sys; chemins = list(sys.path); import livestats, utils; assert sys.path == chemins; "
+        "assert livestats.moving_average is utils.moving_average; "
+        f"assert os.path.samefile(utils.__file__, {os.path.join(RACINE, 'utils.py')!r})"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.join(RACINE, "DataRealTime"), check=True)
+
+
+def test_smooth_uses_moving_average():
+    import utils
+
+    statistiques = LiveStats(RingBuffer(10, 1), lissage=3)
+    valeurs = np.random.default_rng(4).normal(size=50)
+    np.testing.assert_array_equal(statistiques.smooth(valeurs), utils.moving_average(valeurs, 3, mode="valid"))
+    # mode "same" (par defaut) inchange
+    np.testing.assert_allclose(utils.moving_average([1, 2, 3, 4], 2), [0.5, 1.5, 2.5, 3.5])
@@ -0,0 +1,39 @@
+import glob
+import io
+import os
+import zipfile
+import pandas as pd
+import pytest
+from data_processing import load_datafficheur_file
+from utils import calcul_nom_colonne, find_archive_members, read_row_datetime
+
+ARCHIVES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(__file__)), "data_test", "*.zip")))
+
+
+def load_datafficheur_file_reference(contenu):
+    """
+    Lecture d'origine d'un fichier brut (MultiIndex, stack et un strptime par echantillon),
+    reference du parseur vectorise.
+    """
+    datas_fichier = pd.read_csv(io.BytesIO(contenu), header=None)
+    datas_fichier.set_index([0, 1, 2], inplace=True)
+    datas_fichier.columns = pd.MultiIndex.from_tuples(
+        map(calcul_nom_colonne, range(len(datas_fichier.columns)))
+    )
+    datas_fichier = datas_fichier.stack(level=0, future_stack=False)
+    datas_fichier.index = [read_row_datetime(row) for row in datas_fichier.index]
+    return datas_fichier
+
+
+# la reference utilise l'ancienne implementation de stack, depreciee
+@pytest.mark.filterwarnings("ignore:The previous implementation of stack:FutureWarning")
+@pytest.mark.parametrize("chemin", ARCHIVES, ids=os.path.basename)
+def test_parser_parity(chemin):
+    with zipfile.ZipFile(chemin) as archive:
+        membres = find_archive_members(archive)
+        assert membres
+        for membre in membres:
+            contenu = archive.read(membre)
+            attendu = load_datafficheur_file_reference(contenu)
+            obtenu = load_datafficheur_file(membre, contenu=contenu)
+            pd.testing.assert_frame_equal(obtenu, attendu, obj=membre)
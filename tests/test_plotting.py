@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from plotting import decimate_minmax, minmax_positions
+
+
+def reference_positions(temps, valeurs, nb_pixels, debut, fin):
+    # premiere position du minimum et du maximum de chaque intervalle (NaN ignores,
+    # premier NaN d'un intervalle entierement vide), par groupby
+    intervalle = np.clip((temps - debut) * (nb_pixels / max(fin - debut, 1)), 0, nb_pixels - 1).astype(np.int64)
+    serie = pd.Series(valeurs.astype(np.float64))
+    positions = set()
+    for _, groupe in serie.groupby(intervalle):
+        if groupe.isna().all():
+            positions.add(groupe.index[0])
+        else:
+            positions.update((groupe.idxmin(), groupe.idxmax()))
+    return np.array(sorted(positions))
+
+
+@pytest.fixture
+def mesures():
+    # 10 Hz irregulier sur 2 h, une interruption de 10 min, des NaN et des paliers (valeurs egales)
+    generateur = np.random.default_rng(5)
+    ecarts = generateur.integers(50, 150, 72000) * 1_000_000
+    ecarts[30000] = 600 * 1_000_000_000
+    temps = 1661094000 * 1_000_000_000 + np.cumsum(ecarts)
+    valeurs = generateur.integers(0, 400, len(temps)).astype(np.float64)
+    valeurs[generateur.random(len(temps)) < 0.05] = np.nan
+    valeurs[40000:41000] = np.nan
+    valeurs[50000:52000] = 120
+    return temps, valeurs
+
+
+@pytest.mark.parametrize("nb_pixels", [1, 7, 1920, 30000])
+def test_minmax_positions_keep_every_extremum(mesures, nb_pixels):
+    temps, valeurs = mesures
+    positions = minmax_positions(temps, valeurs, nb_pixels)
+    np.testing.assert_array_equal(positions, reference_positions(temps, valeurs, nb_pixels, temps[0], temps[-1]))
+    assert len(positions) <= 2 * nb_pixels
+    assert (np.diff(positions) > 0).all()
+
+
+def test_minmax_positions_bounds(mesures):
+    # axe plus large que les donnees, ou plus court : les echantillons hors de l'axe
+    # tombent dans le premier ou le dernier intervalle
+    temps, valeurs = mesures
+    for debut, fin in ((temps[0] - 10**12, temps[-1] + 10**12), (temps[1000], temps[-1000])):
+        positions = minmax_positions(temps, valeurs, 500, debut, fin)
+        np.testing.assert_array_equal(positions, reference_positions(temps, valeurs, 500, debut, fin))
+    # un seul instant : duree nulle
+    assert minmax_positions(np.full(3, temps[0]), np.array([2.0, 1.0, 3.0]), 10).tolist() == [1, 2]
+
+
+def test_minmax_positions_by_blocks(mesures):
+    # avec les bornes de la session, reduire des blocs puis leur concatenation donne l'enveloppe entiere
+    temps, valeurs = mesures
+    debut, fin = temps[0], temps[-1]
+    retenues = np.concatenate([
+        k + minmax_positions(temps[k : k + 9000], valeurs[k : k + 9000], 800, debut, fin)
+        for k in range(0, len(temps), 9000)
+    ])
+    positions = retenues[minmax_positions(temps[retenues], valeurs[retenues], 800, debut, fin)]
+    np.testing.assert_array_equal(positions, minmax_positions(temps, valeurs, 800, debut, fin))
+
+
+def test_decimate_minmax(mesures):
+    temps, valeurs = mesures
+    index = temps.view("datetime64[ns]")
+    x, y = decimate_minmax(index, valeurs, 1920)
+    positions = minmax_positions(temps, valeurs, 1920)
+    np.testing.assert_array_equal(x, index[positions])
+    np.testing.assert_array_equal(y, valeurs[positions])
+    assert np.nanmax(y) == np.nanmax(valeurs) and np.nanmin(y) == np.nanmin(valeurs)
+    # deje assez court : inchange
+    x, y = decimate_minmax(index[:100], valeurs[:100], 50)
+    np.testing.assert_array_equal(x, index[:100])
+    np.testing.assert_array_equal(y, valeurs[:100])
+    with pytest.raises(ValueError):
+        decimate_minmax(index, valeurs, 0)
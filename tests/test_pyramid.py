@@ -0,0 +1,141 @@
+import glob
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+import datafficheur
+import pyramid
+import store
+from conftest import DATA_TEST, full_session, write_session
+from constants import OUTPUTPYRAMIDE
+from pyramid import (
+    PYRAMIDE_CLES,
+    append_pyramid,
+    build_pyramid,
+    discard_appended_pyramid,
+    load_pyramid,
+    load_view,
+    pyramid_path,
+    query_pyramid,
+    save_appended_pyramid,
+)
+
+ARCHIVES = ["Burdignes-15h14-16h10-en-double.zip", "2023-05-30-Marianne.zip"]
+
+
+def assert_pyramid_equal(pyramide, attendue):
+    assert pyramide["noms"] == attendue["noms"]
+    assert [n["pas"] for n in pyramide["niveaux"]] == [n["pas"] for n in attendue["niveaux"]]
+    for niveau, niveau_attendu in zip(pyramide["niveaux"], attendue["niveaux"]):
+        for cle in PYRAMIDE_CLES:
+            assert niveau[cle].dtype == niveau_attendu[cle].dtype, cle
+            np.testing.assert_array_equal(niveau[cle], niveau_attendu[cle], err_msg=cle)
+
+
+@pytest.fixture(scope="module")
+def efforts(tmp_path_factory):
+    # 2 h de session preparee, avec des minutes absentes et des NaN (float32)
+    dossier = tmp_path_factory.mktemp("session")
+    write_session(dossier, "2022-08-21 23:10:00", 120, doubles=range(0, 120, 7), vides=range(0, 120, 5),
+                  absentes=range(3, 120, 17), recouvrement=None, notes=False)
+    return full_session(str(dossier))
+
+
+@pytest.fixture(scope="module")
+def efforts_entiers(tmp_path_factory):
+    # meme duree sans valeur manquante : efforts entiers (int16)
+    dossier = tmp_path_factory.mktemp("entiers")
+    write_session(dossier, "2022-08-21 23:10:00", 120, doubles=(), vides=(), recouvrement=None, notes=False)
+    return full_session(str(dossier))
+
+
+@pytest.mark.parametrize("taille", [1, 7, 600, 10**6])
+def test_append_pyramid_equals_build_pyramid(tmp_path, efforts, taille):
+    df = efforts
+    etat = None
+    for k in range(0, len(df), taille * 10):
+        etat = append_pyramid(etat, build_pyramid(df.iloc[k : k + taille * 10]), str(tmp_path))
+    save_appended_pyramid(etat, str(tmp_path / "pyramide.npz"), lignes_par_lecture=100)
+
+    assert os.listdir(tmp_path) == ["pyramide.npz"]
+    assert_pyramid_equal(load_pyramid(str(tmp_path / "pyramide.npz")), build_pyramid(df))
+
+
+def test_append_pyramid_widens_dtype(tmp_path, efforts_entiers):
+    # le type des efforts peut changer d'un bloc e l'autre (prepare_data)
+    df = efforts_entiers
+    premier, second = df.iloc[:30000].astype(np.int16), df.iloc[30000:].astype(np.int32)
+    etat = append_pyramid(None, build_pyramid(premier), str(tmp_path))
+    etat = append_pyramid(etat, build_pyramid(second))
+    save_appended_pyramid(etat, str(tmp_path / "pyramide.npz"))
+
+    pyramide = load_pyramid(str(tmp_path / "pyramide.npz"))
+    assert_pyramid_equal(pyramide, build_pyramid(pd.concat([premier.astype(np.int32), second])))
+
+
+def test_append_pyramid_rejects_earlier_block(tmp_path, efforts):
+    df = efforts
+    etat = append_pyramid(None, build_pyramid(df.iloc[1000:]), str(tmp_path))
+    with pytest.raises(ValueError):
+        append_pyramid(etat, build_pyramid(df.iloc[:1000]))
+    with pytest.raises(ValueError):
+        append_pyramid(etat, build_pyramid(df.iloc[:, :2]))
+    discard_appended_pyramid(etat)
+    assert os.listdir(tmp_path) == []
+
+
+def test_pyramid_mean_matches_resample(efforts):
+    df = efforts
+    pas, vue = query_pyramid(build_pyramid(df), nb_pixels=100)
+    assert pas == 60
+    attendu = df.droplevel(1, axis=1).resample("60s").agg(["min", "max", "mean"]).dropna(how="all")
+    for capteur in df.columns.get_level_values(0):
+        nom = str(capteur)
+        np.testing.assert_array_equal(vue[(nom, "minimum")], attendu[(capteur, "min")])
+        np.testing.assert_array_equal(vue[(nom, "maximum")], attendu[(capteur, "max")])
+        np.testing.assert_allclose(vue[(nom, "moyenne")], attendu[(capteur, "mean")], rtol=1e-6)
+
+
+@pytest.mark.parametrize("archive", ARCHIVES)
+def test_stream_pyramid_equals_in_memory(tmp_path, archive):
+    pyramides = {}
+    for stream in (False, True):
+        dossier = tmp_path / ("flux" if stream else "memoire")
+        dossier.mkdir()
+        shutil.copy(os.path.join(DATA_TEST, archive), dossier)
+        datafficheur.main(
+            str(dossier / archive), False, "note.csv", False, False, None, "Europe/Paris", "sortie.csv",
+            cache=False, resume=False, pyramide=True, stream=stream, taille_bloc=7,
+        )
+        (chemin,) = glob.glob(str(dossier / f"*_{OUTPUTPYRAMIDE}_*.npz"))
+        pyramides[stream] = load_pyramid(chemin)
+        # aucun fichier temporaire ne reste e cote de la session
+        assert sorted(os.listdir(dossier)) == sorted([archive, os.path.basename(chemin)] + [
+            os.path.basename(f) for f in glob.glob(str(dossier / "*_sortie.csv"))
+        ])
+    assert_pyramid_equal(pyramides[True], pyramides[False])
+
+
+def test_load_view_writes_only_in_cache(tmp_path, monkeypatch):
+    cache = str(tmp_path / "cache")
+    monkeypatch.setattr(pyramid, "CACHE_DIR", cache)
+    monkeypatch.setattr(store, "CACHE_DIR", cache)
+    donnees = tmp_path / "donnees"
+    dossier = donnees / "session"
+    write_session(dossier, "2022-08-21 23:10:00", 30, recouvrement=None, notes=False)
+    shutil.copy(os.path.join(DATA_TEST, ARCHIVES[1]), donnees)
+    for session in (str(dossier), str(donnees / ARCHIVES[1])):
+        contenu = sorted(os.listdir(donnees)), sorted(os.listdir(dossier))
+        attendue = query_pyramid(build_pyramid(full_session(session)), nb_pixels=10)
+        for _ in range(2):
+            # construite puis relue depuis le cache
+            pas, vue = load_view(session, nb_pixels=10)
+            assert pas == attendue[0]
+            pd.testing.assert_frame_equal(vue, attendue[1])
+        assert len(glob.glob(pyramid_path(session, "*", cache=cache))) == 1
+        assert (sorted(os.listdir(donnees)), sorted(os.listdir(dossier))) == contenu
+
+    shutil.rmtree(cache)
+    load_view(str(dossier), nb_pixels=10, cache=False)
+    assert not os.path.exists(cache)
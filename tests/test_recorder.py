@@ -0,0 +1,68 @@
+import math
+import os
+from datetime import datetime
+import numpy as np
+from acquisition import RingBuffer
+from data_processing import load_datafficheur_files, merge_datafficheur_frames
+from recorder import Recorder
+from utils import find_files
+
+# une seconde entiere, pour que chaque mesure tombe au milieu de son dixieme
+DEBUT = 1661094000.0
+
+
+def load_column(dossier):
+    # echantillons d'un sous-dossier enregistre, relus comme une session du Datafficheur
+    frames, erreurs = load_datafficheur_files(find_files(dossier))
+    assert not erreurs
+    datas, _ = merge_datafficheur_frames(frames)
+    return datas.iloc[:, 0]
+
+
+def record(tmp_path, mesures):
+    enregistreur = Recorder(RingBuffer(10, 2), str(tmp_path))
+    for temps, mesure in mesures:
+        enregistreur.write_sample(temps, mesure)
+    enregistreur.flush_row()
+    enregistreur.close()
+    return enregistreur
+
+
+def test_round_trip_through_datafficheur(tmp_path):
+    tampon = RingBuffer(1000, 2)
+    enregistreur = Recorder(tampon, str(tmp_path))
+    enregistreur.start()
+    # 30 s de mesures e 10 Hz de part et d'autre d'un changement de minute
+    temps = DEBUT + 45 + np.arange(300) * 0.1 + 0.05
+    for k, t in enumerate(temps):
+        tampon.append(t, (k, 2 * k))
+    enregistreur.stop(5)
+
+    assert enregistreur.nb_mesures == 300 and enregistreur.nb_collisions == 0
+    assert sorted(os.listdir(tmp_path / "Moy")) == [
+        datetime.fromtimestamp(DEBUT + 45).strftime("%m%d%H%M.TXT"),
+        datetime.fromtimestamp(DEBUT + 60).strftime("%m%d%H%M.TXT"),
+    ]
+    moy, max = load_column(str(tmp_path / "Moy")), load_column(str(tmp_path / "Max"))
+    assert moy.tolist() == list(range(300)) and max.tolist() == [2 * k for k in range(300)]
+    attendu = [datetime.fromtimestamp(math.floor(t * 10) / 10) for t in temps]
+    assert list(moy.index.to_pydatetime()) == attendu
+
+
+def test_nan_values(tmp_path):
+    enregistreur = record(
+        tmp_path,
+        [
+            (DEBUT + 0.05, [math.nan, 7.0]), # Moy NaN, Max valide : enregistree
+            (DEBUT + 0.07, [3.0, 4.0]), # meme dixieme : collision, meme si Moy est vide
+            (DEBUT + 0.15, [math.nan, math.nan]), # ignoree
+            (DEBUT + 0.17, [5.0, 6.0]), # le dixieme est libre
+            (DEBUT + 0.25, [8.0, math.nan]),
+        ],
+    )
+    assert enregistreur.nb_mesures == 3 and enregistreur.nb_collisions == 1
+    (nom,) = os.listdir(tmp_path / "Max")
+    with open(tmp_path / "Max" / nom) as fichier:
+        assert fichier.read().split(",")[3:6] == ["7", "6", ""]
+    with open(tmp_path / "Moy" / nom) as fichier:
+        assert fichier.read().split(",")[3:6] == ["", "5", "8"]
@@ -0,0 +1,95 @@
+import os
+import subprocess
+import sys
+import zipfile
+import numpy as np
+import pytest
+from acquisition import RingBuffer, SerialReader, parse_line
+from data_processing import load_datafficheur_files, merge_datafficheur_frames, prepare_data
+from recorder import Recorder
+from sources import PtySimulator, ReplaySource, format_line, load_replay
+from utils import find_archive_members
+
+RACINE = os.path.dirname(os.path.dirname(__file__))
+DATA_TEST = os.path.join(RACINE, "data_test")
+
+
+def reference_replay(chemin):
+    # moyenne et maximum de chaque groupe de 10 echantillons du Total de datafficheur.py
+    with zipfile.ZipFile(chemin) as archive:
+        frames, _ = load_datafficheur_files(find_archive_members(archive), archive=archive)
+    total = prepare_data(merge_datafficheur_frames(frames)[0])[("Total", "Efforts")]
+    n = len(total) // 10 * 10
+    groupes = total.to_numpy(np.float64)[:n].reshape(-1, 10)
+    temps = total.index.to_numpy(dtype="datetime64[ns]").view("int64")[9:n:10] / 1e9
+    return temps, np.column_stack((groupes.mean(axis=1), groupes.max(axis=1)))
+
+
+@pytest.mark.parametrize("archive", ["Burdignes-15h14-16h10-en-double.zip", "2023-05-30-Marianne.zip"])
+def test_load_replay_matches_datafficheur(archive):
+    temps, valeurs = load_replay(os.path.join(DATA_TEST, archive))
+    temps_attendus, valeurs_attendues = reference_replay(os.path.join(DATA_TEST, archive))
+    np.testing.assert_array_equal(temps, temps_attendus)
+    np.testing.assert_allclose(valeurs, valeurs_attendues)
+
+
+def test_load_replay_recording(tmp_path):
+    enregistreur = Recorder(RingBuffer(10, 2), str(tmp_path))
+    debut = 1661094000.0
+    for k in range(25):
+        enregistreur.write_sample(debut + k * 0.1 + 0.05, [k, np.nan if k == 3 else 2 * k])
+    enregistreur.flush_row()
+    enregistreur.close()
+
+    temps, valeurs = load_replay(str(tmp_path))
+    np.testing.assert_allclose(np.diff(temps), 0.1, atol=1e-6)
+    assert valeurs[:, 0].tolist() == list(range(25))
+    np.testing.assert_array_equal(valeurs[:, 1], [np.nan if k == 3 else 2 * k for k in range(25)])
+
+
+def test_load_replay_empty(tmp_path):
+    with pytest.raises(ValueError):
+        load_replay(str(tmp_path))
+
+
+def test_sources_import_is_light():
+    # ni pandas ni les modules de datafficheur.py, sans modifier sys.path
+    code = (
+        "import sys; chemins = list(sys.path); import sources; "
+        "assert sys.path == chemins; assert not {'pandas', 'data_processing', 'utils'} & set(sys.modules)"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.join(RACINE, "DataRealTime"), check=True)
+
+
+def test_format_line_round_trip():
+    for moy, max in ((12.5, 30.0), (0.0, -1.25), (123456.0, 7.0)):
+        assert parse_line(format_line(moy, max)) == (moy, max)
+
+
+def test_replay_source():
+    source = ReplaySource([0.0, 0.1, 0.2], [[1, 2], [3, 4], [5, 6]], vitesse=0, timeout=0.01)
+    lignes = [source.readline() for _ in range(4)]
+    assert [parse_line(ligne) for ligne in lignes[:3]] == [(1, 2), (3, 4), (5, 6)]
+    assert lignes[3] == b"" and source.fin
+    assert not np.isnan(source.envois).any()
+
+
+def test_pty_simulator_through_serial_reader():
+    temps = np.arange(200) * 0.001
+    valeurs = np.column_stack((np.arange(200), np.arange(200) % 7))
+    simulateur = PtySimulator(temps, valeurs, vitesse=0)
+    port = simulateur.port(timeout=0.05)
+    tampon = RingBuffer(1000, 2)
+    lecteur = SerialReader(port, tampon)
+    lecteur.start()
+    simulateur.start()
+    tampon_total = 0
+    for _ in range(100):
+        tampon_total = tampon.wait(199, timeout=0.05)
+        if tampon_total >= 200:
+            break
+    lecteur.stop(5)
+    port.close()
+    simulateur.stop(5)
+    assert lecteur.erreur is None and lecteur.nb_erreurs == 0
+    assert tampon.last(200)[1].tolist() == valeurs.tolist()
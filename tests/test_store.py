@@ -0,0 +1,70 @@
+import os
+import shutil
+import pandas as pd
+import pytest
+from conftest import DATA_TEST, full_session, write_raw_file
+import store
+from store import index_path, load_range, read_index
+
+PLAGES = [
+    (None, None),
+    ("2022-08-21 23:57", "2022-08-21 23:58"),
+    ("2022-08-21 23:54", "2022-08-21 23:55:30"),
+    ("2022-08-21 23:59:45", "2022-08-22 00:00:05.3"),
+    (pd.Timestamp("2022-08-22 00:00:10"), None),
+    ("2022-08-23", None),
+]
+
+
+@pytest.mark.parametrize("start, end", PLAGES)
+def test_load_range_equals_full_session(synthetic, start, end):
+    attendu = full_session(synthetic).loc[start:end]
+    pd.testing.assert_frame_equal(load_range(synthetic, start, end, cache=False), attendu, check_freq=False)
+
+
+def test_load_range_action(synthetic):
+    complet = full_session(synthetic)
+    attendu = complet[complet[("action", "")] == "virage"]
+    pd.testing.assert_frame_equal(load_range(synthetic, action="virage", cache=False), attendu, check_freq=False)
+    with pytest.raises(ValueError):
+        load_range(synthetic, action="inconnue", cache=False)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    dossier = str(tmp_path / "cache")
+    monkeypatch.setattr(store, "CACHE_DIR", dossier)
+    return dossier
+
+
+def test_index_follows_modified_files(synthetic, cache):
+    fichiers = sorted(os.listdir(synthetic))
+    load_range(synthetic)
+    assert len(read_index(index_path(synthetic, cache))) == 8
+    # l'index est dans le cache, rien n'est ecrit dans le dossier des donnees
+    assert sorted(os.listdir(synthetic)) == fichiers
+
+    write_raw_file(synthetic, "2022-08-22 00:03:00", [[7] * 10] * 60)
+    os.remove(os.path.join(synthetic, "08212355.TXT"))
+    attendu = full_session(synthetic).loc["2022-08-21 23:59":]
+    pd.testing.assert_frame_equal(load_range(synthetic, "2022-08-21 23:59"), attendu, check_freq=False)
+    assert len(read_index(index_path(synthetic, cache))) == 8
+
+
+def test_index_without_cache(synthetic, cache):
+    load_range(synthetic, cache=False)
+    assert not os.path.exists(cache)
+
+
+@pytest.mark.parametrize("archive", ["Burdignes-15h14-16h10-en-double.zip", "2023-05-30-Marianne.zip"])
+def test_load_range_archive(tmp_path, cache, archive):
+    shutil.copy(os.path.join(DATA_TEST, archive), tmp_path)
+    chemin = str(tmp_path / archive)
+    complet = full_session(chemin)
+    milieu = complet.index[len(complet) // 2]
+    for start, end in ((None, None), (milieu - pd.Timedelta("90s"), milieu + pd.Timedelta("2min"))):
+        pd.testing.assert_frame_equal(
+            load_range(chemin, start, end), complet.loc[start:end], check_freq=False
+        )
+    assert os.path.exists(index_path(chemin, cache))
+    assert sorted(os.listdir(tmp_path)) == sorted([archive, "cache"])
@@ -0,0 +1,72 @@
+import glob
+import os
+import tracemalloc
+import numpy as np
+import pytest
+import datafficheur
+from conftest import DATA_TEST, copy_session, write_session
+from constants import OUTPUTPYRAMIDE, OUTPUTRESUME
+
+OUTPUT = "sortie.csv"
+
+
+def run_session(dir, **options):
+    # sorties (CSV, resume, pyramide) de datafficheur.main sur une session
+    datafficheur.main(str(dir), os.path.exists(os.path.join(dir, "note.csv")), "note.csv", False, False, None,
+                      "Europe/Paris", OUTPUT, cache=False, resume=True, pyramide=True, **options)
+    dossier = os.path.dirname(dir) if str(dir).endswith(".zip") else str(dir)
+    sorties = {}
+    for cle, motif in (("csv", "*_" + OUTPUT), ("resume", f"*_{OUTPUTRESUME}_*.npz"), ("pyramide", f"*_{OUTPUTPYRAMIDE}_*.npz")):
+        (chemin,) = glob.glob(os.path.join(dossier, motif))
+        sorties[cle] = chemin
+    return sorties
+
+
+def assert_same_outputs(flux, memoire):
+    assert os.path.basename(flux["csv"]) == os.path.basename(memoire["csv"])
+    with open(flux["csv"], "rb") as a, open(memoire["csv"], "rb") as b:
+        assert a.read() == b.read()
+    for cle in ("resume", "pyramide"):
+        with np.load(flux[cle]) as a, np.load(memoire[cle]) as b:
+            assert sorted(a.files) == sorted(b.files)
+            for nom in a.files:
+                if a[nom].dtype.kind == "f":
+                    # sommes des moments : l'ordre des additions change l'arrondi
+                    np.testing.assert_allclose(a[nom], b[nom], rtol=1e-12, err_msg=f"{cle} {nom}")
+                else:
+                    np.testing.assert_array_equal(a[nom], b[nom], err_msg=f"{cle} {nom}")
+
+
+@pytest.mark.parametrize("taille", [2, 7])
+@pytest.mark.parametrize("archive", ["Burdignes-15h14-16h10-en-double.zip", "23-05-31-Dalton-buttoir.zip"])
+def test_stream_equals_in_memory(tmp_path, archive, taille):
+    memoire = run_session(copy_session(tmp_path, os.path.join(DATA_TEST, archive), "memoire"))
+    flux = run_session(copy_session(tmp_path, os.path.join(DATA_TEST, archive), "flux"), stream=True, taille_bloc=taille)
+    assert_same_outputs(flux, memoire)
+
+
+@pytest.mark.parametrize("taille", [1, 2, 3])
+def test_stream_equals_in_memory_synthetic(tmp_path, synthetic, taille):
+    memoire = run_session(copy_session(tmp_path, synthetic, "memoire"))
+    flux = run_session(copy_session(tmp_path, synthetic, "flux"), stream=True, taille_bloc=taille)
+    assert_same_outputs(flux, memoire)
+    with open(flux["csv"]) as fichier:
+        contenu = fichier.read()
+    assert "labour" in contenu and "virage" in contenu
+
+
+def peak_memory(dir, minutes, **options):
+    # pic de memoire (octets) du traitement d'une session de minutes fichiers
+    write_session(dir, "2022-08-21 10:00:00", minutes, doubles=(), vides=(), recouvrement=None, notes=False)
+    tracemalloc.start()
+    try:
+        run_session(dir, **options)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_stream_memory_does_not_grow_with_duration(tmp_path):
+    pic_court = peak_memory(tmp_path / "courte", 30, stream=True, taille_bloc=10)
+    pic_long = peak_memory(tmp_path / "longue", 240, stream=True, taille_bloc=10)
+    assert pic_long < 1.5 * pic_court
@@ -0,0 +1,146 @@
+import glob
+import os
+import zipfile
+import pandas as pd
+import pytest
+import datafficheur
+from conftest import DATA_TEST, write_raw_file
+import watch as surveillance
+from watch import merge_new_datas
+
+ARCHIVE = os.path.join(DATA_TEST, "Burdignes-15h14-16h10-en-double.zip")
+OUTPUT = "sortie.csv"
+
+
+def run_watch(dir, etapes):
+    """
+    Lance la surveillance de dir : chaque etape modifie le dossier entre deux passages,
+    puis la surveillance s'arrete (Ctrl+C).
+    """
+    etapes = list(etapes)
+
+    def sleep(_):
+        if not etapes:
+            raise KeyboardInterrupt
+        etapes.pop(0)()
+
+    ancien_sleep = surveillance.time.sleep
+    surveillance.time.sleep = sleep
+    try:
+        return surveillance.watch(str(dir), "note.csv", OUTPUT)
+    finally:
+        surveillance.time.sleep = ancien_sleep
+
+
+def one_shot_csv(dir):
+    # CSV du traitement unique des memes fichiers
+    datafficheur.main(str(dir), False, "note.csv", False, False, None, "Europe/Paris", OUTPUT, cache=False, resume=False, pyramide=False)
+    (chemin,) = glob.glob(os.path.join(dir, "*_" + OUTPUT))
+    return chemin
+
+
+@pytest.fixture
+def minutes():
+    with zipfile.ZipFile(ARCHIVE) as archive:
+        return {os.path.basename(m): archive.read(m) for m in archive.namelist() if m.endswith(".TXT")}
+
+
+@pytest.mark.parametrize("coupure", [b"695,21/08/2022,15:15:57,11,1", b"695,21/08/2022,15:15:57,11,"])
+def test_file_cut_mid_value(tmp_path, minutes, coupure):
+    surveille, reference = tmp_path / "surveille", tmp_path / "reference"
+    surveille.mkdir()
+    reference.mkdir()
+    contenu = minutes["08211515.TXT"]
+    fin = contenu.index(coupure) + len(coupure)
+    (surveille / "08211514.TXT").write_bytes(minutes["08211514.TXT"])
+    (surveille / "08211515.TXT").write_bytes(contenu[:fin])
+    run_watch(
+        surveille,
+        [
+            lambda: (surveille / "08211515.TXT").write_bytes(contenu),
+            lambda: (surveille / "08211516.TXT").write_bytes(minutes["08211516.TXT"]),
+        ],
+    )
+    for nom in ("08211514.TXT", "08211515.TXT", "08211516.TXT"):
+        (reference / nom).write_bytes(minutes[nom])
+
+    (chemin,) = glob.glob(str(surveille / ("*_" + OUTPUT)))
+    with open(chemin) as fichier:
+        lignes = fichier.readlines()
+    assert sum(",15:15:57.1," in ligne for ligne in lignes) == 1
+    with open(one_shot_csv(reference)) as fichier:
+        assert lignes == fichier.readlines()
+
+
+def test_session_crossing_midnight(tmp_path):
+    write_raw_file(tmp_path, "2022-08-21 23:59:58", [[5] * 10, [6] * 10])
+    run_watch(tmp_path, [lambda: write_raw_file(tmp_path, "2022-08-22 00:00:00", [[7] * 10])])
+    assert sorted(os.path.basename(c) for c in glob.glob(str(tmp_path / ("*_" + OUTPUT)))) == [
+        "2022-08-21 - 2022-08-22_" + OUTPUT
+    ]
+
+
+def test_merge_new_datas_modified_sample_is_not_an_append():
+    # le dernier echantillon ecrit (ligne partielle) est relu avec sa valeur complete
+    index = pd.date_range("2022-08-21 15:15:57", periods=3, freq="100ms")
+    datas = pd.DataFrame({1: [11.0, 10.0, 1.0]}, index=index)
+    proprietaires = pd.Series("08211515.TXT", index=index, dtype=object)
+    nouveaux = pd.DataFrame({1: [10.0, 9.0, 8.0]}, index=index[1:].append(index[-1:] + pd.Timedelta("100ms")))
+    fusion, proprietaires, ajouts, en_fin = merge_new_datas(datas, proprietaires, [("08211515.TXT", nouveaux)], {"08211515.TXT": 0})
+    assert not en_fin
+    assert list(ajouts[1]) == [9.0, 8.0]
+    assert list(fusion[1]) == [11.0, 10.0, 9.0, 8.0]
+    assert fusion.index.is_monotonic_increasing
+    assert proprietaires.index.equals(fusion.index)
+
+
+def test_merge_new_datas_keeps_earlier_file():
+    # un autre fichier ne remplace un echantillon que s'il le precede dans l'ordre de fusion
+    index = pd.date_range("2022-08-21 15:14:00", periods=2, freq="1s")
+    datas = pd.DataFrame({1: [5, 6]}, index=index)
+    proprietaires = pd.Series("b", index=index, dtype=object)
+    suivant = pd.DataFrame({1: [9, 9]}, index=index + pd.Timedelta("1s"))
+    fusion, proprietaires, ajouts, en_fin = merge_new_datas(datas, proprietaires, [("c", suivant)], {"a": 0, "b": 1, "c": 2})
+    assert en_fin and list(fusion[1]) == [5, 6, 9]
+    assert list(proprietaires) == ["b", "b", "c"]
+    precedent = pd.DataFrame({1: [1, 6]}, index=index)
+    fusion, proprietaires, ajouts, en_fin = merge_new_datas(fusion, proprietaires, [("a", precedent)], {"a": 0, "b": 1, "c": 2})
+    assert not en_fin and list(ajouts[1]) == [1]
+    assert list(fusion[1]) == [1, 6, 9]
+    assert list(proprietaires) == ["a", "a", "c"]
+
+
+@pytest.mark.parametrize("arrivees", [("08211514.TXT", "08211515.TXT"), ("08211514.TXT",), ("08211515.TXT",)])
+def test_overlapping_files(tmp_path, arrivees):
+    # 08211515.TXT commence e 15:14:01 : le doublon est celui de 08211514.TXT, qui commence plus tot
+    surveille, reference = tmp_path / "surveille", tmp_path / "reference"
+    for dossier in (surveille, reference):
+        dossier.mkdir()
+        write_raw_file(dossier, "2022-08-21 15:14:00", [[5] * 10, [6] * 10])
+        write_raw_file(dossier, "2022-08-21 15:14:01", [[9] * 10, [9] * 10], nom="08211515.TXT")
+    # arrivees : les fichiers deje presents au lancement, l'autre arrive au passage suivant
+    contenus = {nom: (surveille / nom).read_bytes() for nom in ("08211514.TXT", "08211515.TXT")}
+    etapes = []
+    for nom in contenus:
+        if nom not in arrivees:
+            (surveille / nom).unlink()
+            etapes.append(lambda nom=nom: (surveille / nom).write_bytes(contenus[nom]))
+    run_watch(surveille, etapes)
+
+    (chemin,) = glob.glob(str(surveille / ("*_" + OUTPUT)))
+    with open(chemin) as fichier:
+        lignes = fichier.readlines()
+    assert any(ligne.startswith("2022-08-21,15:14:01.0,6,") for ligne in lignes)
+    with open(one_shot_csv(reference)) as fichier:
+        assert lignes == fichier.readlines()
+
+
+@pytest.mark.parametrize("option", [["--jobs", "2"], ["--cache"], ["--no-cache"]])
+def test_watch_rejects_unused_options(tmp_path, option):
+    with pytest.raises(SystemExit):
+        datafficheur.run(["-d", str(tmp_path), "--watch", "--no-plot"] + option)
+
+
+def test_watch_rejects_archive():
+    with pytest.raises(SystemExit):
+        datafficheur.run(["-d", ARCHIVE, "--watch", "--no-plot"])
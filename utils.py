@@ -1,6 +1,12 @@
 import re
 import os
+import sys
+import zipfile
 from datetime import datetime
+import numpy as np
+
+# pandas n'est importe que par read_datetime_columns : utils reste leger pour la ligne
+# de commande (has_display) et les fonctions de recherche des fichiers
 
 
 def find_files(directory):
@@ -16,15 +22,83 @@ def find_files(directory):
         directory (str): Le chemin du dossier dans lequel chercher les fichiers.
 
     Returns:
-        list: Une liste contenant les noms de tous les fichiers correspondant e l'expression reguliere
+        list: Une liste triee contenant les noms de tous les fichiers correspondant e l'expression reguliere
         dans le dossier specifie. Si aucun fichier ne correspond, la fonction retourne une liste vide.
     """
     pattern = re.compile(r"[0-9]{8}.txt$", re.IGNORECASE)
     return [
-        os.path.join(directory, f) for f in os.listdir(directory) if pattern.match(f)
+        os.path.join(directory, f)
+        for f in sorted(os.listdir(directory))
+        if pattern.match(f)
     ]
 
 
+def is_archive(path):
+    """
+    Indique si le chemin designe une archive ZIP plutot qu'un dossier.
+
+    Args:
+        path (str): Le chemin e tester.
+
+    Returns:
+        bool: Vrai si path est un fichier ZIP.
+    """
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+
+def find_archive_members(archive):
+    """
+    Cherche et retourne une liste des membres d'une archive ZIP ouverte dont le nom
+    correspond e l'expression reguliere r'[0-9]{8}.txt$' (comme find_files).
+
+    L'index de l'archive est lu une seule fois e l'ouverture du zipfile.ZipFile :
+    cette fonction n'effectue aucune lecture supplementaire.
+
+    Args:
+        archive (zipfile.ZipFile): L'archive ouverte.
+
+    Returns:
+        list: Une liste des noms des membres correspondants, triee par nom de fichier.
+        Si aucun membre ne correspond, la fonction retourne une liste vide.
+    """
+    pattern = re.compile(r"[0-9]{8}.txt$", re.IGNORECASE)
+    membres = [
+        info.filename
+        for info in archive.infolist()
+        if not info.is_dir() and pattern.match(os.path.basename(info.filename))
+    ]
+    return sorted(membres, key=lambda membre: (os.path.basename(membre), membre))
+
+
+def find_archive_note(archive, note):
+    """
+    Cherche le fichier de notes dans une archive ZIP ouverte, e la racine ou dans un sous-dossier.
+
+    Args:
+        archive (zipfile.ZipFile): L'archive ouverte.
+        note (str): Le nom du fichier de notes.
+
+    Returns:
+        str: Le nom du membre correspondant, ou None s'il est absent.
+    """
+    for membre in archive.namelist():
+        if os.path.basename(membre) == note:
+            return membre
+    return None
+
+
+def has_display():
+    """
+    Indique si une fenetre graphique peut etre ouverte (serveur X ou Wayland sous Linux).
+
+    Returns:
+        bool: Faux sur un systeme de type Unix sans affichage (serveur de calcul, ssh).
+    """
+    if sys.platform.startswith(("win", "darwin")):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
 def read_row_datetime(row):
     """
     Reconstitue le datetime d'une ligne du fichier brut avec la date
@@ -35,6 +109,40 @@ def read_row_datetime(row):
     )
 
 
+def read_datetime_columns(dates, heures, frequence_acquisition=10):
+    """
+    Reconstitue en une seule operation les datetimes de toutes les lignes d'un
+    fichier brut avec la date (colonne 1) et l'heure (colonne 2), puis ajoute
+    les decisecondes de chaque echantillon.
+
+    Equivalent vectorise de read_row_datetime : les colonnes sont decodees en
+    tableaux entiers au lieu d'appeler datetime.strptime pour chaque echantillon.
+
+    Args:
+        dates (array-like of str): Les dates au format jj/mm/aaaa.
+        heures (array-like of str): Les heures au format hh:mm:ss.
+        frequence_acquisition (int): Nombre d'echantillons par seconde. Par defaut : 10.
+
+    Returns:
+        numpy.ndarray: Un tableau datetime64[ns] de forme (nombre de lignes, frequence_acquisition).
+
+    Raises:
+        ValueError: Si frequence_acquisition est negatif ou nul, ou si une date ne peut pas etre lue.
+    """
+    if frequence_acquisition <= 0:
+        raise ValueError("frequence_acquisition doit etre un entier positif.")
+    import pandas as pd
+
+    secondes = pd.to_datetime(
+        pd.Series(dates, dtype=str) + " " + pd.Series(heures, dtype=str),
+        format="%d/%m/%Y %H:%M:%S",
+    ).to_numpy(dtype="datetime64[ns]")
+    fractions = (np.arange(frequence_acquisition) * (10**9 // frequence_acquisition)).astype(
+        "timedelta64[ns]"
+    )
+    return secondes[:, np.newaxis] + fractions[np.newaxis, :]
+
+
 def calcul_nom_colonne(x, frequence_acquisition=10):
     """
     Calcule la fraction de seconde et le numero du capteur en fonction
@@ -60,13 +168,15 @@ def calcul_nom_colonne(x, frequence_acquisition=10):
     return (fraction_seconde, numero_capteur)
 
 
-def moving_average(x, w):
+def moving_average(x, w, mode="same"):
     """
     Calcule la moyenne mobile d'une liste de nombres.
 
     Args:
-        x (list of number): La liste de nombres sur laquelle calculer la moyenne mobile.
+        x (list or numpy.ndarray of number): La liste de nombres sur laquelle calculer la moyenne mobile.
         w (int): La taille de la fenetre de la moyenne mobile.
+        mode (str, optional): "same" : moyenne centree de meme longueur que x (bords completes par des zeros) ;
+            "valid" : moyenne des w dernieres valeurs, len(x) - w + 1 valeurs sans effet de bord. Par defaut : "same".
 
     Returns:
         numpy.array: Un array numpy contenant les valeurs de la moyenne mobile.
@@ -74,11 +184,12 @@ def moving_average(x, w):
     Raises:
         ValueError: Si w est zero ou negatif, ou si x est une liste vide.
     """
-    if not x:
+    x = np.asarray(x, dtype=np.float64)
+    if x.size == 0:
         raise ValueError("x ne peut pas etre une liste vide.")
     if w <= 0:
         raise ValueError("w doit etre un entier positif.")
     if w > len(x):
         raise ValueError("w ne peut pas etre plus grand que la longueur de x.")
 
-    return np.convolve(x, np.ones(w), mode="same") / w
+    return np.convolve(x, np.ones(w), mode=mode) / w
@@ -0,0 +1,247 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from data_processing import (
+    load_datafficheur_files,
+    merge_order,
+    add_notes,
+    prepare_data,
+    date_range_str,
+)
+from export import write_csv
+from stream import session_columns
+from utils import find_files
+
+
+def scan_files(dir, vus):
+    """
+    Liste les fichiers de donnees nouveaux ou modifies depuis le dernier passage.
+
+    Args:
+        dir (str): Le repertoire surveille.
+        vus (dict): Les (taille, date de modification) des fichiers deje lus, mis e jour par la fonction.
+
+    Returns:
+        list: Les chemins des fichiers nouveaux ou modifies, tries par nom.
+    """
+    modifies = []
+    for fichier in find_files(dir):
+        try:
+            stat = os.stat(fichier)
+        except FileNotFoundError:
+            continue
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if vus.get(fichier) != signature:
+            vus[fichier] = signature
+            modifies.append(fichier)
+    return modifies
+
+
+def merge_new_datas(datas, proprietaires, fichiers, rangs):
+    """
+    Fusionne les echantillons des fichiers nouveaux ou modifies dans le DataFrame trie et sans doublon deje en memoire.
+
+    Les doublons entre fichiers differents suivent la regle du traitement unique
+    (merge_order) : l'echantillon du fichier qui precede l'autre dans l'ordre de fusion est
+    conserve. Seul un fichier relu (en cours d'ecriture par exemple) remplace ses propres
+    echantillons : une ligne partielle relue avec ses valeurs completes est un echantillon
+    modifie, deje ecrit, un simple ajout en fin de fichier est alors impossible. Les
+    echantillons deje connus avec les memes valeurs sont ignores.
+
+    Args:
+        datas (pandas.DataFrame): Les donnees deje en memoire (triees, sans doublon), ou None.
+        proprietaires (pandas.Series): Le fichier de chaque echantillon de datas (meme index), ou None.
+        fichiers (list of tuple): Les couples (fichier, DataFrame) des fichiers nouveaux ou modifies, non vides.
+        rangs (dict): Le rang de chaque fichier deje lu dans l'ordre de fusion (voir merge_order).
+
+    Returns:
+        tuple: Un tuple (datas, proprietaires, ajouts, en_fin) ou datas est le DataFrame fusionne,
+        proprietaires le fichier de chacun de ses echantillons, ajouts les echantillons reellement
+        nouveaux ou modifies et en_fin vrai si aucun echantillon n'est modifie et si tous les
+        ajouts sont posterieurs aux donnees deje en memoire (ajout en fin de fichier possible).
+    """
+    # dans l'ordre de fusion, apres un tri stable, le premier echantillon de chaque instant l'emporte
+    nouveaux, origines = [], []
+    for fichier, frame in sorted(fichiers, key=lambda f: rangs[f[0]]):
+        # dans un meme fichier, le premier des doublons est conserve (merge_datafficheur_frames)
+        frame = frame.sort_index(kind="stable")
+        frame = frame[~frame.index.duplicated()]
+        nouveaux.append(frame)
+        origines.append(pd.Series(fichier, index=frame.index, dtype=object))
+    nouveaux, origines = pd.concat(nouveaux), pd.concat(origines)
+    ordre = np.argsort(nouveaux.index.to_numpy(), kind="stable")
+    nouveaux, origines = nouveaux.iloc[ordre], origines.iloc[ordre]
+    garder = ~nouveaux.index.duplicated()
+    nouveaux, origines = nouveaux[garder], origines[garder]
+    if datas is None or datas.empty:
+        return nouveaux, origines, nouveaux, True
+
+    # dernier echantillon deje ecrit, avant le retrait des echantillons modifies
+    dernier = datas.index[-1]
+    modifies = np.zeros(len(nouveaux), dtype=bool)
+    commun = nouveaux.index.isin(datas.index)
+    if commun.any():
+        index_commun = nouveaux.index[commun]
+        anciens_proprietaires = pd.Index(proprietaires.loc[index_commun].to_numpy())
+        nouveaux_proprietaires = pd.Index(origines[commun].to_numpy())
+        gagnants = (nouveaux_proprietaires == anciens_proprietaires) | (
+            nouveaux_proprietaires.map(rangs).to_numpy() < anciens_proprietaires.map(rangs).to_numpy()
+        )
+        anciens = datas.loc[index_commun].reindex(columns=nouveaux.columns)
+        nouveaux_communs = nouveaux[commun].to_numpy()
+        # NaN aux memes places : valeurs identiques
+        identiques = (
+            (anciens.to_numpy() == nouveaux_communs) | (anciens.isna().to_numpy() & np.isnan(nouveaux_communs.astype(float)))
+        ).all(axis=1)
+        modifies[commun] = gagnants & ~identiques
+        # un echantillon identique peut changer de fichier : il decide des doublons suivants
+        proprietaires = proprietaires.copy()
+        proprietaires.loc[index_commun[gagnants & identiques]] = nouveaux_proprietaires[gagnants & identiques]
+        nouveaux, origines = nouveaux[~commun | modifies], origines[~commun | modifies]
+        remplaces = nouveaux.index[nouveaux.index.isin(datas.index)]
+        datas, proprietaires = datas.drop(index=remplaces), proprietaires.drop(index=remplaces)
+
+    if nouveaux.empty:
+        return datas, proprietaires, nouveaux, True
+
+    en_fin = not modifies.any() and nouveaux.index[0] > dernier
+    datas, proprietaires = pd.concat([datas, nouveaux]), pd.concat([proprietaires, origines])
+    if not en_fin:
+        ordre = np.argsort(datas.index.to_numpy(), kind="stable")
+        datas, proprietaires = datas.iloc[ordre], proprietaires.iloc[ordre]
+    return datas, proprietaires, nouveaux, en_fin
+
+
+def watch(
+    dir,
+    note,
+    output,
+    verbose=False,
+    interval=5,
+    plot_interval=60,
+    tracer=None,
+):
+    """
+    Surveille un repertoire alimente au fil de l'eau par le Datafficheur (un fichier
+    MMDDhhmm.TXT par minute) et n'analyse que les fichiers nouveaux ou modifies.
+
+    Les nouveaux echantillons sont fusionnes dans les donnees en memoire et ajoutes e la
+    fin du fichier CSV de sortie. Le CSV est reecrit en entier si un fichier en retard
+    apporte des echantillons anterieurs aux derniers ecrits, si un echantillon deje ecrit
+    est modifie (ligne completee d'un fichier en cours d'ecriture), ou si les colonnes, leur
+    type ou la date du nom du fichier changent. Les doublons entre fichiers suivent la regle
+    du traitement unique (merge_order) et un fichier relu remplace ses propres echantillons
+    (voir merge_new_datas) : tant qu'un fichier relu ne perd pas d'echantillons, le CSV est
+    celui qu'ecrirait un traitement unique des memes fichiers. Les graphiques sont
+    rafraichis au plus une fois toutes les plot_interval secondes.
+    La surveillance s'arrete avec Ctrl+C.
+
+    Args:
+        dir (str): Le repertoire e surveiller.
+        note (str): Le nom du fichier contenant les notes (relu e chaque mise e jour s'il existe).
+        output (str): Le nom du fichier CSV de sortie, prefixe par la date des mesures.
+        verbose (bool, optional): Si vrai, affiche des messages supplementaires. Par defaut : False.
+        interval (float, optional): Periode de scrutation du repertoire en secondes. Par defaut : 5.
+        plot_interval (float, optional): Duree minimale entre deux rafraichissements des graphiques en secondes. Par defaut : 60.
+        tracer (callable, optional): Fonction tracer(df, date_str) appelee pour rafraichir les graphiques. Par defaut : None.
+
+    Returns:
+        pandas.DataFrame: Les donnees lues jusqu'e l'arret.
+
+    Raises:
+        ValueError: Si interval ou plot_interval est negatif.
+    """
+    if interval <= 0 or plot_interval < 0:
+        raise ValueError("interval doit etre positif et plot_interval ne peut pas etre negatif.")
+
+    vus = {}
+    # colonnes de chaque fichier et presence d'echantillons manquants (voir stream.index_files),
+    # d'apres sa derniere lecture
+    infos = {}
+    # premier echantillon de chaque fichier lu, pour l'ordre de fusion
+    debuts = {}
+    datas = None
+    proprietaires = None
+    chemin_csv = None
+    colonnes_csv = None
+    dernier_trace = None
+    a_tracer = False
+
+    def preparer(datas):
+        # colonnes et type de toute la session, comme la fusion en memoire de tous les fichiers
+        colonnes, lacunes = session_columns(list(infos.values()))
+        datas = datas.reindex(columns=colonnes)
+        lacunes = lacunes or bool(datas.isna().to_numpy().any())
+        df = prepare_data(datas.astype(np.float64 if lacunes else np.int64, copy=False))
+        if os.path.exists(os.path.join(dir, note)):
+            df = add_notes(df, dir, note)
+        return df
+
+    def nom_csv(datas):
+        # les donnees sont triees : premiere et derniere date
+        return os.path.join(dir, date_range_str(datas.index[[0, -1]]) + "_" + output)
+
+    if verbose:
+        print(f"Surveillance de {dir} toutes les {interval} s (Ctrl+C pour arreter)")
+    try:
+        while True:
+            fichiers = scan_files(dir, vus)
+            if fichiers:
+                frames, erreurs = load_datafficheur_files(fichiers, verbose=verbose)
+                en_erreur = {fichier for fichier, _ in erreurs}
+                lus = []
+                for fichier, frame in zip([f for f in fichiers if f not in en_erreur], frames):
+                    if frame.empty:
+                        infos.pop(fichier, None)
+                    else:
+                        debut = int(frame.index.to_numpy(dtype="datetime64[ns]").view("int64").min())
+                        # un fichier relu avec une ligne partielle (valeurs decimales) l'est aussi en memoire
+                        infos[fichier] = (fichier, debut, None, tuple(frame.columns), frame.to_numpy().dtype.kind == "f")
+                        debuts[fichier] = debut
+                        lus.append((fichier, frame))
+                if lus:
+                    # fichiers tries par nom, comme find_files
+                    noms = sorted(debuts)
+                    rangs = {noms[i]: rang for rang, i in enumerate(merge_order([debuts[nom] for nom in noms]))}
+                    datas, proprietaires, ajouts, en_fin = merge_new_datas(datas, proprietaires, lus, rangs)
+                    if not ajouts.empty:
+                        if verbose:
+                            print(f"{len(ajouts)} nouveaux echantillons")
+                        df_ajouts = preparer(ajouts) if en_fin else None
+                        nouveau_chemin = nom_csv(datas)
+                        if (
+                            en_fin
+                            and nouveau_chemin == chemin_csv
+                            and colonnes_csv == (list(df_ajouts.columns), list(df_ajouts.dtypes))
+                        ):
+                            write_csv(df_ajouts, chemin_csv, mode="a")
+                        else:
+                            df = preparer(datas)
+                            if chemin_csv is not None and nouveau_chemin != chemin_csv and os.path.exists(chemin_csv):
+                                # la session a change de jour : le fichier porte la nouvelle plage de dates
+                                os.remove(chemin_csv)
+                            chemin_csv = nouveau_chemin
+                            if verbose:
+                                print(f"Ecriture complete du fichier CSV {chemin_csv}")
+                            write_csv(df, chemin_csv)
+                            colonnes_csv = (list(df.columns), list(df.dtypes))
+                        a_tracer = True
+
+            if (
+                tracer is not None
+                and a_tracer
+                and (dernier_trace is None or time.monotonic() - dernier_trace >= plot_interval)
+            ):
+                tracer(preparer(datas), date_range_str(datas.index))
+                dernier_trace = time.monotonic()
+                a_tracer = False
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        if verbose:
+            print("Arret de la surveillance")
+        if tracer is not None and a_tracer:
+            tracer(preparer(datas), date_range_str(datas.index))
+
+    return datas